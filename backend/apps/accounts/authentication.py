@@ -0,0 +1,104 @@
+import copy
+import threading
+import time
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.invalidation import RECONNECTED, invalidation_bus
+
+
+class PrincipalCache:
+    """Per-process TTL cache of users (with profile) keyed by id.
+
+    Ids are normalised to ``str`` since tokens carry the id claim as a string.
+    Evictions reach other processes through the invalidation bus; the TTL
+    bounds how long a missed one (no Postgres, listener reconnecting) can
+    keep serving a stale user.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, object]] = {}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, user) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[str(user_id)] = (time.monotonic() + self.ttl, user)
+
+    def evict(self, user_id) -> None:
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(ttl=settings.AUTH_PRINCIPAL_CACHE_TTL)
+invalidation_bus.subscribe("auth.principal", lambda payload: principal_cache.evict(payload["id"]))
+invalidation_bus.subscribe(RECONNECTED, lambda payload: principal_cache.clear())
+
+
+def evict_principal(user_id) -> None:
+    """Drop ``user_id`` from the principal cache of every process."""
+    principal_cache.evict(user_id)
+    invalidation_bus.publish("auth.principal", {"id": str(user_id)})
+
+
+def _detached(user):
+    # Each request gets its own instance so handlers can mutate it safely
+    clone = copy.copy(user)
+    profile = user._state.fields_cache.get("profile")
+    if profile is not None:
+        profile = copy.copy(profile)
+        profile._state.fields_cache["user"] = clone
+        clone._state.fields_cache["profile"] = profile
+    return clone
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves the user and profile from ``principal_cache``.
+
+    Saving the user (a password change included) evicts the entry, so the
+    checks below see the current ``is_active`` and password hash.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = principal_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related("profile").get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            principal_cache.set(user_id, user)
+            invalidation_bus.start()
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return _detached(user)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.authentication import principal_cache
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.user = get_user_model().objects.create_user(username="alice", password="old-password")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def me(self):
+        return self.client.get("/api/auth/me/")
+
+    def test_warm_cache_needs_no_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.me().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.me()
+        self.assertEqual(response.json()["username"], "alice")
+        self.assertEqual(response.json()["profile"]["display_name"], "")
+
+    def test_password_change_evicts(self):
+        self.me()
+        self.user.set_password("new-password")
+        self.user.save()
+        self.assertIsNone(principal_cache.get(self.user.id))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.me().status_code, 200)
+
+    def test_profile_change_evicts(self):
+        self.me()
+        response = self.client.patch("/api/auth/profile/", {"display_name": "Alice"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(principal_cache.get(self.user.id))
+        self.assertEqual(self.me().json()["profile"]["display_name"], "Alice")
+
+    def test_deactivation_evicts(self):
+        self.me()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me().status_code, 401)
+
@@ -6,3 +6,5 @@ class BusinessesConfig(AppConfig):
     name = "apps.businesses"
     verbose_name = "Businesses"
 
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,413 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.invalidation import RECONNECTED, invalidation_bus
+from .models import Business, Category
+
+
+# values_list() order used for loading and for single-row refreshes
+FIELDS = (
+    "id",
+    "name",
+    "description",
+    "category_id",
+    "address",
+    "city",
+    "country",
+    "website",
+    "phone",
+    "image",
+    "average_rating",
+    "rating_count",
+    "created_at",
+    "updated_at",
+)
+# Mostly unique per business: UTF-8 in one shared blob, addressed by offset/length
+TEXT_FIELDS = ("name", "description", "address", "website", "phone", "image")
+# Few distinct values: int32 codes into an append-only string table
+INTERNED_FIELDS = ("city", "country")
+ORDERINGS = ("created_at", "-created_at", "average_rating", "-average_rating")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_DTYPES = {
+    "id": np.int64,
+    "category_id": np.int64,
+    "average_rating": np.float64,
+    "rating_count": np.int64,
+    "created_at": np.int64,
+    "updated_at": np.int64,
+    **{field: np.int32 for field in INTERNED_FIELDS},
+    **{f"{field}_start": np.int64 for field in TEXT_FIELDS},
+    **{f"{field}_len": np.int32 for field in TEXT_FIELDS},
+}
+
+
+def _micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return 0
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class _Strings:
+    """Text storage shared by successive snapshots; only ever appended to."""
+
+    def __init__(self) -> None:
+        self.blob = bytearray()
+        self.tables: Dict[str, List[str]] = {field: [] for field in INTERNED_FIELDS}
+        self.codes: Dict[str, Dict[str, int]] = {field: {} for field in INTERNED_FIELDS}
+        self.categories: Dict[int, str] = {}
+
+    def append(self, text: str) -> Tuple[int, int]:
+        data = (text or "").encode()
+        start = len(self.blob)
+        self.blob += data
+        return start, len(data)
+
+    def intern(self, field: str, value: str) -> int:
+        value = value or ""
+        code = self.codes[field].get(value)
+        if code is None:
+            code = self.codes[field][value] = len(self.tables[field])
+            self.tables[field].append(value)
+        return code
+
+
+class CatalogSnapshot:
+    """Immutable, id-sorted columns for every business.
+
+    Mutations build a new snapshot, so a request reads one consistent
+    version from lookup to hydration.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], strings: _Strings) -> None:
+        self.arrays = arrays
+        self.ids = arrays["id"]
+        self.strings = strings
+        self._orders: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_for(self, pks: Iterable[int]) -> np.ndarray:
+        """Row positions of ``pks`` in the given order; unknown ids are skipped."""
+        wanted = np.fromiter(pks, dtype=np.int64)
+        if not len(self.ids) or not len(wanted):
+            return np.empty(0, dtype=np.int64)
+        pos = np.searchsorted(self.ids, wanted)
+        found = pos < len(self.ids)
+        found[found] = self.ids[pos[found]] == wanted[found]
+        return pos[found]
+
+    def ordered(self, ordering: str = "-created_at", category_id: Optional[int] = None) -> np.ndarray:
+        order = self._orders.get(ordering)
+        if order is None:
+            values = self.arrays[ordering.lstrip("-")]
+            if ordering.startswith("-"):
+                order = np.lexsort((-self.ids, -values))
+            else:
+                order = np.lexsort((self.ids, values))
+            self._orders[ordering] = order
+        if category_id is not None:
+            order = order[self.arrays["category_id"][order] == category_id]
+        return order
+
+    def _text(self, field: str, row: int) -> str:
+        start = int(self.arrays[f"{field}_start"][row])
+        return self.strings.blob[start:start + int(self.arrays[f"{field}_len"][row])].decode()
+
+    def instances(self, rows: Iterable[int]) -> List[Business]:
+        """Unsaved-looking ``Business`` objects with ``category`` filled in, built without queries."""
+        arrays, strings = self.arrays, self.strings
+        result = []
+        for row in rows:
+            category_id = int(arrays["category_id"][row])
+            business = Business(
+                id=int(self.ids[row]),
+                category_id=category_id if category_id >= 0 else None,
+                average_rating=float(arrays["average_rating"][row]),
+                rating_count=int(arrays["rating_count"][row]),
+                created_at=_EPOCH + timedelta(microseconds=int(arrays["created_at"][row])),
+                updated_at=_EPOCH + timedelta(microseconds=int(arrays["updated_at"][row])),
+                **{field: self._text(field, row) for field in TEXT_FIELDS},
+                **{field: strings.tables[field][arrays[field][row]] for field in INTERNED_FIELDS},
+            )
+            business._state.adding = False
+            if category_id >= 0:
+                category = Category(id=category_id, name=strings.categories.get(category_id, ""))
+                category._state.adding = False
+                business.category = category
+            result.append(business)
+        return result
+
+    def nbytes(self) -> int:
+        tables = sum(len(v.encode()) for table in self.strings.tables.values() for v in table)
+        return sum(a.nbytes for a in self.arrays.values()) + len(self.strings.blob) + tables
+
+
+class BusinessCatalog:
+    """Per-process columnar copy of the business table.
+
+    Kept current by ``Business``/``Category`` signals for changes made in this
+    process and by invalidation bus messages for changes made elsewhere. A
+    background reload every ``CATALOG_RELOAD_SECONDS`` catches anything the
+    bus missed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at = 0.0
+        self._reloading = False
+        # Changes that arrive while a reload is reading the table; replayed onto its result
+        self._replay: Optional[List[Tuple[List[tuple], List[int]]]] = None
+        self._garbage = 0
+
+    # -- building ---------------------------------------------------------
+    def build(self, rows: Sequence[tuple], categories: Dict[int, str]) -> CatalogSnapshot:
+        """Snapshot from ``FIELDS``-ordered rows."""
+        strings = _Strings()
+        strings.categories.update(categories)
+        encoded = [self._encode(row, strings) for row in sorted(rows, key=lambda r: r[0])]
+        arrays = {
+            name: np.fromiter((values[name] for values in encoded), dtype=dtype, count=len(encoded))
+            for name, dtype in _DTYPES.items()
+        }
+        return CatalogSnapshot(arrays, strings)
+
+    @staticmethod
+    def _encode(row: tuple, strings: _Strings) -> Dict[str, object]:
+        record = dict(zip(FIELDS, row))
+        values: Dict[str, object] = {
+            "id": record["id"],
+            "category_id": record["category_id"] if record["category_id"] is not None else -1,
+            "average_rating": record["average_rating"] or 0.0,
+            "rating_count": record["rating_count"] or 0,
+            "created_at": _micros(record["created_at"]),
+            "updated_at": _micros(record["updated_at"]),
+        }
+        for field in INTERNED_FIELDS:
+            values[field] = strings.intern(field, record[field])
+        for field in TEXT_FIELDS:
+            values[f"{field}_start"], values[f"{field}_len"] = strings.append(record[field])
+        return values
+
+    def load(self) -> None:
+        from core.db_routing import use_replica  # local import
+
+        with self._lock:
+            self._replay = []
+        try:
+            with use_replica():
+                categories = dict(Category.objects.values_list("id", "name"))
+                rows = list(Business.objects.values_list(*FIELDS).iterator(chunk_size=2000))
+            snapshot = self.build(rows, categories)
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            replay, self._replay = self._replay, None
+            self._snapshot = snapshot
+            self._garbage = 0
+            for changed, removed in replay:
+                self._apply(changed, removed)
+            self._loaded_at = time.monotonic()
+
+    def _reload_in_background(self) -> None:
+        try:
+            self.load()
+        finally:
+            self._reloading = False
+            close_old_connections()
+
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Current snapshot, loading on first use; None when the catalog is disabled."""
+        if not settings.CATALOG_ENABLED:
+            return None
+        if self._snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self.load()
+            invalidation_bus.start()
+            return self._snapshot
+        with self._lock:
+            stale = time.monotonic() - self._loaded_at > settings.CATALOG_RELOAD_SECONDS and not self._reloading
+            if stale:
+                self._reloading = True
+        if stale:
+            # Keep serving the current snapshot while the fresh one loads
+            threading.Thread(target=self._reload_in_background, name="catalog-reload", daemon=True).start()
+        return self._snapshot
+
+    def expire(self) -> None:
+        """Reload in the background on next use, keeping the current snapshot until then."""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    # -- change notifications --------------------------------------------
+    def _apply(self, changed: List[tuple], removed: List[int]) -> None:
+        """Copy-on-write update of the current snapshot; caller holds the lock."""
+        if self._replay is not None:
+            self._replay.append((changed, removed))
+        current = self._snapshot
+        if current is None:
+            return
+        strings = current.strings
+        arrays = dict(current.arrays)
+        removed_set = set(removed)
+        changed = sorted({row[0]: row for row in changed if row[0] not in removed_set}.values(), key=lambda r: r[0])
+
+        gone = current.rows_for(removed) if removed else np.empty(0, dtype=np.int64)
+        if len(gone):
+            self._garbage += sum(int(arrays[f"{field}_len"][gone].sum()) for field in TEXT_FIELDS)
+            arrays = {name: np.delete(values, gone) for name, values in arrays.items()}
+
+        if changed:
+            ids = arrays["id"]
+            encoded = [self._encode(row, strings) for row in changed]
+            pks = np.array([row[0] for row in changed], dtype=np.int64)
+            pos = np.searchsorted(ids, pks)
+            exists = np.zeros(len(pks), dtype=bool)
+            if len(ids):
+                exists = (pos < len(ids)) & (ids[np.minimum(pos, len(ids) - 1)] == pks)
+            if exists.any():
+                arrays = {name: values.copy() for name, values in arrays.items()}
+                for i in np.flatnonzero(exists):
+                    row = pos[i]
+                    self._garbage += sum(int(arrays[f"{field}_len"][row]) for field in TEXT_FIELDS)
+                    for name in arrays:
+                        arrays[name][row] = encoded[i][name]
+            new = np.flatnonzero(~exists)
+            if len(new):
+                arrays = {name: np.insert(values, pos[new], [encoded[i][name] for i in new]) for name, values in arrays.items()}
+
+        snapshot = CatalogSnapshot(arrays, strings)
+        # Replaced text stays in the blob until it outweighs the live text
+        if self._garbage > max(len(strings.blob) - self._garbage, 1 << 20):
+            snapshot = self._compact(snapshot)
+        self._snapshot = snapshot
+
+    def _compact(self, snapshot: CatalogSnapshot) -> CatalogSnapshot:
+        strings = _Strings()
+        strings.tables = snapshot.strings.tables
+        strings.codes = snapshot.strings.codes
+        strings.categories = snapshot.strings.categories
+        arrays = {name: values.copy() for name, values in snapshot.arrays.items()}
+        for row in range(len(snapshot)):
+            for field in TEXT_FIELDS:
+                arrays[f"{field}_start"][row], arrays[f"{field}_len"][row] = strings.append(snapshot._text(field, row))
+        self._garbage = 0
+        return CatalogSnapshot(arrays, strings)
+
+    def upsert(self, business: Business) -> None:
+        if business.get_deferred_fields():
+            self.refresh([business.pk])
+            return
+        if business.category_id is not None and Business.category.is_cached(business):
+            self.set_category(business.category_id, business.category.name)
+        row = tuple(
+            (business.image.name or "") if field == "image" else getattr(business, field) for field in FIELDS
+        )
+        with self._lock:
+            self._apply([row], [])
+        snapshot = self._snapshot
+        category_id = business.category_id
+        if category_id is not None and snapshot is not None and category_id not in snapshot.strings.categories:
+            # Created in another process since the last load
+            name = Category.objects.filter(id=category_id).values_list("name", flat=True).first()
+            self.set_category(category_id, name or "")
+
+    def refresh(self, pks: Iterable[int]) -> None:
+        """Re-read ``pks`` from the database, e.g. after a bulk UPDATE that bypassed signals."""
+        pks = list(pks)
+        if not pks or self._snapshot is None:
+            return
+        rows = list(Business.objects.filter(id__in=pks).values_list(*FIELDS))
+        found = {row[0] for row in rows}
+        with self._lock:
+            self._apply(rows, [pk for pk in pks if pk not in found])
+
+    def remove(self, pk: int) -> None:
+        with self._lock:
+            self._apply([], [pk])
+
+    def set_category(self, pk: int, name: str) -> None:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot.strings.categories[pk] = name
+
+    def clear_category(self, pk: int) -> None:
+        """Mirror ``on_delete=SET_NULL`` for the deleted category's businesses."""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            snapshot.strings.categories.pop(pk, None)
+            arrays = dict(snapshot.arrays)
+            arrays["category_id"] = np.where(arrays["category_id"] == pk, -1, arrays["category_id"])
+            self._snapshot = CatalogSnapshot(arrays, snapshot.strings)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"businesses": 0, "bytes": 0, "bytes_per_business": 0}
+        nbytes = snapshot.nbytes()
+        return {
+            "businesses": len(snapshot),
+            "bytes": nbytes,
+            "bytes_per_business": round(nbytes / max(len(snapshot), 1), 1),
+        }
+
+
+business_catalog = BusinessCatalog()
+
+# Ids per bus message, keeping payloads under the 8000-byte NOTIFY limit
+BROADCAST_CHUNK = 500
+
+
+def _on_category(payload: dict) -> None:
+    if payload["name"] is None:
+        business_catalog.clear_category(payload["id"])
+    else:
+        business_catalog.set_category(payload["id"], payload["name"])
+
+
+# Other processes re-read changed businesses from the primary: a deleted one is simply not found
+invalidation_bus.subscribe("catalog.businesses", lambda payload: business_catalog.refresh(payload["ids"]))
+invalidation_bus.subscribe("catalog.category", _on_category)
+invalidation_bus.subscribe(RECONNECTED, lambda payload: business_catalog.expire())
+
+
+def broadcast_businesses(pks: Iterable[int]) -> None:
+    """Tell every other process to re-read ``pks`` into its catalog."""
+    pks = sorted(set(pks))
+    for start in range(0, len(pks), BROADCAST_CHUNK):
+        invalidation_bus.publish("catalog.businesses", {"ids": pks[start:start + BROADCAST_CHUNK]})
+
+
+def refresh_businesses(pks: Iterable[int]) -> None:
+    """Re-read ``pks`` into the catalog of this process and every other one."""
+    pks = list(pks)
+    business_catalog.refresh(pks)
+    broadcast_businesses(pks)
+
+
+def broadcast_category(pk: int, name: Optional[str]) -> None:
+    """Tell every other process a category was renamed, or deleted when ``name`` is None."""
+    invalidation_bus.publish("catalog.category", {"id": pk, "name": name})
+
+
+def catalog_for(request) -> Optional[CatalogSnapshot]:
+    """The catalog snapshot, unless this client must read its own recent writes from the database."""
+    from core.db_routing import is_pinned  # local import
+
+    if is_pinned(request):
+        return None
+    return business_catalog.snapshot()
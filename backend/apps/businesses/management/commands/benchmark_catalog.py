@@ -0,0 +1,79 @@
+import random
+import string
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from apps.businesses.catalog import BusinessCatalog
+from apps.businesses.models import Business
+
+
+class Command(BaseCommand):
+    help = "Compare catalog snapshot memory and hydration speed with Django model instances on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=100_000)
+        parser.add_argument("--lookups", type=int, default=2_000)
+        parser.add_argument("--seed", type=int, default=13)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        cities = ["Kigali", "Musanze", "Huye", "Rubavu", "Rwamagana", "Nyagatare", "Muhanga", "Karongi"]
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+        def words(n):
+            return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(n))
+
+        rows = [
+            (
+                pk,
+                words(2).title(),
+                words(rng.randint(5, 25)),
+                rng.randint(1, 12),
+                f"KG {rng.randint(1, 999)} St",
+                rng.choice(cities),
+                "Rwanda",
+                "",
+                f"+250 7{rng.randint(10000000, 99999999)}",
+                "",
+                round(rng.uniform(1, 5), 2),
+                rng.randint(0, 500),
+                start + timedelta(seconds=pk),
+                start + timedelta(seconds=pk),
+            )
+            for pk in range(1, options["entries"] + 1)
+        ]
+        fields = [f.attname for f in Business._meta.concrete_fields if f.attname != "id"]
+        names = ("id", "name", "description", "category_id", "address", "city", "country", "website", "phone", "image",
+                 "average_rating", "rating_count", "created_at", "updated_at")
+
+        tracemalloc.start()
+        instances = [Business(**dict(zip(names, row))) for row in rows]
+        model_bytes = tracemalloc.get_traced_memory()[0]
+        del instances
+        tracemalloc.stop()
+
+        catalog = BusinessCatalog()
+        started = time.perf_counter()
+        snapshot = catalog.build(rows, {i: f"Category {i}" for i in range(1, 13)})
+        build_s = time.perf_counter() - started
+        catalog_bytes = snapshot.nbytes()
+
+        ids = [rng.randint(1, options["entries"]) for _ in range(options["lookups"])]
+        started = time.perf_counter()
+        for i in range(0, len(ids), 20):
+            snapshot.instances(snapshot.rows_for(ids[i:i + 20]))
+        hydrate_us = (time.perf_counter() - started) / max(len(ids) // 20, 1) * 1e6
+        started = time.perf_counter()
+        snapshot.ordered("-average_rating", category_id=3)
+        sort_ms = (time.perf_counter() - started) * 1000
+
+        n = options["entries"]
+        self.stdout.write(f"entries:              {n} ({len(fields)} columns)")
+        self.stdout.write(f"build:                {build_s:.2f}s")
+        self.stdout.write(f"model instance bytes: {model_bytes / n:.0f}/business")
+        self.stdout.write(f"catalog bytes:        {catalog_bytes / n:.0f}/business ({catalog_bytes / model_bytes:.0%})")
+        self.stdout.write(f"hydrate 20 ids:       {hydrate_us:.0f}us")
+        self.stdout.write(f"sort + filter:        {sort_ms:.1f}ms (first call; cached per snapshot)")
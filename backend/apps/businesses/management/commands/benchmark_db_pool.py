@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.models import Q
+
+from apps.businesses.models import Business
+from apps.reviews.models import Review
+from core.db_pool import pool_stats, prepared_statements
+
+
+class Command(BaseCommand):
+    help = "Compare per-request connections, the psycopg pool, and pooled prepared statements on the hot read queries (Postgres only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument("--clients", type=int, default=8, help="concurrent request threads")
+        parser.add_argument("--term", default="a", help="keyword-search term")
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != "postgresql":
+            raise CommandError("Needs Postgres; point DB_ENGINE and the PG* variables at a local server.")
+        db_options = connections.settings[DEFAULT_DB_ALIAS]["OPTIONS"]
+        pool_options = db_options.get("pool")
+        if not pool_options:
+            raise CommandError("The connection pool is off (DB_POOL=false).")
+        term = options["term"]
+        business_id = Business.objects.values_list("id", flat=True).first()
+        close_old_connections()
+
+        def request(prepare: bool) -> float:
+            # The queries of a business list, review list and keyword search, then Django's end-of-request close
+            started = time.perf_counter()
+            with prepared_statements() if prepare else nullcontext():
+                list(Business.objects.select_related("category").order_by("-created_at")[:20])
+                Business.objects.count()
+                list(Review.objects.filter(is_visible=True, business_id=business_id).order_by("-id")[:20])
+                list(
+                    Business.objects.filter(Q(name__icontains=term) | Q(description__icontains=term) | Q(city__icontains=term))
+                    .order_by("-average_rating", "-rating_count")
+                    .values_list("id", flat=True)
+                )
+            close_old_connections()
+            return time.perf_counter() - started
+
+        def run(label: str, prepare: bool) -> float:
+            request(prepare)  # warm up
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["clients"]) as pool:
+                timings = sorted(pool.map(lambda _: request(prepare), range(options["requests"])))
+            elapsed = time.perf_counter() - started
+            p50 = timings[len(timings) // 2] * 1000
+            p99 = timings[int(len(timings) * 0.99)] * 1000
+            self.stdout.write(f"{label:<22} {len(timings) / elapsed:8.0f} req/s  p50 {p50:6.2f}ms  p99 {p99:6.2f}ms")
+            return p50
+
+        self.stdout.write(f"clients: {options['clients']}, pool: {pool_options}, prepare_threshold: {db_options.get('prepare_threshold')}")
+        # Without the pool option Django connects and disconnects around every request
+        del db_options["pool"]
+        try:
+            unpooled = run("connect per request", prepare=False)
+        finally:
+            db_options["pool"] = pool_options
+        pooled = run("pool", prepare=False)
+        prepared = run("pool + prepared", prepare=True)
+        self.stdout.write(f"p50 speedup: pool {unpooled / pooled:.1f}x, pool + prepared {unpooled / prepared:.1f}x")
+        for alias, stats in pool_stats().items():
+            self.stdout.write(
+                f"{alias}: size {stats.get('pool_size')}/{stats.get('pool_max')}, "
+                f"requests {stats.get('requests_num', 0)}, queued {stats.get('requests_queued', 0)}, "
+                f"wait {stats.get('requests_wait_ms', 0)}ms, errors {stats.get('requests_errors', 0)}"
+            )
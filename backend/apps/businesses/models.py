@@ -26,3 +26,16 @@ class Business(models.Model):
     def __str__(self) -> str:
         return self.name
 
+
+
+class SimilarBusiness(models.Model):
+    """Precomputed nearest neighbours of a business, refreshed by ``compute_similar``."""
+
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="neighbours")
+    similar = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ("business", "similar")
+        ordering = ("business", "rank")
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import broadcast_businesses, broadcast_category, business_catalog
+from .models import Business, Category
+
+
+# Applied on commit so a rolled-back save never reaches the catalog; the
+# broadcast is transactional too, and other processes apply it on commit
+@receiver(post_save, sender=Business)
+def update_catalog_business(sender, instance, **kwargs):
+    transaction.on_commit(lambda: business_catalog.upsert(instance))
+    broadcast_businesses([instance.pk])
+
+
+@receiver(post_delete, sender=Business)
+def remove_catalog_business(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: business_catalog.remove(pk))
+    broadcast_businesses([pk])
+
+
+@receiver(post_save, sender=Category)
+def update_catalog_category(sender, instance, **kwargs):
+    transaction.on_commit(lambda: business_catalog.set_category(instance.pk, instance.name))
+    broadcast_category(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def clear_catalog_category(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: business_catalog.clear_category(pk))
+    broadcast_category(pk, None)
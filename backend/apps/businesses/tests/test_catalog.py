@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.businesses import catalog
+from apps.businesses.catalog import business_catalog
+from apps.businesses.models import Business, Category
+from core.invalidation import RECONNECTED, invalidation_bus
+
+
+def deliver(topic, payload):
+    # The handlers the listener thread would run for a message from another
+    # process, minus its connection cleanup, which would break the test transaction
+    for handler in invalidation_bus._handlers.get(topic, ()):
+        handler(payload)
+
+
+class CatalogBroadcastTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Pharmacy")
+        self.business = Business.objects.create(name="Kigali Pharmacy", city="Kigali", category=self.category)
+        business_catalog.load()
+
+    def tearDown(self):
+        # The catalog is process-wide; leave the next test to load its own
+        business_catalog._snapshot = None
+        business_catalog._reloading = False
+
+    def row(self, pk):
+        snapshot = business_catalog.snapshot()
+        rows = snapshot.rows_for([pk])
+        return snapshot.instances(rows)[0] if len(rows) else None
+
+    def test_changes_made_elsewhere_are_reread(self):
+        # Another process's write: the database changes but no signal fires here
+        Business.objects.filter(id=self.business.id).update(name="Kigali Chemist")
+        added = Business.objects.bulk_create([Business(name="Huye Bakery")])[0]
+        deliver("catalog.businesses", {"ids": [self.business.id, added.id]})
+        self.assertEqual(self.row(self.business.id).name, "Kigali Chemist")
+        self.assertEqual(self.row(added.id).name, "Huye Bakery")
+
+        Business.objects.filter(id=added.id).delete()
+        deliver("catalog.businesses", {"ids": [added.id]})
+        self.assertIsNone(self.row(added.id))
+
+    def test_category_messages(self):
+        deliver("catalog.category", {"id": self.category.id, "name": "Chemist"})
+        self.assertEqual(self.row(self.business.id).category.name, "Chemist")
+        deliver("catalog.category", {"id": self.category.id, "name": None})
+        self.assertIsNone(self.row(self.business.id).category_id)
+
+    def test_reconnect_schedules_reload(self):
+        with mock.patch.object(business_catalog, "_reload_in_background") as reload:
+            deliver(RECONNECTED, {})
+            business_catalog.snapshot()
+        reload.assert_called_once()
+
+    def test_local_writes_are_broadcast(self):
+        with mock.patch.object(invalidation_bus, "publish") as publish:
+            self.business.save()
+            self.category.name = "Chemist"
+            self.category.save()
+            catalog.refresh_businesses(range(1, catalog.BROADCAST_CHUNK + 2))
+        self.assertEqual(
+            [c.args for c in publish.call_args_list],
+            [
+                ("catalog.businesses", {"ids": [self.business.id]}),
+                ("catalog.category", {"id": self.category.id, "name": "Chemist"}),
+                ("catalog.businesses", {"ids": list(range(1, catalog.BROADCAST_CHUNK + 1))}),
+                ("catalog.businesses", {"ids": [catalog.BROADCAST_CHUNK + 1]}),
+            ],
+        )
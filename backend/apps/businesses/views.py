@@ -1,10 +1,14 @@
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
-from .models import Category, Business
+from .catalog import ORDERINGS, catalog_for
+from .models import Category, Business, SimilarBusiness
 from .serializers import CategorySerializer, BusinessSerializer
+from core.async_views import AsyncModelViewSet
+from core.executors import run_db
 
 
 @extend_schema(tags=["businesses"])
@@ -12,21 +16,59 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all().order_by("name")
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    read_replica = True
 
 
 @extend_schema(tags=["businesses"])
-class BusinessViewSet(viewsets.ModelViewSet):
-    queryset = Business.objects.all().order_by("-created_at")
+class BusinessViewSet(AsyncModelViewSet):
+    queryset = Business.objects.select_related("category").order_by("-created_at")
     serializer_class = BusinessSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name", "description", "city", "country"]
     ordering_fields = ["created_at", "average_rating"]
+    read_replica = True
+    prepare_statements = True
+
+    def _catalog_response(self, snapshot, rows):
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(snapshot.instances(page), many=True).data)
+        return Response(self.get_serializer(snapshot.instances(rows), many=True).data)
+
+    async def list(self, request, *args, **kwargs):
+        # Default and rating/date orderings come straight from the catalog; text search needs the DB
+        ordering = request.query_params.get("ordering") or "-created_at"
+        if not request.query_params.get("search") and ordering in ORDERINGS:
+            snapshot = await sync_to_async(catalog_for)(request)
+            if snapshot is not None:
+                return self._catalog_response(snapshot, snapshot.ordered(ordering))
+        qs = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(qs)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(await run_db(list, qs), many=True)
+        return Response(serializer.data)
+
+    async def retrieve(self, request, *args, **kwargs):
+        snapshot = await sync_to_async(catalog_for)(request)
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if snapshot is not None and str(pk).isdigit():
+            found = snapshot.instances(snapshot.rows_for([int(pk)]))
+            if found:
+                self.check_object_permissions(request, found[0])
+                return Response(self.get_serializer(found[0]).data)
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
 
     @extend_schema(parameters=[OpenApiParameter(name="category_id", required=False, type=int)])
     @action(detail=False, methods=["get"], url_path="by-category")
     def by_category(self, request):
         category_id = request.query_params.get("category_id")
+        snapshot = catalog_for(request)
+        if snapshot is not None and (not category_id or category_id.isdigit()):
+            return self._catalog_response(snapshot, snapshot.ordered("-created_at", int(category_id) if category_id else None))
         qs = self.get_queryset()
         if category_id:
             qs = qs.filter(category_id=category_id)
@@ -36,3 +78,46 @@ class BusinessViewSet(viewsets.ModelViewSet):
             return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
+
+    @extend_schema(parameters=[OpenApiParameter(name="limit", required=False, type=int)])
+    @action(detail=True, methods=["get"], url_path="similar")
+    def similar(self, request, pk=None):
+        business = self.get_object()
+        limit = _limit_param(request)
+        ids = list(
+            SimilarBusiness.objects.filter(business=business).order_by("rank").values_list("similar_id", flat=True)[:limit]
+        )
+        return Response(self.get_serializer(self._in_order(ids), many=True).data)
+
+    @extend_schema(parameters=[OpenApiParameter(name="limit", required=False, type=int)])
+    @action(detail=False, methods=["get"], url_path="for-you", permission_classes=[permissions.IsAuthenticated])
+    def for_you(self, request):
+        from apps.favorites.models import Favorite, ViewHistory  # local import
+        from apps.searchai.recommendations import merge_neighbours, top_rated
+
+        # Favorites count double; only the most recent activity seeds the feed
+        seeds = {}
+        for business_id in ViewHistory.objects.filter(user=request.user).values_list("business_id", flat=True)[:50]:
+            seeds.setdefault(business_id, 1.0)
+        for business_id in Favorite.objects.filter(user=request.user).values_list("business_id", flat=True)[:20]:
+            seeds[business_id] = 2.0
+        limit = _limit_param(request)
+        ids = merge_neighbours(seeds, limit=limit)
+        if len(ids) < limit:
+            # New users, or neighbours not computed yet: top up with the best rated
+            ids += top_rated(exclude=[*seeds, *ids], limit=limit - len(ids))
+        return Response(self.get_serializer(self._in_order(ids), many=True).data)
+
+    def _in_order(self, ids):
+        snapshot = catalog_for(self.request)
+        if snapshot is not None:
+            return snapshot.instances(snapshot.rows_for(ids))
+        found = self.get_queryset().in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+
+def _limit_param(request, default: int = 10, maximum: int = 50) -> int:
+    try:
+        return min(max(int(request.query_params.get("limit", default)), 1), maximum)
+    except ValueError:
+        return default
@@ -0,0 +1,205 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+try:
+    from transformers import AutoModelForCausalLM, AutoTokenizer  # type: ignore
+    import torch  # type: ignore
+except Exception:  # pragma: no cover
+    AutoModelForCausalLM = None  # type: ignore
+    AutoTokenizer = None  # type: ignore
+    torch = None  # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("fp32", "int8", "bf16")
+
+SYSTEM_PREFIX = (
+    "You are a helpful assistant for a business finder app."
+    " Use the following businesses to answer concisely.\n"
+)
+
+# (business id, version, text) for one retrieved business
+Snippet = Tuple[int, str, str]
+
+
+class ChatEngine:
+    """Causal-LM chat generation with a reusable system-prefix KV cache.
+
+    The static prefix is run through the model once and its key/value cache is
+    copied into every generation, so prefill only covers the retrieved context
+    and the user turn. Context is filled in relevance order up to a token
+    budget, and snippet tokenizations are cached per business version.
+
+    ``inference_mode`` picks the CPU weight format: ``fp32``, ``int8`` (dynamic
+    quantization of the linear layers) or ``bf16``.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "",
+        max_new_tokens: int = 128,
+        context_tokens: int = 384,
+        snippet_tokens: int = 96,
+        snippet_cache_size: int = 4096,
+        inference_mode: str = "fp32",
+        num_threads: int = 0,
+        num_interop_threads: int = 0,
+    ) -> None:
+        if inference_mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode {inference_mode!r}; expected one of {INFERENCE_MODES}")
+        self.model_name = model_name
+        self.max_new_tokens = max_new_tokens
+        self.context_tokens = context_tokens
+        self.snippet_tokens = snippet_tokens
+        self.snippet_cache_size = snippet_cache_size
+        self.inference_mode = inference_mode
+        self.num_threads = num_threads
+        self.num_interop_threads = num_interop_threads
+        self.model = None
+        self.tokenizer = None
+        self._lock = threading.Lock()
+        self._load_failed = False
+        self._prefix_ids: Optional[List[int]] = None
+        self._prefix_cache = None
+        self._snippets: "OrderedDict[Tuple[int, str], List[int]]" = OrderedDict()
+
+    @classmethod
+    def from_components(cls, model, tokenizer, **kwargs) -> "ChatEngine":
+        engine = cls(**kwargs)
+        engine._configure_threads()
+        engine.model = engine._prepare(model)
+        engine.tokenizer = tokenizer
+        return engine
+
+    @property
+    def available(self) -> bool:
+        return torch is not None and (self.model is not None or (AutoModelForCausalLM is not None and not self._load_failed))
+
+    def load(self) -> bool:
+        if self.model is not None:
+            return True
+        if not self.available:
+            return False
+        with self._lock:
+            if self.model is None:
+                try:
+                    self._configure_threads()
+                    self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                    self.model = self._prepare(AutoModelForCausalLM.from_pretrained(self.model_name))
+                except Exception:
+                    self._load_failed = True
+                    return False
+        return True
+
+    def _configure_threads(self) -> None:
+        # Process-wide; keeps intra-op threads from oversubscribing cores shared with other workers
+        if self.num_threads > 0:
+            torch.set_num_threads(self.num_threads)
+        if self.num_interop_threads > 0:
+            try:
+                torch.set_num_interop_threads(self.num_interop_threads)
+            except RuntimeError:
+                # Can only be set before the first parallel op in the process
+                pass
+
+    def _prepare(self, model):
+        model = model.eval()
+        if self.inference_mode == "bf16":
+            return model.to(torch.bfloat16)
+        if self.inference_mode == "int8":
+            try:
+                return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            except Exception:
+                logger.warning("Dynamic int8 quantization unavailable, running %s in fp32", self.model_name, exc_info=True)
+                self.inference_mode = "fp32"
+        return model
+
+    # -- prompt assembly --------------------------------------------------
+    def _encode(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def prefix_ids(self) -> List[int]:
+        if self._prefix_ids is None:
+            self._prefix_ids = self.tokenizer(SYSTEM_PREFIX)["input_ids"]
+        return self._prefix_ids
+
+    def snippet_ids(self, business_id: int, version: str, text: str) -> List[int]:
+        key = (business_id, version)
+        with self._lock:
+            ids = self._snippets.get(key)
+            if ids is not None:
+                self._snippets.move_to_end(key)
+                return ids
+        ids = self._encode(text)[: self.snippet_tokens]
+        with self._lock:
+            self._snippets[key] = ids
+            if len(self._snippets) > self.snippet_cache_size:
+                self._snippets.popitem(last=False)
+        return ids
+
+    def build_input_ids(self, snippets: Sequence[Snippet], message: str) -> List[int]:
+        ids = list(self.prefix_ids())
+        budget = self.context_tokens
+        for business_id, version, text in snippets:
+            if budget <= 0:
+                break
+            piece = self.snippet_ids(business_id, version, text)[:budget]
+            ids.extend(piece)
+            budget -= len(piece)
+        ids.extend(self._encode("User: " + message + "\nAssistant:"))
+        return ids
+
+    # -- generation -------------------------------------------------------
+    def prefix_cache(self):
+        if self._prefix_cache is None:
+            with self._lock:
+                if self._prefix_cache is None:
+                    input_ids = torch.tensor([self.prefix_ids()])
+                    with torch.inference_mode():
+                        out = self.model(input_ids=input_ids, use_cache=True)
+                    self._prefix_cache = out.past_key_values
+        return self._prefix_cache
+
+    def generate_ids(self, snippets: Sequence[Snippet], message: str, use_prefix_cache: bool = True) -> Tuple[List[int], List[int]]:
+        """Returns ``(prompt_ids, new_ids)`` from greedy decoding."""
+        ids = self.build_input_ids(snippets, message)
+        input_ids = torch.tensor([ids])
+        kwargs = {}
+        # Token id 0 is a valid pad token; only fall back to EOS when there is none
+        pad_token_id = self.tokenizer.pad_token_id
+        if pad_token_id is None:
+            pad_token_id = self.tokenizer.eos_token_id
+        if use_prefix_cache:
+            # generate() extends the cache in place; each request gets its own copy
+            kwargs["past_key_values"] = copy.deepcopy(self.prefix_cache())
+        with torch.inference_mode():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=self.max_new_tokens,
+                do_sample=False,
+                pad_token_id=pad_token_id,
+                **kwargs,
+            )
+        return ids, output_ids[0, len(ids):].tolist()
+
+    def generate(self, snippets: Sequence[Snippet], message: str, use_prefix_cache: bool = True) -> str:
+        _, new_ids = self.generate_ids(snippets, message, use_prefix_cache)
+        return self.tokenizer.decode(new_ids, skip_special_tokens=True).strip()
+
+
+chat_engine = ChatEngine(
+    model_name=settings.CHAT_MODEL_NAME,
+    max_new_tokens=settings.CHAT_MAX_NEW_TOKENS,
+    context_tokens=settings.CHAT_CONTEXT_TOKENS,
+    snippet_tokens=settings.CHAT_SNIPPET_TOKENS,
+    inference_mode=settings.CHAT_INFERENCE_MODE,
+    num_threads=settings.CHAT_TORCH_THREADS,
+    num_interop_threads=settings.CHAT_TORCH_INTEROP_THREADS,
+)
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Measure messages/second through the configured channel layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=5000)
+        parser.add_argument("--payload", type=int, default=200, help="Payload size in bytes")
+        parser.add_argument("--group-size", type=int, default=10, help="Channels in the group_send fan-out run")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options))
+
+    async def _run(self, options):
+        layer = get_channel_layer()
+        self.stdout.write(f"layer: {type(layer).__name__}")
+        message = {"type": "chat.message", "text": "x" * options["payload"]}
+        count = options["messages"]
+        # Stay below the per-channel capacity so no send hits ChannelFull mid-run
+        window = max(1, min(count, layer.capacity // 2))
+
+        channel = await layer.new_channel()
+        receiver = asyncio.create_task(self._drain(layer, [channel], count))
+        await asyncio.sleep(0.1)
+        started = time.perf_counter()
+        for offset in range(0, count, window):
+            await asyncio.gather(*(layer.send(channel, message) for _ in range(min(window, count - offset))))
+            await asyncio.sleep(0)
+        await receiver
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"send/receive: {count} msgs of {options['payload']}B in {elapsed:.2f}s ({count / elapsed:.0f} msg/s)")
+
+        group = "benchmark"
+        members = [await layer.new_channel() for _ in range(options["group_size"])]
+        for member in members:
+            await layer.group_add(group, member)
+        sends = max(1, count // len(members))
+        receiver = asyncio.create_task(self._drain(layer, members, sends))
+        await asyncio.sleep(0.1)
+        started = time.perf_counter()
+        for offset in range(0, sends, window):
+            await asyncio.gather(*(layer.group_send(group, message) for _ in range(min(window, sends - offset))))
+            await asyncio.sleep(0)
+        await receiver
+        elapsed = time.perf_counter() - started
+        delivered = sends * len(members)
+        self.stdout.write(f"group_send:   {delivered} deliveries to {len(members)} channels in {elapsed:.2f}s ({delivered / elapsed:.0f} msg/s)")
+        for member in members:
+            await layer.group_discard(group, member)
+        if hasattr(layer, "close"):
+            await layer.close()
+
+    @staticmethod
+    async def _drain(layer, channels, per_channel):
+        async def drain_one(channel):
+            for _ in range(per_channel):
+                await layer.receive(channel)
+
+        await asyncio.gather(*(drain_one(c) for c in channels))
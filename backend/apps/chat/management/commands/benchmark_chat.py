@@ -0,0 +1,117 @@
+import resource
+import time
+from copy import deepcopy
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.chat.engine import INFERENCE_MODES, ChatEngine, chat_engine, torch
+from apps.chat.testing import PROMPTS, SNIPPETS, build_tiny_engine, next_token_agreement
+
+# Next-token agreement with fp32 a reduced-precision mode must reach
+MIN_AGREEMENT = 0.9
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def weight_mb(model) -> float:
+    """Bytes held by weights, including packed int8 linear layers."""
+
+    def size(value):
+        if isinstance(value, torch.Tensor):
+            return value.element_size() * value.nelement()
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        return 0
+
+    return sum(size(v) for v in model.state_dict().values()) / 2**20
+
+
+class Command(BaseCommand):
+    help = "Benchmark chat generation: prefix-cache parity, prefill time, tokens/second, RSS and agreement with fp32"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tiny", action="store_true", help="Use a tiny locally-constructed model instead of CHAT_MODEL_NAME")
+        parser.add_argument("--mode", choices=INFERENCE_MODES, default=settings.CHAT_INFERENCE_MODE)
+        parser.add_argument("--threads", type=int, default=settings.CHAT_TORCH_THREADS)
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--max-new-tokens", type=int, default=16)
+        parser.add_argument(
+            "--min-agreement",
+            type=float,
+            default=MIN_AGREEMENT,
+            help="Fail if next-token agreement with fp32 falls below this (loads a second fp32 copy of the model)",
+        )
+
+    def _engine(self, options, mode):
+        kwargs = {"max_new_tokens": options["max_new_tokens"], "inference_mode": mode, "num_threads": options["threads"]}
+        if options["tiny"]:
+            return build_tiny_engine(**kwargs)
+        engine = chat_engine if mode == chat_engine.inference_mode else ChatEngine(model_name=settings.CHAT_MODEL_NAME)
+        for key, value in kwargs.items():
+            setattr(engine, key, value)
+        if not engine.load():
+            raise CommandError(f"Could not load {settings.CHAT_MODEL_NAME}")
+        return engine
+
+    def handle(self, *args, **options):
+        if torch is None:
+            raise CommandError("torch and transformers are required")
+        before = rss_mb()
+        engine = self._engine(options, options["mode"])
+        self.stdout.write(
+            f"mode: {engine.inference_mode}, threads: {torch.get_num_threads()}, "
+            f"weights: {weight_mb(engine.model):.1f}MB, RSS after load: +{rss_mb() - before:.1f}MB"
+        )
+
+        mismatches = 0
+        for prompt in PROMPTS:
+            if engine.generate(SNIPPETS, prompt, use_prefix_cache=True) != engine.generate(SNIPPETS, prompt, use_prefix_cache=False):
+                mismatches += 1
+        self.stdout.write(f"outputs identical with/without cache: {len(PROMPTS) - mismatches}/{len(PROMPTS)}")
+        if mismatches:
+            raise CommandError(f"prefix cache changed the greedy output for {mismatches} of {len(PROMPTS)} prompts")
+
+        full = [engine.build_input_ids(SNIPPETS, prompt) for prompt in PROMPTS]
+        prefix_len = len(engine.prefix_ids())
+        cache = engine.prefix_cache()
+
+        def prefill(use_cache):
+            started = time.perf_counter()
+            with torch.inference_mode():
+                for ids in full:
+                    if use_cache:
+                        engine.model(input_ids=torch.tensor([ids[prefix_len:]]), past_key_values=deepcopy(cache), use_cache=True)
+                    else:
+                        engine.model(input_ids=torch.tensor([ids]), use_cache=True)
+            return time.perf_counter() - started
+
+        prefill(True), prefill(False)  # warm up
+        cold = min(prefill(False) for _ in range(options["runs"]))
+        warm = min(prefill(True) for _ in range(options["runs"]))
+        self.stdout.write(f"prompt tokens: {sum(map(len, full)) // len(full)} avg, prefix {prefix_len}")
+        self.stdout.write(f"prefill without cache: {cold / len(full) * 1000:.2f}ms/prompt")
+        self.stdout.write(f"prefill with cache:    {warm / len(full) * 1000:.2f}ms/prompt ({cold / warm:.2f}x)")
+
+        generated, started = [], time.perf_counter()
+        for prompt in PROMPTS:
+            generated.append(engine.generate_ids(SNIPPETS, prompt))
+        elapsed = time.perf_counter() - started
+        new_tokens = sum(len(new_ids) for _, new_ids in generated)
+        self.stdout.write(f"generation: {new_tokens} tokens in {elapsed:.2f}s ({new_tokens / elapsed:.1f} tokens/s)")
+        self.stdout.write(f"process RSS: {rss_mb():.1f}MB")
+
+        if engine.inference_mode == "fp32":
+            return
+        reference = self._engine(options, "fp32")
+        agreement = next_token_agreement(engine, reference, generated)
+        self.stdout.write(f"next-token agreement with fp32: {agreement:.1%}")
+        if agreement < options["min_agreement"]:
+            raise CommandError(f"{engine.inference_mode} agreement {agreement:.1%} is below {options['min_agreement']:.0%}")
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+class Command(BaseCommand):
+    help = "Drive concurrent chat and lookup requests through the ASGI stack and report throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chats", type=int, default=4, help="Concurrent chat requests kept in flight")
+        parser.add_argument("--lookups", type=int, default=500, help="Total keyword/semantic/detail lookups")
+        parser.add_argument("--concurrency", type=int, default=32, help="Concurrent lookup clients")
+        parser.add_argument("--query", default="restaurant kigali")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options))
+
+    async def _run(self, options):
+        client = AsyncClient(SERVER_NAME="localhost")
+        query = options["query"]
+        paths = [
+            f"/api/search/keyword/?query={query}",
+            f"/api/search/semantic/?query={query}",
+            "/api/businesses/",
+        ]
+        lookup_latencies = []
+        chat_latencies = []
+        remaining = options["lookups"]
+        done = asyncio.Event()
+
+        async def lookup_worker(worker_id):
+            nonlocal remaining
+            i = worker_id
+            while remaining > 0:
+                remaining -= 1
+                t0 = time.perf_counter()
+                await client.get(paths[i % len(paths)], HTTP_HOST="localhost")
+                lookup_latencies.append(time.perf_counter() - t0)
+                i += 1
+
+        async def chat_worker():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.post("/api/chat/", {"message": f"Where can I find a {query}?"}, content_type="application/json", HTTP_HOST="localhost")
+                chat_latencies.append(time.perf_counter() - t0)
+
+        # Warm the index so the first lookups don't pay for the build
+        await client.get(paths[1], HTTP_HOST="localhost")
+
+        chats = [asyncio.create_task(chat_worker()) for _ in range(options["chats"])]
+        started = time.perf_counter()
+        await asyncio.gather(*(lookup_worker(i) for i in range(options["concurrency"])))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*chats)
+
+        self.stdout.write(f"lookups:        {len(lookup_latencies)} in {elapsed:.2f}s ({len(lookup_latencies) / elapsed:.1f} req/s)")
+        self.stdout.write(f"lookup p50/p99: {_percentile(lookup_latencies, 0.5) * 1000:.1f}ms / {_percentile(lookup_latencies, 0.99) * 1000:.1f}ms")
+        self.stdout.write(f"chats:          {len(chat_latencies)} completed, p50 {_percentile(chat_latencies, 0.5) * 1000:.1f}ms")
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class ChannelMessage(models.Model):
+    """A message queued by ``core.channel_layers.PostgresChannelLayer`` until a receiver claims it."""
+
+    channel = models.CharField(max_length=100)
+    payload = models.TextField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "channel_layer_message"
+        # Receivers claim the oldest live row of their channel
+        indexes = [models.Index(fields=["channel", "id"], name="channel_layer_message_channel")]
+
+
+class ChannelGroup(models.Model):
+    """Membership of a channel in a group, renewed by every ``group_add``."""
+
+    group_name = models.CharField(max_length=100)
+    channel = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "channel_layer_group"
+        constraints = [models.UniqueConstraint(fields=["group_name", "channel"], name="channel_layer_group_member")]
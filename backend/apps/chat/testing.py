@@ -0,0 +1,61 @@
+"""Offline fixtures for the chat engine, shared by its tests and ``benchmark_chat --tiny``."""
+
+from .engine import SYSTEM_PREFIX, ChatEngine, torch
+
+PROMPTS = [
+    "Where can I eat pizza in Kigali?",
+    "Is there a hotel with a pool near the lake?",
+    "I need a pharmacy open late in Musanze",
+    "Recommend a quiet cafe to work from",
+]
+
+SNIPPETS = [
+    (1, "v1", "- Heaven Restaurant: Rooftop restaurant in Kiyovu serving pizza, grills and local dishes with city views.\n"),
+    (2, "v1", "- Lake Kivu Serena: Lakeside hotel in Rubavu with a pool, spa and conference rooms.\n"),
+    (3, "v1", "- Kigali Pharmacy: Pharmacy in Musanze town centre, open late every day.\n"),
+    (4, "v1", "- Question Coffee: Cafe in Gishushu roasting Rwandan beans, quiet upstairs seating and wifi.\n"),
+]
+
+
+def next_token_agreement(engine, reference, generated) -> float:
+    """Share of generated positions where both models pick the same next token, teacher-forced on one sequence."""
+    agree = total = 0
+    with torch.inference_mode():
+        for prompt_ids, new_ids in generated:
+            if not new_ids:
+                continue
+            input_ids = torch.tensor([prompt_ids + new_ids[:-1]])
+            start = len(prompt_ids) - 1
+            ours = engine.model(input_ids=input_ids).logits[0, start:].argmax(-1)
+            theirs = reference.model(input_ids=input_ids).logits[0, start:].argmax(-1)
+            agree += int((ours == theirs).sum())
+            total += len(new_ids)
+    return agree / total if total else 1.0
+
+
+def build_tiny_engine(**kwargs) -> ChatEngine:
+    """A randomly initialised Llama with a word-level tokenizer, built fully offline."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    corpus = [SYSTEM_PREFIX, "User: Assistant:"] + PROMPTS + [text for _, _, text in SNIPPETS]
+    tok = Tokenizer(models.WordLevel(unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.Whitespace()
+    tok.train_from_iterator(corpus, trainers.WordLevelTrainer(special_tokens=["<unk>", "<s>", "</s>"]))
+    tok.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 1)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, unk_token="<unk>", bos_token="<s>", eos_token="</s>")
+
+    # Same seed, same weights: engines built in different modes are comparable
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=tokenizer.vocab_size,
+        hidden_size=512,
+        intermediate_size=1376,
+        num_hidden_layers=4,
+        num_attention_heads=8,
+        num_key_value_heads=8,
+        max_position_embeddings=1024,
+        bos_token_id=1,
+        eos_token_id=2,
+    )
+    return ChatEngine.from_components(LlamaForCausalLM(config), tokenizer, **kwargs)
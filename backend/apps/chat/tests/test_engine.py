@@ -0,0 +1,36 @@
+import unittest
+
+from django.test import SimpleTestCase
+
+from apps.chat.engine import torch
+
+
+@unittest.skipIf(torch is None, "torch and transformers are required")
+class PrefixCacheParityTests(SimpleTestCase):
+    def test_cached_and_uncached_greedy_output_match(self):
+        from apps.chat.testing import PROMPTS, SNIPPETS, build_tiny_engine
+
+        engine = build_tiny_engine(max_new_tokens=12)
+        for prompt in PROMPTS:
+            prompt_ids, cached = engine.generate_ids(SNIPPETS, prompt, use_prefix_cache=True)
+            _, uncached = engine.generate_ids(SNIPPETS, prompt, use_prefix_cache=False)
+            self.assertTrue(cached)
+            self.assertEqual(cached, uncached, prompt)
+        # Reusing the shared prefix cache must not leak state between requests
+        self.assertEqual(engine.generate_ids(SNIPPETS, PROMPTS[0])[1], engine.generate_ids(SNIPPETS, PROMPTS[0], use_prefix_cache=False)[1])
+
+
+@unittest.skipIf(torch is None, "torch and transformers are required")
+class InferenceModeParityTests(SimpleTestCase):
+    def test_reduced_precision_modes_agree_with_fp32(self):
+        from apps.chat.management.commands.benchmark_chat import MIN_AGREEMENT
+        from apps.chat.testing import PROMPTS, SNIPPETS, build_tiny_engine, next_token_agreement
+
+        reference = build_tiny_engine(max_new_tokens=16)
+        for mode in ("int8", "bf16"):
+            with self.subTest(mode=mode):
+                engine = build_tiny_engine(max_new_tokens=16, inference_mode=mode)
+                if engine.inference_mode != mode:
+                    self.skipTest(f"{mode} is unavailable on this build of torch")
+                generated = [engine.generate_ids(SNIPPETS, prompt) for prompt in PROMPTS]
+                self.assertGreaterEqual(next_token_agreement(engine, reference, generated), MIN_AGREEMENT)
@@ -1,52 +1,54 @@
-from rest_framework import views, response, permissions
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from rest_framework import response, permissions
 from django.conf import settings
 
-from apps.searchai.views import _business_corpus
+from apps.businesses.catalog import catalog_for
+from apps.searchai.views import _ensure_index
 from apps.searchai.services import embedding_service
+from core.admission import admission_controller
+from core.async_views import AsyncAPIView
+from core.executors import run_db, run_in_executor
+from .engine import chat_engine
+
 
-try:
-    from transformers import AutoModelForCausalLM, AutoTokenizer  # type: ignore
-    import torch  # type: ignore
-except Exception:  # pragma: no cover
-    AutoModelForCausalLM = None  # type: ignore
-    AutoTokenizer = None  # type: ignore
-    torch = None  # type: ignore
+def _generate_reply(snippets, message: str) -> Optional[str]:
+    if not settings.AI_ENABLE or not chat_engine.load():
+        return None
+    try:
+        return chat_engine.generate(snippets, message)
+    except Exception:
+        return None
 
 
-class ChatView(views.APIView):
+class ChatView(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
+    async def post(self, request):
         message = request.data.get("message", "").strip()
         if not message:
             return response.Response({"reply": "Please provide a message."})
-        # Ensure index
-        if not embedding_service.id_to_pk:
-            embedding_service.build(_business_corpus())
-        related_ids = embedding_service.search(message, top_k=5)
-        context_snippets = []
-        if related_ids:
-            from apps.businesses.models import Business  # local import
-            for b in Business.objects.filter(id__in=related_ids):
-                context_snippets.append(f"- {b.name}: {b.description[:160]}")
-        context_text = "\n".join(context_snippets)
-        prompt = (
-            "You are a helpful assistant for a business finder app."
-            " Use the following businesses to answer concisely.\n" + context_text + "\nUser: " + message + "\nAssistant:"
-        )
-        if settings.AI_ENABLE and AutoModelForCausalLM is not None and AutoTokenizer is not None and torch is not None:
-            try:
-                model_name = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
-                tokenizer = AutoTokenizer.from_pretrained(model_name)
-                model = AutoModelForCausalLM.from_pretrained(model_name)
-                inputs = tokenizer(prompt, return_tensors="pt")
-                output_ids = model.generate(**inputs, max_new_tokens=128)
-                text = tokenizer.decode(output_ids[0], skip_special_tokens=True)
-                reply = text.split("Assistant:")[-1].strip()
-                return response.Response({"reply": reply})
-            except Exception:
-                pass
+        async with admission_controller.admit(request, "chat") as ticket:
+            await sync_to_async(_ensure_index)()
+            related_ids = await run_in_executor("search", embedding_service.search, message, top_k=5)
+            businesses = {}
+            snapshot = await sync_to_async(catalog_for)(request)
+            if snapshot is not None:
+                businesses = {b.id: b for b in snapshot.instances(snapshot.rows_for(related_ids))}
+            elif related_ids:
+                from apps.businesses.models import Business  # local import
+                businesses = await run_db(Business.objects.in_bulk, related_ids)
+            ranked = [businesses[bid] for bid in related_ids if bid in businesses]
+            context_text = "\n".join(f"- {b.name}: {b.description[:160]}" for b in ranked)
+            # Generation takes whole descriptions and trims by token budget instead
+            snippets = [(b.id, b.updated_at.isoformat(), f"- {b.name}: {b.description}\n") for b in ranked]
+            # Under pressure skip generation and answer from retrieval only
+            if not ticket.degraded:
+                # Generation runs on its own pool so it never blocks search scoring
+                reply = await run_in_executor("chat", _generate_reply, snippets, message)
+                if reply is not None:
+                    return response.Response({"reply": reply})
         # Fallback heuristic
         reply = "Here are some options I found:\n" + (context_text or "Try refining your query with a city or category.")
         return response.Response({"reply": reply})
-
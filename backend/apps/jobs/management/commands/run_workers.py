@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.jobs.queue import requeue_stale, work_once
+
+
+def _worker_loop(worker_id: str, poll: float, once: bool, stop: threading.Event) -> None:
+    try:
+        while not stop.is_set():
+            if work_once(worker_id):
+                continue
+            if once:
+                return
+            stop.wait(poll)
+    finally:
+        connections.close_all()
+
+
+def _process_main(worker_id: str, poll: float, once: bool) -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    _worker_loop(worker_id, poll, once, stop)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers against the database-backed queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+
+    def handle(self, *args, **options):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        workers, poll, once = options["workers"], options["poll"], options["once"]
+        self._requeue_stale()
+        self.stdout.write(f"Starting {workers} {options['mode']} worker(s)")
+
+        stop = threading.Event()
+        if options["mode"] == "process":
+            # Children must not inherit the parent's open DB connections
+            connections.close_all()
+            pool = [
+                multiprocessing.Process(target=_process_main, args=(f"{prefix}/p{i}", poll, once), daemon=True)
+                for i in range(workers)
+            ]
+        else:
+            pool = [
+                threading.Thread(target=_worker_loop, args=(f"{prefix}/t{i}", poll, once, stop), daemon=True)
+                for i in range(workers)
+            ]
+        for worker in pool:
+            worker.start()
+        try:
+            next_requeue = time.monotonic() + settings.JOB_REQUEUE_INTERVAL_SECONDS
+            while any(worker.is_alive() for worker in pool):
+                # Jobs of workers that die later, here or on other hosts, go back to the queue too
+                if time.monotonic() >= next_requeue:
+                    self._requeue_stale()
+                    next_requeue = time.monotonic() + settings.JOB_REQUEUE_INTERVAL_SECONDS
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            stop.set()
+            for worker in pool:
+                if isinstance(worker, multiprocessing.Process):
+                    worker.terminate()
+            for worker in pool:
+                worker.join()
+
+    def _requeue_stale(self) -> None:
+        try:
+            requeued = requeue_stale(settings.JOB_STALE_SECONDS)
+        finally:
+            # The supervisor only wakes up now and then; don't hold a connection meanwhile
+            connections.close_all()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
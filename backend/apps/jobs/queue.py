@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import random
+import traceback
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_handlers: Dict[str, Callable[..., Any]] = {}
+
+
+def register(name: str):
+    """Decorator registering ``func(**payload)`` as the handler for job ``name``."""
+
+    def decorator(func):
+        _handlers[name] = func
+        return func
+
+    return decorator
+
+
+def _dedupe_key(name: str, payload: dict) -> str:
+    raw = json.dumps([name, payload], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def enqueue(name: str, payload: Optional[dict] = None, dedupe: bool = False, max_attempts: int = 3) -> Job:
+    """Queue a job; with ``dedupe`` an identical pending job is returned instead."""
+    if name not in _handlers:
+        raise KeyError(f"No job handler registered for {name!r}")
+    payload = payload or {}
+    key = _dedupe_key(name, payload) if dedupe else None
+    if key is not None:
+        existing = Job.objects.filter(dedupe_key=key, status=Job.STATUS_PENDING).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(name=name, payload=payload, dedupe_key=key, max_attempts=max_attempts)
+    except IntegrityError:
+        # Lost the race to another enqueuer; theirs is the pending job now
+        return Job.objects.get(dedupe_key=key, status=Job.STATUS_PENDING)
+
+
+def claim(worker_id: str) -> Optional[Job]:
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_PENDING, run_at__lte=timezone.now())
+            .order_by("run_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.STATUS_RUNNING
+        job.locked_by = worker_id
+        job.locked_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "locked_by", "locked_at", "attempts"])
+        return job
+
+
+def execute(job: Job) -> None:
+    handler = _handlers.get(job.name)
+    try:
+        if handler is None:
+            raise KeyError(f"No job handler registered for {job.name!r}")
+        result = handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = settings.JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+            job.status = Job.STATUS_PENDING
+            job.run_at = timezone.now() + timedelta(seconds=backoff * random.uniform(0.8, 1.2))
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+        logger.warning("Job %s failed (attempt %s/%s)", job, job.attempts, job.max_attempts)
+        try:
+            job.save(update_fields=["status", "run_at", "finished_at", "last_error"])
+        except IntegrityError:
+            # An identical job was queued meanwhile; it will do the work
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "finished_at", "last_error"])
+        return
+    job.status = Job.STATUS_SUCCEEDED
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "finished_at"])
+
+
+def requeue_stale(timeout_seconds: int) -> int:
+    """Return jobs whose worker died mid-run to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff)
+    count = 0
+    for job in stale:
+        job.status = Job.STATUS_PENDING if job.attempts < job.max_attempts else Job.STATUS_FAILED
+        job.last_error = f"Worker {job.locked_by} timed out"
+        try:
+            job.save(update_fields=["status", "last_error"])
+        except IntegrityError:
+            job.status = Job.STATUS_FAILED
+            job.save(update_fields=["status", "last_error"])
+        count += 1
+    return count
+
+
+def work_once(worker_id: str) -> bool:
+    """Claim and run one job; returns False when the queue is empty."""
+    close_old_connections()
+    job = claim(worker_id)
+    if job is None:
+        return False
+    execute(job)
+    return True
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "name",
+            "payload",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "result",
+            "last_error",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,125 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.jobs import queue
+from apps.jobs.models import Job
+
+calls = []
+
+
+def record(**payload):
+    calls.append(payload)
+    return {"seen": payload}
+
+
+def fail(**payload):
+    raise RuntimeError("boom")
+
+
+@mock.patch.dict(queue._handlers, {"tests.record": record, "tests.fail": fail})
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_claim_execute(self):
+        job = queue.enqueue("tests.record", {"n": 1})
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        claimed = queue.claim("worker-1")
+        self.assertEqual((claimed.id, claimed.status, claimed.locked_by, claimed.attempts), (job.id, Job.STATUS_RUNNING, "worker-1", 1))
+        self.assertIsNone(queue.claim("worker-2"))
+        queue.execute(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.STATUS_SUCCEEDED, {"seen": {"n": 1}}))
+        self.assertEqual(calls, [{"n": 1}])
+        self.assertIsNone(queue.claim("worker-1"))
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(KeyError):
+            queue.enqueue("tests.missing")
+
+    def test_jobs_run_when_due(self):
+        job = queue.enqueue("tests.record")
+        Job.objects.filter(id=job.id).update(run_at=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(queue.claim("worker-1"))
+
+    @override_settings(JOB_RETRY_BASE_SECONDS=10)
+    def test_retries_with_backoff_until_max_attempts(self):
+        job = queue.enqueue("tests.fail", max_attempts=3)
+        for attempt, backoff in ((1, 10), (2, 20)):
+            before = timezone.now()
+            queue.execute(queue.claim("worker-1"))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, attempt))
+            self.assertIn("RuntimeError: boom", job.last_error)
+            # Exponential, with +/-20% jitter
+            delay = (job.run_at - before).total_seconds()
+            self.assertGreaterEqual(delay, backoff * 0.8 - 1)
+            self.assertLessEqual(delay, backoff * 1.2 + 1)
+            self.assertIsNone(queue.claim("worker-1"))
+            Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        queue.execute(queue.claim("worker-1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(queue.claim("worker-1"))
+
+    def test_dedupe_coalesces_pending_jobs(self):
+        first = queue.enqueue("tests.record", {"n": 1}, dedupe=True)
+        self.assertEqual(queue.enqueue("tests.record", {"n": 1}, dedupe=True).id, first.id)
+        self.assertNotEqual(queue.enqueue("tests.record", {"n": 2}, dedupe=True).id, first.id)
+        self.assertNotEqual(queue.enqueue("tests.record", {"n": 1}).id, first.id)
+        # Once it runs, the same work can be queued again
+        while queue.claim("worker-1").id != first.id:
+            pass
+        self.assertNotEqual(queue.enqueue("tests.record", {"n": 1}, dedupe=True).id, first.id)
+
+    def test_requeue_stale(self):
+        job = queue.enqueue("tests.record")
+        queue.claim("dead-worker")
+        self.assertEqual(queue.requeue_stale(60), 0)
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(queue.requeue_stale(60), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (Job.STATUS_PENDING, "Worker dead-worker timed out"))
+        self.assertEqual(queue.claim("worker-1").id, job.id)
+
+
+@mock.patch.dict(queue._handlers, {"tests.record": record, "tests.fail": fail})
+class RunWorkersTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_once_drains_the_queue(self):
+        ok = [queue.enqueue("tests.record", {"n": n}) for n in range(3)]
+        failing = queue.enqueue("tests.fail", max_attempts=1)
+        out = StringIO()
+        call_command("run_workers", "--once", "--workers", "1", stdout=out)
+        self.assertIn("Starting 1 thread worker(s)", out.getvalue())
+        self.assertEqual(sorted(c["n"] for c in calls), [0, 1, 2])
+        self.assertEqual(set(Job.objects.filter(id__in=[j.id for j in ok]).values_list("status", flat=True)), {Job.STATUS_SUCCEEDED})
+        self.assertEqual(Job.objects.get(id=failing.id).status, Job.STATUS_FAILED)
+
+    @override_settings(JOB_STALE_SECONDS=60, JOB_REQUEUE_INTERVAL_SECONDS=0)
+    def test_requeues_stale_jobs_while_running(self):
+        requeued_again = threading.Event()
+
+        def requeue_stale(timeout_seconds):
+            if requeue.call_count > 1:
+                requeued_again.set()
+            return 0
+
+        # The job outlasts the startup sweep, so only the periodic one lets it finish
+        with mock.patch.dict(queue._handlers, {"tests.wait": lambda: requeued_again.wait(10)}), mock.patch(
+            "apps.jobs.management.commands.run_workers.requeue_stale", side_effect=requeue_stale
+        ) as requeue:
+            job = queue.enqueue("tests.wait")
+            call_command("run_workers", "--once", "--workers", "1", stdout=StringIO())
+        self.assertTrue(requeued_again.is_set())
+        requeue.assert_called_with(60)
+        self.assertEqual(Job.objects.get(id=job.id).result, True)
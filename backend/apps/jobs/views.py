@@ -0,0 +1,13 @@
+from rest_framework import viewsets, permissions
+from drf_spectacular.utils import extend_schema
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+@extend_schema(tags=["jobs"])
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filterset_fields = ["status", "name"]
@@ -8,3 +8,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = ["id", "title", "message", "is_read", "created_at"]
 
+
+
+class BroadcastSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    message = serializers.CharField()
+    # All active users when omitted
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
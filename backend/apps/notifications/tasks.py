@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+
+from apps.jobs.queue import register
+from .models import Notification
+
+
+@register("notifications.fan_out")
+def fan_out(title: str, message: str, user_ids=None, batch_size: int = 1000):
+    """Create one notification per user (all active users when ``user_ids`` is omitted)."""
+    users = get_user_model().objects.filter(is_active=True)
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    created = 0
+    batch = []
+    for user_id in users.values_list("id", flat=True).iterator(chunk_size=batch_size):
+        batch.append(Notification(user_id=user_id, title=title, message=message))
+        if len(batch) >= batch_size:
+            Notification.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        Notification.objects.bulk_create(batch)
+        created += len(batch)
+    return {"created": created}
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.jobs.queue import claim, execute
+from apps.notifications.models import Notification
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.admin = users.create_user(username="admin", password="pw", is_staff=True)
+        self.alice = users.create_user(username="alice", password="pw")
+        self.bob = users.create_user(username="bob", password="pw")
+        users.create_user(username="gone", password="pw", is_active=False)
+        self.client = APIClient()
+
+    def broadcast(self, user, **data):
+        self.client.force_authenticate(user)
+        return self.client.post("/api/notifications/broadcast/", {"title": "Hello", "message": "News", **data}, format="json")
+
+    def test_fans_out_through_a_job(self):
+        response = self.broadcast(self.admin)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Notification.objects.exists())
+        # What a worker does; work_once itself would close the test transaction's connection
+        execute(claim("worker-1"))
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user__username", flat=True)), ["admin", "alice", "bob"]
+        )
+
+    def test_selected_users(self):
+        self.broadcast(self.admin, user_ids=[self.bob.id])
+        execute(claim("worker-1"))
+        self.assertEqual(list(Notification.objects.values_list("user_id", "title")), [(self.bob.id, "Hello")])
+
+    def test_admin_only(self):
+        self.assertEqual(self.broadcast(self.alice).status_code, 403)
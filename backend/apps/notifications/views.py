@@ -1,8 +1,9 @@
-from rest_framework import viewsets, permissions, decorators, response
+from rest_framework import viewsets, permissions, decorators, response, status
 from drf_spectacular.utils import extend_schema
 
+from apps.jobs.queue import enqueue
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import BroadcastSerializer, NotificationSerializer
 
 
 @extend_schema(tags=["notifications"])
@@ -20,3 +21,12 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_all_read(self, request):
         count = self.get_queryset().update(is_read=True)
         return response.Response({"updated": count})
+
+    @extend_schema(request=BroadcastSerializer)
+    @decorators.action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser])
+    def broadcast(self, request):
+        serializer = BroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # One row per recipient; written by a worker in batches
+        job = enqueue("notifications.fan_out", serializer.validated_data)
+        return response.Response({"job": job.id, "status": job.status}, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reviews.moderation import ACTIONS, moderate
+
+
+class Command(BaseCommand):
+    help = "Bulk hide, unhide or delete reviews and recompute ratings for the affected businesses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=ACTIONS)
+        parser.add_argument("--ids", type=int, nargs="+", help="Review ids")
+        parser.add_argument("--ids-file", help="File with one review id per line")
+        parser.add_argument("--user", type=int, help="All reviews by this user id")
+        parser.add_argument("--business", type=int, help="All reviews of this business id")
+
+    def handle(self, *args, **options):
+        ids = list(options["ids"] or [])
+        if options["ids_file"]:
+            with open(options["ids_file"]) as f:
+                ids.extend(int(line) for line in f if line.strip())
+        started = time.perf_counter()
+        try:
+            result = moderate(options["action"], ids=ids, user_id=options["user"], business_id=options["business"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"{result['action']}: {result['reviews']} reviews, {result['businesses']} businesses recomputed "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
@@ -0,0 +1,112 @@
+from typing import Iterable, List, Optional, Sequence, Set
+
+from django.db import connection, transaction
+
+from apps.businesses.catalog import refresh_businesses
+from apps.businesses.models import Business
+from .models import Review
+
+
+ACTIONS = ("hide", "unhide", "delete")
+
+# SQLite caps bound parameters per statement; Postgres takes the ids as one array
+SQLITE_CHUNK = 900
+# Postgres caps a statement at 65535 bound parameters; IN lists stay well below it
+POSTGRES_CHUNK = 10_000
+
+
+def _recompute_sql(placeholder: str) -> str:
+    business = connection.ops.quote_name(Business._meta.db_table)
+    review = connection.ops.quote_name(Review._meta.db_table)
+    return f"""
+        UPDATE {business}
+        SET average_rating = agg.avg, rating_count = agg.cnt
+        FROM (
+            SELECT b.id AS business_id, COALESCE(AVG(r.rating), 0) AS avg, COUNT(r.id) AS cnt
+            FROM {business} b
+            LEFT JOIN {review} r ON r.business_id = b.id AND r.is_visible
+            WHERE b.id {placeholder}
+            GROUP BY b.id
+        ) AS agg
+        WHERE {business}.id = agg.business_id
+    """
+
+
+def recompute_ratings(business_ids: Iterable[int]) -> int:
+    """Refresh ``average_rating``/``rating_count`` from visible reviews with one grouped UPDATE."""
+    ids = sorted(set(business_ids))
+    if not ids:
+        return 0
+    updated = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(_recompute_sql("= ANY(%s)"), [ids])
+            return cursor.rowcount
+        for start in range(0, len(ids), SQLITE_CHUNK):
+            chunk = ids[start:start + SQLITE_CHUNK]
+            cursor.execute(_recompute_sql(f"IN ({', '.join(['%s'] * len(chunk))})"), chunk)
+            updated += cursor.rowcount
+    return updated
+
+
+def _chunks(ids: Sequence[int]) -> List[List[int]]:
+    size = POSTGRES_CHUNK if connection.vendor == "postgresql" else SQLITE_CHUNK
+    ids = sorted(set(ids))
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+def moderation_querysets(
+    ids: Optional[Sequence[int]] = None, user_id: Optional[int] = None, business_id: Optional[int] = None
+) -> list:
+    """The selected reviews as one queryset per chunk of ``ids`` (one in total without ids)."""
+    if not ids and user_id is None and business_id is None:
+        raise ValueError("Select reviews by ids, user or business")
+    qs = Review.objects.all()
+    if user_id is not None:
+        qs = qs.filter(user_id=user_id)
+    if business_id is not None:
+        qs = qs.filter(business_id=business_id)
+    if not ids:
+        return [qs]
+    return [qs.filter(id__in=chunk) for chunk in _chunks(ids)]
+
+
+def moderate(
+    action: str,
+    ids: Optional[Sequence[int]] = None,
+    user_id: Optional[int] = None,
+    business_id: Optional[int] = None,
+) -> dict:
+    """Hide, unhide or delete the selected reviews set-wise and refresh affected businesses."""
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown moderation action {action!r}")
+    querysets = moderation_querysets(ids, user_id, business_id)
+    reviews = 0
+    affected: Set[int] = set()
+    with transaction.atomic():
+        for qs in querysets:
+            affected.update(qs.order_by().values_list("business_id", flat=True).distinct())
+            if action == "delete":
+                # No signals or dependants on Review, so this is a single DELETE
+                reviews += qs.delete()[0]
+            else:
+                reviews += qs.update(is_visible=(action == "unhide"))
+        recompute_ratings(affected)
+    business_ids = sorted(affected)
+    refresh_businesses(business_ids)
+    _refresh_suggestions(business_ids)
+    return {"action": action, "reviews": reviews, "businesses": len(business_ids)}
+
+
+def _refresh_suggestions(business_ids: List[int]) -> None:
+    # The grouped UPDATE bypasses post_save, so re-rank typeahead entries here too
+    from apps.searchai.suggest import suggest_index  # local import
+
+    if not suggest_index.ready or not business_ids:
+        return
+    for chunk in _chunks(business_ids):
+        rows = Business.objects.filter(id__in=chunk).values_list(
+            "id", "name", "city", "category_id", "average_rating", "rating_count"
+        )
+        for row in rows.iterator(chunk_size=2000):
+            suggest_index.upsert_business(*row)
@@ -4,6 +4,7 @@ from django.db.models import Avg, Count
 from django.db import models
 
 from .models import Review
+from .moderation import ACTIONS
 from apps.businesses.models import Business
 
 
@@ -34,3 +35,15 @@ class ReviewSerializer(serializers.ModelSerializer):
         business.rating_count = int(agg.get("cnt") or 0)
         business.save(update_fields=["average_rating", "rating_count"])
         return review
+
+
+class ReviewModerationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ACTIONS)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    user = serializers.IntegerField(required=False)
+    business = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get("ids") and "user" not in attrs and "business" not in attrs:
+            raise serializers.ValidationError("Select reviews by ids, user or business")
+        return attrs
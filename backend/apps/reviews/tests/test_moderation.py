@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.businesses.models import Business
+from apps.reviews import moderation
+from apps.reviews.models import Review
+
+
+class RecomputeRatingsTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.alice = users.create_user(username="alice", password="pw")
+        self.bob = users.create_user(username="bob", password="pw")
+        self.cafe = Business.objects.create(name="Cafe", average_rating=5, rating_count=9)
+        self.empty = Business.objects.create(name="Empty", average_rating=4, rating_count=3)
+
+    def test_counts_only_visible_reviews(self):
+        Review.objects.create(user=self.alice, business=self.cafe, rating=4)
+        Review.objects.create(user=self.bob, business=self.cafe, rating=1, is_visible=False)
+        self.assertEqual(moderation.recompute_ratings([self.cafe.id, self.empty.id]), 2)
+        self.cafe.refresh_from_db()
+        self.empty.refresh_from_db()
+        self.assertEqual((self.cafe.average_rating, self.cafe.rating_count), (4, 1))
+        self.assertEqual((self.empty.average_rating, self.empty.rating_count), (0, 0))
+
+    def test_chunks_long_id_lists(self):
+        Review.objects.create(user=self.alice, business=self.cafe, rating=2)
+        Review.objects.create(user=self.bob, business=self.cafe, rating=4)
+        with mock.patch.object(moderation, "SQLITE_CHUNK", 1):
+            self.assertEqual(moderation.recompute_ratings([self.cafe.id, self.empty.id, 10**6]), 2)
+        self.cafe.refresh_from_db()
+        self.assertEqual((self.cafe.average_rating, self.cafe.rating_count), (3, 2))
+
+    def test_nothing_to_do(self):
+        self.assertEqual(moderation.recompute_ratings([]), 0)
+
+
+class ModerateTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.users = [users.create_user(username=f"user{i}", password="pw") for i in range(5)]
+        self.shops = [Business.objects.create(name=f"Shop {i}") for i in range(2)]
+        self.reviews = [
+            Review.objects.create(user=user, business=shop, rating=1 + i)
+            for i, user in enumerate(self.users)
+            for shop in self.shops
+        ]
+        moderation.recompute_ratings([shop.id for shop in self.shops])
+
+    def test_hide_more_ids_than_one_chunk(self):
+        hidden = [r.id for r in self.reviews if r.rating <= 3]
+        # Either backend's chunk size, whichever this run uses
+        with mock.patch.multiple(moderation, SQLITE_CHUNK=2, POSTGRES_CHUNK=2):
+            self.assertEqual(len(moderation._chunks(hidden)), 3)
+            result = moderation.moderate("hide", ids=hidden)
+        self.assertEqual(result, {"action": "hide", "reviews": 6, "businesses": 2})
+        self.assertEqual(Review.objects.filter(is_visible=False).count(), 6)
+        for shop in self.shops:
+            shop.refresh_from_db()
+            self.assertEqual((shop.average_rating, shop.rating_count), (4.5, 2))
+
+    def test_delete_combines_ids_with_business(self):
+        ids = [r.id for r in self.reviews]
+        with mock.patch.multiple(moderation, SQLITE_CHUNK=3, POSTGRES_CHUNK=3):
+            result = moderation.moderate("delete", ids=ids, business_id=self.shops[0].id)
+        self.assertEqual(result, {"action": "delete", "reviews": 5, "businesses": 1})
+        self.assertFalse(Review.objects.filter(business=self.shops[0]).exists())
+        self.shops[0].refresh_from_db()
+        self.assertEqual(self.shops[0].rating_count, 0)
+
+    def test_requires_a_selection(self):
+        with self.assertRaises(ValueError):
+            moderation.moderate("hide")
+        with self.assertRaises(ValueError):
+            moderation.moderate("ban", ids=[1])
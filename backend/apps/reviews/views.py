@@ -1,9 +1,11 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, response
+from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from drf_spectacular.utils import extend_schema
 
 from .models import Review
-from .serializers import ReviewSerializer
+from .moderation import moderate
+from .serializers import ReviewModerationSerializer, ReviewSerializer
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -17,10 +19,14 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.filter(is_visible=True)
     serializer_class = ReviewSerializer
+    read_replica = True
+    prepare_statements = True
 
     def get_permissions(self):
         if self.action in ["list", "retrieve"]:
             return [permissions.AllowAny()]
+        if self.action == "moderate":
+            return [permissions.IsAdminUser()]
         if self.action in ["create"]:
             return [permissions.IsAuthenticated()]
         return [permissions.IsAuthenticated(), IsOwnerOrReadOnly()]
@@ -36,3 +42,13 @@ class ReviewViewSet(viewsets.ModelViewSet):
         if instance.user != self.request.user:
             raise PermissionDenied("You can only delete your own review")
         instance.delete()
+
+    @extend_schema(request=ReviewModerationSerializer)
+    @action(detail=False, methods=["post"])
+    def moderate(self, request):
+        """Bulk hide, unhide or delete reviews by ids, user and/or business."""
+        serializer = ReviewModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = moderate(data["action"], ids=data.get("ids"), user_id=data.get("user"), business_id=data.get("business"))
+        return response.Response(result)
@@ -6,3 +6,5 @@ class SearchAIConfig(AppConfig):
     name = "apps.searchai"
     verbose_name = "AI Search"
 
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,68 @@
+import os
+import random
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.searchai.services import TfidfSearchService
+from apps.searchai.sharding import ShardedIndex
+
+
+class Command(BaseCommand):
+    help = "Compare in-process and sharded multi-process semantic search throughput on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=200_000)
+        parser.add_argument("--queries", type=int, default=2_000)
+        parser.add_argument("--shards", default="1,2,4", help="comma-separated shard counts to try")
+        parser.add_argument("--workers", type=int, default=0, help="worker processes per run (0 = min(shards, cores))")
+        parser.add_argument("--clients", type=int, default=0, help="concurrent query threads (0 = cores)")
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=13)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(20_000)]
+        cities = ["Kigali", "Musanze", "Huye", "Rubavu", "Rwamagana", "Nyagatare", "Muhanga", "Karongi"]
+        pairs = [(pk, " ".join(rng.choices(vocabulary, k=rng.randint(8, 40)))) for pk in range(1, options["entries"] + 1)]
+        facets = {"city": [rng.choice(cities) for _ in pairs]}
+        queries = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 4))) for _ in range(options["queries"])]
+        clients = options["clients"] or os.cpu_count() or 1
+        top_k = options["top_k"]
+        try:
+            shard_counts = [int(n) for n in options["shards"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--shards must be comma-separated integers")
+
+        def run(service):
+            service.search_with_facets(queries[0], top_k=top_k)  # warm up workers and attachments
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                results = list(pool.map(lambda q: service.search_with_facets(q, top_k=top_k), queries))
+            return len(queries) / (time.perf_counter() - started), results
+
+        baseline = TfidfSearchService()
+        started = time.perf_counter()
+        baseline.build(pairs, facets)
+        self.stdout.write(f"entries:        {len(pairs)} (built in {time.perf_counter() - started:.1f}s)")
+        self.stdout.write(f"cores:          {os.cpu_count()}, clients: {clients}")
+        base_qps, expected = run(baseline)
+        self.stdout.write(f"in-process:     {base_qps:8.0f} q/s")
+
+        # Relative to one shard in one worker, which isolates the gain from extra cores
+        single_qps = None
+        for shards in shard_counts:
+            service = TfidfSearchService()
+            service.sharded = ShardedIndex(shards, options["workers"] or min(shards, os.cpu_count() or 1))
+            service.build(pairs, facets)
+            qps, results = run(service)
+            single_qps = single_qps or (qps if shards == 1 else None)
+            same = sum(1 for a, b in zip(expected, results) if a == b)
+            scaling = f", {qps / single_qps:.2f}x one shard" if single_qps else ""
+            self.stdout.write(
+                f"{shards} shards/{service.sharded.workers} procs: {qps:8.0f} q/s ({qps / base_qps:.2f}x in-process{scaling}), "
+                f"identical results {same}/{len(queries)}"
+            )
+            service.sharded.close()
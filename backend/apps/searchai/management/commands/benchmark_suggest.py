@@ -0,0 +1,49 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.searchai.suggest import PrefixSuggestIndex
+
+
+class Command(BaseCommand):
+    help = "Benchmark the typeahead prefix index on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=13)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        cities = ["Kigali", "Musanze", "Huye", "Rubavu", "Rwamagana", "Nyagatare", "Muhanga", "Karongi"]
+        categories = [(i, f"Category {name}") for i, name in enumerate(["Restaurant", "Hotel", "Pharmacy", "Bank", "Salon", "Garage"], 1)]
+
+        def word():
+            return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+
+        businesses = [
+            (pk, f"{word().title()} {word().title()}", rng.choice(cities), rng.choice(categories)[0], rng.uniform(1, 5), rng.randint(0, 500))
+            for pk in range(1, options["entries"] + 1)
+        ]
+
+        index = PrefixSuggestIndex()
+        started = time.perf_counter()
+        index.build(businesses, categories)
+        build_s = time.perf_counter() - started
+
+        prefixes = [word()[: rng.randint(1, 4)] for _ in range(options["queries"])]
+        timings = []
+        for prefix in prefixes:
+            t0 = time.perf_counter()
+            index.suggest(prefix, limit=8)
+            timings.append(time.perf_counter() - t0)
+        timings.sort()
+
+        stats = index.stats()
+        self.stdout.write(f"entries:         {stats['entries']}")
+        self.stdout.write(f"build:           {build_s:.2f}s")
+        self.stdout.write(f"bytes/entry:     {stats['bytes_per_entry']}")
+        self.stdout.write(f"lookup p50:      {timings[len(timings) // 2] * 1e6:.1f}us")
+        self.stdout.write(f"lookup p99:      {timings[int(len(timings) * 0.99)] * 1e6:.1f}us")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.searchai.recommendations import store_neighbours
+from apps.searchai.services import TfidfSearchService
+from apps.searchai.views import _business_corpus
+
+
+class Command(BaseCommand):
+    help = "Precompute the top-N most similar businesses for every business"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-n", type=int, default=20)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        service = TfidfSearchService()
+        service.build(_business_corpus())
+        written = store_neighbours(service, top_n=options["top_n"], chunk_size=options["chunk_size"])
+        self.stdout.write(
+            f"Stored {written} neighbours for {len(service.id_to_pk)} businesses in {time.perf_counter() - started:.1f}s"
+        )
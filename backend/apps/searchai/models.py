@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class SearchIndex(models.Model):
+    """A fitted search index published by the reindex job for every web process to load."""
+
+    data = models.BinaryField()
+    documents = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-id",)
+
+    def __str__(self) -> str:
+        return f"Search index #{self.pk} ({self.documents} documents)"
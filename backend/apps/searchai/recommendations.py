@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from django.db import transaction
+
+from apps.businesses.models import Business, SimilarBusiness
+from .services import TfidfSearchService
+
+
+def top_neighbours(service: TfidfSearchService, top_n: int = 20, chunk_size: int = 1000) -> Iterable[Tuple[int, List[Tuple[int, float]]]]:
+    """Yield ``(pk, [(similar_pk, score), ...])`` for every indexed business.
+
+    Rows are L2-normalised, so a sparse product gives cosine similarity. Working
+    in row chunks keeps the intermediate result to ``chunk_size`` sparse rows.
+    """
+    if service.matrix is None:
+        return
+    matrix = service.matrix.tocsr()
+    transposed = matrix.T.tocsc()
+    pks = service.id_to_pk
+    for start in range(0, matrix.shape[0], chunk_size):
+        block = (matrix[start:start + chunk_size] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            row = start + offset
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            cols = block.indices[lo:hi]
+            scores = block.data[lo:hi]
+            keep = (cols != row) & (scores > 0)
+            cols, scores = cols[keep], scores[keep]
+            if len(scores) > top_n:
+                part = np.argpartition(-scores, top_n - 1)[:top_n]
+                cols, scores = cols[part], scores[part]
+            order = np.argsort(-scores, kind="stable")
+            yield pks[row], [(pks[cols[i]], float(scores[i])) for i in order]
+
+
+def store_neighbours(service: TfidfSearchService, top_n: int = 20, chunk_size: int = 1000) -> int:
+    """Replace all stored neighbour lists; returns the number of rows written."""
+    written = 0
+    with transaction.atomic():
+        SimilarBusiness.objects.all().delete()
+        batch: List[SimilarBusiness] = []
+        for pk, neighbours in top_neighbours(service, top_n=top_n, chunk_size=chunk_size):
+            batch.extend(
+                SimilarBusiness(business_id=pk, similar_id=other, score=score, rank=rank)
+                for rank, (other, score) in enumerate(neighbours)
+            )
+            if len(batch) >= 5000:
+                SimilarBusiness.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            SimilarBusiness.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def merge_neighbours(seeds: Dict[int, float], limit: int = 20) -> List[int]:
+    """Blend stored neighbour lists of weighted seed businesses into one ranking."""
+    scores: Dict[int, float] = {}
+    for business_id, similar_id, score in SimilarBusiness.objects.filter(business_id__in=seeds).values_list(
+        "business_id", "similar_id", "score"
+    ):
+        if similar_id in seeds:
+            continue
+        scores[similar_id] = scores.get(similar_id, 0.0) + seeds[business_id] * score
+    return [pk for pk, _ in sorted(scores.items(), key=lambda item: -item[1])[:limit]]
+
+
+def top_rated(exclude: Iterable[int] = (), limit: int = 20) -> List[int]:
+    """Best-rated businesses outside ``exclude``; the feed for users with nothing to go on."""
+    qs = Business.objects.exclude(id__in=list(exclude)).order_by("-average_rating", "-rating_count", "id")
+    return list(qs.values_list("id", flat=True)[:limit])
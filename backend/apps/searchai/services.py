@@ -1,34 +1,273 @@
-from typing import List, Tuple
+import copy
+import io
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import joblib
+import numpy as np
 from django.conf import settings
 
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import linear_kernel
 
+from .sharding import ShardedIndex, pack_label_bits
+from .spelling import SpellingDictionary
+
+
+# Keyword queries and keyword facet bitmaps both work on runs of letters and digits
+KEYWORD_PIECE = re.compile(r"(?u)\w+")
+
+
+class FacetBitsets:
+    """Packed per-value document bitsets for one facet, aligned with ``id_to_pk``."""
+
+    def __init__(self, values: List[str]) -> None:
+        labels = sorted({v for v in values if v})
+        index = {v: i for i, v in enumerate(labels)}
+        self.labels = labels
+        self.codes = np.fromiter((index[v] if v else -1 for v in values), dtype=np.int32, count=len(values))
+        self.bits = pack_label_bits(self.codes, len(labels))
+
+    def counts(self, packed_mask: np.ndarray) -> List[dict]:
+        if not self.labels:
+            return []
+        totals = np.bitwise_count(self.bits & packed_mask).sum(axis=1)
+        order = np.argsort(-totals, kind="stable")
+        return [{"value": self.labels[i], "count": int(totals[i])} for i in order if totals[i]]
+
+
+class _Index:
+    """One fitted generation of the index. Never mutated once installed; a
+    rebuild installs a new one, so a query that took a reference sees
+    consistent vocabulary, rows, facets and shards throughout."""
+
+    def __init__(
+        self,
+        vectorizer=None,
+        matrix=None,
+        id_to_pk: Optional[List[int]] = None,
+        facets: Optional[Dict[str, FacetBitsets]] = None,
+        postings=None,
+        words=None,
+    ) -> None:
+        self.vectorizer = vectorizer if vectorizer is not None else TfidfVectorizer(stop_words="english")
+        self.matrix = matrix
+        self.id_to_pk: List[int] = id_to_pk or []
+        self.facets: Dict[str, FacetBitsets] = facets or {}
+        self.terms = np.asarray(self.vectorizer.get_feature_names_out(), dtype=str) if matrix is not None else np.array([], dtype=str)
+        # Term-major bitmaps of every word piece (stop words and single characters
+        # included, unlike the TF-IDF vocabulary) for keyword facet counts
+        self.postings = postings
+        self.words = words if words is not None else np.array([], dtype=str)
+        # Shared-memory segments of this generation when sharded
+        self.shards = None
+
 
 class TfidfSearchService:
-    def __init__(self) -> None:
-        self.vectorizer = TfidfVectorizer(stop_words="english")
-        self.matrix = None
-        self.id_to_pk: List[int] = []
+    """TF-IDF index over business documents.
+
+    With ``shards`` > 1 the rows are also published to a :class:`ShardedIndex`
+    and queries are scored there across ``shard_workers`` processes; the
+    vectorizer, spelling and keyword facets stay in this process.
+
+    Search threads read ``_index`` once per call while build, load and shard
+    rebuilds prepare a new generation on the side and swap the reference.
+    """
+
+    def __init__(self, shards: int = 0, shard_workers: int = 0) -> None:
+        self._index = _Index()
+        self._swap_lock = threading.Lock()
+        self.spelling = SpellingDictionary(max_edit_distance=settings.SEARCH_SPELLING_MAX_EDIT_DISTANCE)
+        self.sharded = ShardedIndex(shards, shard_workers or min(shards, os.cpu_count() or 1)) if shards > 1 else None
+        self.dirty_shards: Set[int] = set()
+
+    # Read-only views of the current generation
+    vectorizer = property(lambda self: self._index.vectorizer)
+    matrix = property(lambda self: self._index.matrix)
+    id_to_pk = property(lambda self: self._index.id_to_pk)
+    facets = property(lambda self: self._index.facets)
 
-    def build(self, pairs: List[Tuple[int, str]]) -> None:
+    def build(self, pairs: List[Tuple[int, str]], facets: Optional[Dict[str, List[str]]] = None) -> None:
+        """Fit the index; ``facets`` maps a facet name to per-row values aligned with ``pairs``."""
         if not pairs:
-            self.matrix = None
-            self.id_to_pk = []
+            self._install(_Index())
             return
         texts = [t for _, t in pairs]
-        self.matrix = self.vectorizer.fit_transform(texts)
-        self.id_to_pk = [pk for pk, _ in pairs]
+        vectorizer = TfidfVectorizer(stop_words="english")
+        matrix = vectorizer.fit_transform(texts)
+        words = CountVectorizer(token_pattern=KEYWORD_PIECE.pattern, binary=True, dtype=np.uint8)
+        postings = words.fit_transform(texts).tocsc()
+        bitsets = {name: FacetBitsets(values) for name, values in (facets or {}).items()}
+        self._install(
+            _Index(vectorizer, matrix, [pk for pk, _ in pairs], bitsets, postings, np.asarray(words.get_feature_names_out(), dtype=str))
+        )
+
+    def dumps(self) -> bytes:
+        """The fitted index serialized for other processes (see :meth:`loads`)."""
+        index = self._index
+        buffer = io.BytesIO()
+        joblib.dump(
+            {
+                "vectorizer": index.vectorizer,
+                "matrix": index.matrix,
+                "id_to_pk": index.id_to_pk,
+                "facets": index.facets,
+                "postings": index.postings,
+                "words": index.words,
+            },
+            buffer,
+        )
+        return buffer.getvalue()
+
+    def loads(self, data: bytes) -> None:
+        state = joblib.load(io.BytesIO(data))
+        self._install(
+            _Index(state["vectorizer"], state["matrix"], state["id_to_pk"], state["facets"], state["postings"], state["words"])
+        )
+
+    def _install(self, index: _Index) -> None:
+        if self.sharded is not None:
+            index.shards = self.sharded.publish(index.matrix, index.id_to_pk, index.facets) if index.matrix is not None else []
+        with self._swap_lock:
+            previous, self._index = self._index, index
+            self.dirty_shards.clear()
+        self._update_spelling(index)
+        if previous.shards:
+            self.sharded.retire(previous.shards)
+
+    def mark_dirty(self, pk: int) -> None:
+        """Flag the shard holding ``pk`` for :meth:`rebuild_shard`."""
+        if self.sharded is not None:
+            self.mark_dirty_shard(self.sharded.shard_of(pk))
+
+    def mark_dirty_shard(self, shard: int) -> None:
+        with self._swap_lock:
+            self.dirty_shards.add(shard)
+
+    def take_dirty_shard(self) -> Optional[int]:
+        """Unflag and return a dirty shard, before its documents are read, so later saves flag it again."""
+        with self._swap_lock:
+            return self.dirty_shards.pop() if self.dirty_shards else None
+
+    def rebuild_shard(self, shard: int, pairs: List[Tuple[int, str]], facets: Optional[Dict[str, List[str]]] = None) -> None:
+        """Re-vectorize one shard's documents with the fitted vocabulary and republish only that shard.
+
+        Idf weights, spelling and keyword facets keep the last full build until the next reindex.
+        """
+        index = self._index
+        if self.sharded is None or not index.shards:
+            return
+        matrix = index.vectorizer.transform([t for _, t in pairs]) if pairs else np.zeros((0, index.matrix.shape[1]))
+        bitsets = {name: FacetBitsets(values) for name, values in (facets or {}).items()}
+        fresh = self.sharded.publish_shard(matrix, [pk for pk, _ in pairs], {name: (b.labels, b.bits) for name, b in bitsets.items()})
+        with self._swap_lock:
+            if self._index is not index:
+                # A full build replaced the generation meanwhile
+                stale = [fresh]
+            else:
+                updated = copy.copy(index)
+                updated.shards = list(index.shards)
+                stale = [updated.shards[shard]]
+                updated.shards[shard] = fresh
+                self._index = updated
+        self.sharded.retire(stale)
+
+    def _update_spelling(self, index: _Index) -> None:
+        # Vocabulary weighted by document frequency; derived rather than stored so
+        # a reload only touches the words that changed
+        if index.matrix is None:
+            self.spelling.update({})
+            return
+        doc_freq = np.bincount(index.matrix.tocsr().indices, minlength=len(index.terms))
+        self.spelling.update({term: int(doc_freq[i]) for i, term in enumerate(index.terms) if not term.isdigit()})
+
+    def correct(self, query: str) -> str:
+        """``query`` with misspelled terms replaced by the closest indexed word."""
+        return self.spelling.correct(query, skip=self.vectorizer.get_stop_words() or ())
+
+    def keyword_terms(self, query: str) -> List[str]:
+        """Word pieces of ``query`` minus stop words (all of them if nothing else is left).
+
+        Splitting on punctuation as well as whitespace makes a piece unable to
+        span a separator, so "some field contains it" (the database filter) and
+        "some indexed word contains it" (the facet bitmaps) pick the same rows.
+        """
+        stop_words = self.vectorizer.get_stop_words() or ()
+        terms = KEYWORD_PIECE.findall(query)
+        return [t for t in terms if t.lower() not in stop_words] or terms
+
+    @contextmanager
+    def _generation(self) -> Iterator[_Index]:
+        """The current index, with its shard segments held until the block exits."""
+        if self.sharded is None:
+            yield self._index
+            return
+        # Acquired under the swap lock: a generation swapped out afterwards is
+        # retired only after that, so its segments outlive this search
+        with self._swap_lock:
+            index = self._index
+            shards = index.shards or []
+            self.sharded.acquire(shards)
+        try:
+            yield index
+        finally:
+            self.sharded.release(shards)
 
     def search(self, query: str, top_k: int = 10) -> List[int]:
-        if not self.matrix or not self.id_to_pk:
-            return []
-        qv = self.vectorizer.transform([query])
-        cosine = linear_kernel(qv, self.matrix).ravel()
+        with self._generation() as index:
+            if index.matrix is None or not index.id_to_pk:
+                return []
+            query_vector = index.vectorizer.transform([query])
+            if index.shards is not None:
+                return self.sharded.search(index.shards, query_vector, top_k)[0]
+        cosine = linear_kernel(query_vector, index.matrix).ravel()
         top_indices = cosine.argsort()[::-1][:top_k]
-        return [self.id_to_pk[i] for i in top_indices]
+        return [index.id_to_pk[i] for i in top_indices]
+
+    def search_with_facets(self, query: str, top_k: int = 10) -> Tuple[List[int], Dict[str, List[dict]]]:
+        """Top-k ids plus facet counts over every document that matched the query."""
+        with self._generation() as index:
+            if index.matrix is None or not index.id_to_pk:
+                return [], {}
+            query_vector = index.vectorizer.transform([query])
+            if index.shards is not None:
+                return self.sharded.search(index.shards, query_vector, top_k, positive_only=True, with_facets=True)
+        cosine = linear_kernel(query_vector, index.matrix).ravel()
+        top_indices = cosine.argsort()[::-1][:top_k]
+        ids = [index.id_to_pk[i] for i in top_indices if cosine[i] > 0]
+        return ids, self._facet_counts(index, cosine > 0)
+
+    @staticmethod
+    def _keyword_mask(index: _Index, terms: Iterable[str]) -> np.ndarray:
+        # A term's bitmap is the union of the postings of every indexed word
+        # containing it, so prefixes and fragments match like ``icontains`` does
+        mask = np.ones(len(index.id_to_pk), dtype=bool)
+        for term in terms:
+            if index.postings is None or not mask.any():
+                break
+            cols = np.flatnonzero(np.char.find(index.words, term.lower()) >= 0)
+            hits = np.zeros(len(index.id_to_pk), dtype=bool)
+            hits[index.postings[:, cols].indices] = True
+            mask &= hits
+        return mask
+
+    def keyword_facets(self, terms: Iterable[str]) -> Dict[str, List[dict]]:
+        """Facet counts over every document containing all keyword ``terms`` (all documents if none)."""
+        index = self._index
+        if not index.facets:
+            return {}
+        return self._facet_counts(index, self._keyword_mask(index, terms))
+
+    @staticmethod
+    def _facet_counts(index: _Index, mask: np.ndarray) -> Dict[str, List[dict]]:
+        if not index.facets:
+            return {}
+        packed = np.packbits(mask)
+        return {name: bitsets.counts(packed) for name, bitsets in index.facets.items()}
 
 
 # For now use TF-IDF backend to keep builds fast and reliable on Railway
-embedding_service = TfidfSearchService()
+embedding_service = TfidfSearchService(shards=settings.SEARCH_SHARDS, shard_workers=settings.SEARCH_SHARD_WORKERS)
@@ -0,0 +1,254 @@
+import atexit
+import heapq
+import itertools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Shard workers import this module alone; keep Django out of the top level.
+
+# (dtype, shape, byte offset) of each array in a shard's segment
+Layout = Dict[str, Tuple[str, Tuple[int, ...], int]]
+
+
+# -- worker side ------------------------------------------------------------
+# shard -> (segment name, shm, postings by term, business ids, facet bits)
+_attached: Dict[int, tuple] = {}
+
+
+def _open(shard: int, name: str, layout: Layout):
+    entry = _attached.get(shard)
+    if entry is not None and entry[0] == name:
+        return entry[2:]
+    if entry is not None:
+        old_shm = entry[1]
+        del _attached[shard], entry
+        try:
+            old_shm.close()
+        except BufferError:
+            pass
+    # Spawned workers share the parent's resource tracker, which already owns the segment
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = {
+        key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        for key, (dtype, shape, offset) in layout.items()
+    }
+    pks = arrays.pop("pks")
+    indptr = arrays.pop("indptr")
+    postings = sparse.csc_matrix(
+        (arrays.pop("data"), arrays.pop("indices"), indptr), shape=(len(pks), len(indptr) - 1), copy=False
+    )
+    bits = {key[len("facet:"):]: value for key, value in arrays.items()}
+    _attached[shard] = (name, shm, postings, pks, bits)
+    return postings, pks, bits
+
+
+def search_shard(
+    shard: int,
+    name: str,
+    layout: Layout,
+    cols: np.ndarray,
+    vals: np.ndarray,
+    top_k: int,
+    positive_only: bool,
+    with_facets: bool,
+) -> Tuple[List[float], List[int], Dict[str, List[int]]]:
+    """Top ``top_k`` (scores, ids) of one shard, best first, plus per-label facet counts of its matches."""
+    postings, pks, bits = _open(shard, name, layout)
+    if len(cols):
+        scores = np.asarray(postings[:, cols] @ vals).ravel()
+    else:
+        scores = np.zeros(len(pks))
+    rows = np.flatnonzero(scores > 0) if positive_only else np.arange(len(pks))
+    if len(rows) > top_k:
+        rows = rows[np.argpartition(-scores[rows], top_k - 1)[:top_k]]
+    rows = rows[np.lexsort((pks[rows], -scores[rows]))]
+    counts: Dict[str, List[int]] = {}
+    if with_facets and bits:
+        packed = np.packbits(scores > 0)
+        counts = {key: np.bitwise_count(value & packed).sum(axis=1).tolist() for key, value in bits.items()}
+    return scores[rows].tolist(), pks[rows].tolist(), counts
+
+
+# -- parent side ------------------------------------------------------------
+def pack_label_bits(codes: np.ndarray, labels: int) -> np.ndarray:
+    """``labels`` x rows packed bitsets from per-row label indexes (-1 = no label)."""
+    bits = np.zeros((labels, (len(codes) + 7) // 8), dtype=np.uint8)
+    rows = np.flatnonzero(codes >= 0)
+    # Same big-endian bit order as np.packbits, one bit per labelled row
+    np.bitwise_or.at(bits, (codes[rows], rows >> 3), (0x80 >> (rows & 7)).astype(np.uint8))
+    return bits
+
+
+class _Shard:
+    def __init__(self, shm: shared_memory.SharedMemory, layout: Layout, labels: Dict[str, List[str]], size: int) -> None:
+        self.shm = shm
+        self.layout = layout
+        self.labels = labels
+        self.size = size
+        # Searches in flight; a retired segment is unlinked once this drops to zero
+        self.refs = 0
+        self.retired = False
+
+
+def _publish(arrays: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, Layout]:
+    layout: Layout = {}
+    offset = 0
+    for key, value in arrays.items():
+        layout[key] = (value.dtype.str, value.shape, offset)
+        offset += (value.nbytes + 7) // 8 * 8
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for key, value in arrays.items():
+        dtype, shape, start = layout[key]
+        np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=start)[...] = value
+    return shm, layout
+
+
+class ShardedIndex:
+    """TF-IDF rows partitioned by business id across a pool of worker processes.
+
+    Each shard's postings (term-major), ids and facet bitsets sit in one
+    shared-memory segment that workers map read-only, so any worker can serve
+    any shard. A query is scattered to every shard and the per-shard top-k
+    lists are merged with a heap. ``publish`` returns a generation (one
+    segment per shard) that the caller searches and later retires; a shard
+    can be republished on its own into a copy of the list. Callers
+    ``acquire`` a generation before searching it and ``release`` it after,
+    and a retired segment stays linked until its last search releases it.
+    """
+
+    def __init__(self, shards: int, workers: int) -> None:
+        self.shards = shards
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._segments: Dict[str, _Shard] = {}
+        atexit.register(self.close)
+
+    def shard_of(self, pk: int) -> int:
+        return pk % self.shards
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: forking a threaded server process is unsafe
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+        return self._pool
+
+    def publish(self, matrix, pks: Sequence[int], facets: Optional[Dict[str, object]] = None) -> List[_Shard]:
+        """Partition a fitted row matrix (aligned with ``pks``) into a new generation of shards."""
+        pks = np.asarray(pks, dtype=np.int64)
+        matrix = sparse.csr_matrix(matrix)
+        published = []
+        for shard in range(self.shards):
+            rows = np.flatnonzero(pks % self.shards == shard)
+            published.append(
+                self.publish_shard(
+                    matrix[rows],
+                    pks[rows],
+                    {name: (f.labels, pack_label_bits(f.codes[rows], len(f.labels))) for name, f in (facets or {}).items()},
+                )
+            )
+        return published
+
+    def publish_shard(self, matrix, pks: Sequence[int], facets: Dict[str, Tuple[List[str], np.ndarray]]) -> _Shard:
+        """One shard's segment; ``facets`` maps a name to (labels, packed label x row bitsets)."""
+        postings = sparse.csc_matrix(matrix, dtype=np.float32)
+        postings.sort_indices()
+        arrays = {
+            "pks": np.asarray(pks, dtype=np.int64),
+            "data": postings.data,
+            "indices": postings.indices.astype(np.int32, copy=False),
+            "indptr": postings.indptr.astype(np.int64, copy=False),
+        }
+        labels = {}
+        for name, (names, bits) in facets.items():
+            arrays[f"facet:{name}"] = np.asarray(bits, dtype=np.uint8)
+            labels[name] = list(names)
+        shm, layout = _publish(arrays)
+        published = _Shard(shm, layout, labels, len(arrays["pks"]))
+        with self._lock:
+            self._segments[shm.name] = published
+        return published
+
+    def acquire(self, shards: Sequence[_Shard]) -> None:
+        """Keep ``shards`` linked until the matching :meth:`release`."""
+        with self._lock:
+            for s in shards:
+                s.refs += 1
+
+    def release(self, shards: Sequence[_Shard]) -> None:
+        with self._lock:
+            for s in shards:
+                s.refs -= 1
+            stale = [s for s in shards if s.retired and not s.refs]
+        self._unlink(stale)
+
+    def retire(self, shards: Sequence[_Shard]) -> None:
+        """Release segments the caller no longer hands to new searches."""
+        with self._lock:
+            for s in shards:
+                s.retired = True
+            stale = [s for s in shards if not s.refs]
+        self._unlink(stale)
+
+    def _unlink(self, shards: Sequence[_Shard]) -> None:
+        # Workers that mapped a segment keep their mapping until they attach its successor
+        for s in shards:
+            with self._lock:
+                if self._segments.pop(s.shm.name, None) is None:
+                    continue
+            s.shm.close()
+            s.shm.unlink()
+
+    def search(
+        self, shards: Sequence[_Shard], query_vector, top_k: int, positive_only: bool = False, with_facets: bool = False
+    ) -> Tuple[List[int], Dict[str, List[dict]]]:
+        """Scatter one ``1 x vocabulary`` query to every shard of an acquired generation and merge the results."""
+        published = [(shard, s) for shard, s in enumerate(shards) if s.size]
+        if not published:
+            return [], {}
+        query_vector = sparse.csr_matrix(query_vector)
+        cols = query_vector.indices.astype(np.int32)
+        vals = query_vector.data.astype(np.float32)
+        executor = self._executor()
+        futures = [
+            executor.submit(search_shard, shard, s.shm.name, s.layout, cols, vals, top_k, positive_only, with_facets)
+            for shard, s in published
+        ]
+        results = [f.result() for f in futures]
+        # Each list is already sorted by (-score, id)
+        merged = heapq.merge(*[zip([-score for score in scores], pks) for scores, pks, _ in results])
+        ids = [pk for _, pk in itertools.islice(merged, top_k)]
+        facets: Dict[str, List[dict]] = {}
+        if with_facets:
+            totals: Dict[str, Dict[str, int]] = {}
+            for (_, s), (_, _, counts) in zip(published, results):
+                for name, values in counts.items():
+                    bucket = totals.setdefault(name, {})
+                    for label, count in zip(s.labels[name], values):
+                        bucket[label] = bucket.get(label, 0) + count
+            facets = {
+                name: [{"value": label, "count": count} for label, count in sorted(bucket.items(), key=lambda item: (-item[1], item[0])) if count]
+                for name, bucket in totals.items()
+            }
+        return ids, facets
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+            segments = list(self._segments.values())
+            self._segments = {}
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for s in segments:
+            s.shm.close()
+            try:
+                s.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.businesses.models import Business, Category
+from core.invalidation import RECONNECTED, invalidation_bus
+
+from .services import embedding_service
+from .suggest import refresh_suggestions, suggest_index
+from .views import schedule_shard_rebuild
+
+# Fields the search documents and their facets are built from (see views._business_documents)
+INDEXED_FIELDS = frozenset({"name", "description", "city", "country", "category", "category_id"})
+
+
+def _reindex_business(pk: int) -> None:
+    if embedding_service.sharded is not None:
+        embedding_service.mark_dirty(pk)
+        transaction.on_commit(schedule_shard_rebuild)
+
+
+@receiver(post_save, sender=Business)
+def update_business_suggestions(sender, instance, update_fields=None, **kwargs):
+    suggest_index.upsert_business(
+        instance.id, instance.name, instance.city, instance.category_id, instance.average_rating, instance.rating_count
+    )
+    # Rating refreshes save with update_fields and leave the documents alone
+    if update_fields is None or not INDEXED_FIELDS.isdisjoint(update_fields):
+        _reindex_business(instance.id)
+
+
+@receiver(post_delete, sender=Business)
+def remove_business_suggestions(sender, instance, **kwargs):
+    suggest_index.remove_business(instance.id)
+    _reindex_business(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggestions(sender, instance, **kwargs):
+    suggest_index.upsert_category(instance.id, instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_suggestions(sender, instance, **kwargs):
+    suggest_index.remove_category(instance.id)
+
+
+def _on_category(payload: dict) -> None:
+    if payload["name"] is None:
+        suggest_index.remove_category(payload["id"])
+    else:
+        suggest_index.upsert_category(payload["id"], payload["name"])
+
+
+# Saves in other processes arrive as the catalog's change broadcasts (see businesses.catalog)
+invalidation_bus.subscribe("catalog.businesses", lambda payload: refresh_suggestions(suggest_index, payload["ids"]))
+invalidation_bus.subscribe("catalog.category", _on_category)
+invalidation_bus.subscribe(RECONNECTED, lambda payload: suggest_index.expire())
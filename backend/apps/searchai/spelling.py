@@ -0,0 +1,180 @@
+import bisect
+import re
+import threading
+from typing import Collection, Dict, List, Optional, Set, Union
+
+TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+# Words shorter than this are left alone; too many near neighbours to guess
+MIN_TERM_LENGTH = 3
+
+
+def osa_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Optimal string alignment distance, or None once it exceeds ``max_distance``."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return None
+        previous2, previous = previous, current
+    distance = previous[len(b)]
+    return distance if distance <= max_distance else None
+
+
+class _Table:
+    def __init__(self) -> None:
+        self.words: List[Optional[str]] = []
+        self.counts: List[int] = []
+        self.ids: Dict[str, int] = {}
+        # delete variant -> word id, or a list of ids when several words share it
+        self.deletes: Dict[str, Union[int, List[int]]] = {}
+        # Known words in order, for prefix checks
+        self.sorted_words: List[str] = []
+
+
+class SpellingDictionary:
+    """Symmetric-delete (SymSpell) spelling corrector over the index vocabulary.
+
+    Every word's deletes (of its first ``prefix_length`` characters, up to
+    ``max_edit_distance``) map back to the word, so a lookup only generates
+    the query term's deletes and checks the few words sharing one. Ties on
+    distance go to the word found in more documents.
+    """
+
+    def __init__(self, max_edit_distance: int = 2, prefix_length: int = 7) -> None:
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self._lock = threading.Lock()
+        # Updates only append or blank entries in place, and compaction swaps in a
+        # new table, so lookups read without the lock
+        self._table = _Table()
+
+    def __len__(self) -> int:
+        return len(self._table.ids)
+
+    def _variants(self, word: str, max_distance: int) -> Set[str]:
+        key = word[: self.prefix_length]
+        variants = {key}
+        frontier = [key]
+        for _ in range(max_distance):
+            next_frontier = []
+            for item in frontier:
+                if len(item) <= 1:
+                    continue
+                for i in range(len(item)):
+                    deleted = item[:i] + item[i + 1:]
+                    if deleted not in variants:
+                        variants.add(deleted)
+                        next_frontier.append(deleted)
+            frontier = next_frontier
+        return variants
+
+    def _add(self, table: _Table, word: str, count: int) -> None:
+        word_id = len(table.words)
+        table.words.append(word)
+        table.counts.append(count)
+        table.ids[word] = word_id
+        for variant in self._variants(word, self.max_edit_distance):
+            entry = table.deletes.get(variant)
+            if entry is None:
+                table.deletes[variant] = word_id
+            elif isinstance(entry, int):
+                table.deletes[variant] = [entry, word_id]
+            else:
+                entry.append(word_id)
+
+    def _discard(self, table: _Table, word: str) -> None:
+        word_id = table.ids.pop(word)
+        table.words[word_id] = None
+        table.counts[word_id] = 0
+        for variant in self._variants(word, self.max_edit_distance):
+            entry = table.deletes.get(variant)
+            if entry == word_id:
+                del table.deletes[variant]
+            elif isinstance(entry, list):
+                entry.remove(word_id)
+                if len(entry) == 1:
+                    table.deletes[variant] = entry[0]
+
+    def update(self, counts: Dict[str, int]) -> None:
+        """Make the dictionary match ``counts``, touching only words that came or went."""
+        with self._lock:
+            table = self._table
+            for word in [w for w in table.ids if w not in counts]:
+                self._discard(table, word)
+            for word, count in counts.items():
+                word_id = table.ids.get(word)
+                if word_id is None:
+                    self._add(table, word, count)
+                else:
+                    table.counts[word_id] = count
+            # Ids of discarded words are never reused; compact once they dominate
+            if len(table.words) > 2 * max(len(table.ids), 1024):
+                fresh = _Table()
+                for word, word_id in table.ids.items():
+                    self._add(fresh, word, table.counts[word_id])
+                self._table = table = fresh
+            table.sorted_words = sorted(table.ids)
+
+    def is_prefix(self, term: str) -> bool:
+        """Whether some known word starts with ``term``."""
+        words = self._table.sorted_words
+        i = bisect.bisect_left(words, term)
+        return i < len(words) and words[i].startswith(term)
+
+    def lookup(self, term: str) -> Optional[str]:
+        """The closest known word to ``term`` (itself if known), or None."""
+        table = self._table
+        if term in table.ids:
+            return term
+        if len(term) < MIN_TERM_LENGTH:
+            return None
+        max_distance = 1 if len(term) <= 4 else self.max_edit_distance
+        best, best_key = None, None
+        seen: Set[int] = set()
+        for variant in self._variants(term, max_distance):
+            entry = table.deletes.get(variant)
+            if entry is None:
+                continue
+            for word_id in (entry,) if isinstance(entry, int) else tuple(entry):
+                if word_id in seen:
+                    continue
+                seen.add(word_id)
+                word = table.words[word_id]
+                if word is None:
+                    continue
+                distance = osa_distance(term, word, max_distance)
+                if distance is None:
+                    continue
+                key = (distance, -table.counts[word_id], word)
+                if best_key is None or key < best_key:
+                    best, best_key = word, key
+        return best
+
+    def correct(self, query: str, skip: Collection[str] = ()) -> str:
+        """``query`` with unknown terms replaced by their correction; other text is kept as typed.
+
+        A term that starts a known word ("pharm" of "pharmacy") is unfinished
+        rather than misspelled, and is kept too.
+        """
+
+        def replace(match):
+            original = match.group(0)
+            term = original.lower()
+            if term in skip or term.isdigit() or self.is_prefix(term):
+                return original
+            corrected = self.lookup(term)
+            return original if corrected is None or corrected == term else corrected
+
+        return TOKEN_RE.sub(replace, query)
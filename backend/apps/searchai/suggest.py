@@ -0,0 +1,294 @@
+import math
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+KIND_BUSINESS = 0
+KIND_CATEGORY = 1
+KIND_CITY = 2
+KIND_NAMES = {KIND_BUSINESS: "business", KIND_CATEGORY: "category", KIND_CITY: "city"}
+
+# Upper bound of the key space for a prefix range lookup
+_PREFIX_END = "\U0010ffff"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _ref(kind: int, ident: int) -> int:
+    return (ident << 2) | kind
+
+
+def _business_score(average_rating: float, rating_count: int) -> float:
+    return float(average_rating or 0) * math.log1p(rating_count or 0) + math.log1p(rating_count or 0)
+
+
+def _group_score(count: int) -> float:
+    return 5.0 * math.log1p(count)
+
+
+class PrefixSuggestIndex:
+    """Sorted-array prefix index over business names, categories and cities.
+
+    Keys are kept in a sorted Python list; refs and scores live in parallel
+    ``array`` buffers so inserts stay cheap and lookups can rank a prefix range
+    through a zero-copy NumPy view.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._reset()
+        self.ready = False
+
+    # -- building -------------------------------------------------------
+    def build(self, businesses: List[Tuple[int, str, str, Optional[int], float, int]], categories: List[Tuple[int, str]]) -> None:
+        """Rebuild from ``(pk, name, city, category_id, avg_rating, rating_count)`` rows and ``(pk, name)`` categories."""
+        with self._lock:
+            self._reset()
+            rows: List[Tuple[str, int, float]] = []
+            for pk, name in categories:
+                self._category_names[pk] = name
+                self._category_counts[pk] = 0
+            for pk, name, city, category_id, avg, cnt in businesses:
+                city_key = _normalize(city or "")
+                self._business_state[pk] = (city_key, category_id)
+                if category_id in self._category_counts:
+                    self._category_counts[category_id] += 1
+                if city_key:
+                    city_id = self._intern_city(city_key, city)
+                    self._city_counts[city_id] = self._city_counts.get(city_id, 0) + 1
+                ref = _ref(KIND_BUSINESS, pk)
+                self._labels[ref] = name
+                score = _business_score(avg, cnt)
+                rows.extend((key, ref, score) for key in self._keys_for(name))
+            for pk, name in self._category_names.items():
+                ref = _ref(KIND_CATEGORY, pk)
+                self._labels[ref] = name
+                score = _group_score(self._category_counts[pk])
+                rows.extend((key, ref, score) for key in self._keys_for(name))
+            for city_id, count in self._city_counts.items():
+                ref = _ref(KIND_CITY, city_id)
+                rows.extend((key, ref, _group_score(count)) for key in self._keys_for(self._labels[ref]))
+            rows.sort(key=lambda r: r[0])
+            self._keys = [r[0] for r in rows]
+            self._refs = array("q", (r[1] for r in rows))
+            self._scores = array("d", (r[2] for r in rows))
+            self.ready = True
+
+    def _reset(self) -> None:
+        self._keys: List[str] = []
+        self._refs = array("q")
+        self._scores = array("d")
+        self._labels: Dict[int, str] = {}
+        # Per business: (normalized city, category id) to adjust group counts
+        self._business_state: Dict[int, Tuple[str, Optional[int]]] = {}
+        self._category_names: Dict[int, str] = {}
+        self._category_counts: Dict[int, int] = {}
+        self._city_ids: Dict[str, int] = {}
+        self._city_counts: Dict[int, int] = {}
+
+    @staticmethod
+    def _keys_for(label: str) -> List[str]:
+        # Full label plus every later word start, so "hotel" finds "Serena Hotel"
+        words = _normalize(label).split(" ")
+        if not words or not words[0]:
+            return []
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _intern_city(self, city_key: str, label: str) -> int:
+        city_id = self._city_ids.get(city_key)
+        if city_id is None:
+            city_id = len(self._city_ids) + 1
+            self._city_ids[city_key] = city_id
+            self._labels[_ref(KIND_CITY, city_id)] = label.strip()
+        return city_id
+
+    # -- incremental maintenance ---------------------------------------
+    def _insert(self, ref: int, label: str, score: float) -> None:
+        for key in self._keys_for(label):
+            pos = bisect_left(self._keys, key)
+            self._keys.insert(pos, key)
+            self._refs.insert(pos, ref)
+            self._scores.insert(pos, score)
+
+    def _remove(self, ref: int, label: str) -> None:
+        for key in self._keys_for(label):
+            pos = bisect_left(self._keys, key)
+            while pos < len(self._keys) and self._keys[pos] == key:
+                if self._refs[pos] == ref:
+                    del self._keys[pos]
+                    del self._refs[pos]
+                    del self._scores[pos]
+                    break
+                pos += 1
+
+    def _rescore(self, ref: int, score: float) -> None:
+        label = self._labels.get(ref)
+        if label is None:
+            return
+        self._remove(ref, label)
+        self._insert(ref, label, score)
+
+    def _adjust_category(self, category_id: Optional[int], delta: int) -> None:
+        if category_id is None or category_id not in self._category_counts:
+            return
+        self._category_counts[category_id] += delta
+        self._rescore(_ref(KIND_CATEGORY, category_id), _group_score(self._category_counts[category_id]))
+
+    def _adjust_city(self, city_key: str, label: str, delta: int) -> None:
+        if not city_key:
+            return
+        city_id = self._intern_city(city_key, label)
+        ref = _ref(KIND_CITY, city_id)
+        count = self._city_counts.get(city_id, 0) + delta
+        if count <= 0:
+            self._city_counts.pop(city_id, None)
+            self._remove(ref, self._labels[ref])
+            return
+        if city_id in self._city_counts:
+            self._remove(ref, self._labels[ref])
+        self._city_counts[city_id] = count
+        self._insert(ref, self._labels[ref], _group_score(count))
+
+    def upsert_business(self, pk: int, name: str, city: str, category_id: Optional[int], average_rating: float, rating_count: int) -> None:
+        with self._lock:
+            if not self.ready:
+                return
+            self.remove_business(pk)
+            ref = _ref(KIND_BUSINESS, pk)
+            self._labels[ref] = name
+            self._insert(ref, name, _business_score(average_rating, rating_count))
+            city_key = _normalize(city or "")
+            self._business_state[pk] = (city_key, category_id)
+            self._adjust_city(city_key, city or "", +1)
+            self._adjust_category(category_id, +1)
+
+    def remove_business(self, pk: int) -> None:
+        with self._lock:
+            if not self.ready:
+                return
+            state = self._business_state.pop(pk, None)
+            ref = _ref(KIND_BUSINESS, pk)
+            label = self._labels.pop(ref, None)
+            if label is not None:
+                self._remove(ref, label)
+            if state is not None:
+                city_key, category_id = state
+                self._adjust_city(city_key, city_key, -1)
+                self._adjust_category(category_id, -1)
+
+    def upsert_category(self, pk: int, name: str) -> None:
+        with self._lock:
+            if not self.ready:
+                return
+            ref = _ref(KIND_CATEGORY, pk)
+            old = self._labels.get(ref)
+            if old is not None:
+                self._remove(ref, old)
+            self._category_names[pk] = name
+            self._category_counts.setdefault(pk, 0)
+            self._labels[ref] = name
+            self._insert(ref, name, _group_score(self._category_counts[pk]))
+
+    def remove_category(self, pk: int) -> None:
+        with self._lock:
+            if not self.ready:
+                return
+            ref = _ref(KIND_CATEGORY, pk)
+            label = self._labels.pop(ref, None)
+            if label is not None:
+                self._remove(ref, label)
+            self._category_names.pop(pk, None)
+            self._category_counts.pop(pk, None)
+
+    def expire(self) -> None:
+        """Drop the index; the next suggest request rebuilds it from the database."""
+        with self._lock:
+            self.ready = False
+
+    # -- querying -------------------------------------------------------
+    def suggest(self, prefix: str, limit: int = 8) -> List[dict]:
+        q = _normalize(prefix)
+        if not q or limit <= 0:
+            return []
+        with self._lock:
+            lo = bisect_left(self._keys, q)
+            hi = bisect_left(self._keys, q + _PREFIX_END, lo)
+            if lo >= hi:
+                return []
+            scores = np.frombuffer(self._scores, dtype=np.float64)[lo:hi]
+            # Over-fetch so duplicates from word-start keys can be dropped
+            want = min(len(scores), limit * 3)
+            if want < len(scores):
+                part = np.argpartition(-scores, want - 1)[:want]
+            else:
+                part = np.arange(len(scores))
+            order = part[np.argsort(-scores[part], kind="stable")]
+            results: List[dict] = []
+            seen = set()
+            for i in order:
+                ref = self._refs[lo + int(i)]
+                if ref in seen:
+                    continue
+                seen.add(ref)
+                kind = ref & 3
+                results.append({
+                    "type": KIND_NAMES[kind],
+                    "id": None if kind == KIND_CITY else ref >> 2,
+                    "label": self._labels[ref],
+                    "score": round(float(scores[i]), 4),
+                })
+                if len(results) >= limit:
+                    break
+            return results
+
+    def stats(self) -> dict:
+        """Approximate memory footprint of the index buffers."""
+        with self._lock:
+            entries = len(self._keys)
+            key_bytes = sys.getsizeof(self._keys) + sum(sys.getsizeof(k) for k in self._keys)
+            array_bytes = self._refs.buffer_info()[1] * self._refs.itemsize + self._scores.buffer_info()[1] * self._scores.itemsize
+            label_bytes = sys.getsizeof(self._labels) + sum(sys.getsizeof(v) for v in self._labels.values())
+            total = key_bytes + array_bytes + label_bytes
+            return {
+                "entries": entries,
+                "bytes": total,
+                "bytes_per_entry": round(total / entries, 1) if entries else 0,
+            }
+
+
+def load_suggest_index(index: PrefixSuggestIndex) -> None:
+    from apps.businesses.models import Business, Category
+
+    businesses = list(
+        Business.objects.values_list("id", "name", "city", "category_id", "average_rating", "rating_count")
+    )
+    categories = list(Category.objects.values_list("id", "name"))
+    index.build(businesses, categories)
+
+
+def refresh_suggestions(index: PrefixSuggestIndex, pks: List[int]) -> None:
+    """Re-read businesses ``pks`` into ``index``, dropping ones no longer in the database."""
+    from apps.businesses.models import Business
+
+    if not index.ready or not pks:
+        return
+    rows = Business.objects.filter(id__in=pks).values_list(
+        "id", "name", "city", "category_id", "average_rating", "rating_count"
+    )
+    found = set()
+    for row in rows:
+        index.upsert_business(*row)
+        found.add(row[0])
+    for pk in pks:
+        if pk not in found:
+            index.remove_business(pk)
+
+
+suggest_index = PrefixSuggestIndex()
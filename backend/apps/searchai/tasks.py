@@ -0,0 +1,33 @@
+from django.db import transaction
+
+from apps.jobs.queue import enqueue, register
+from core.invalidation import invalidation_bus
+from .models import SearchIndex
+from .recommendations import store_neighbours
+from .services import TfidfSearchService
+
+
+@register("searchai.reindex")
+def reindex():
+    from .views import _business_documents  # local import
+
+    # Published through the database: the worker may run in another container
+    service = TfidfSearchService()
+    service.build(*_business_documents())
+    with transaction.atomic():
+        published = SearchIndex.objects.create(data=service.dumps(), documents=len(service.id_to_pk))
+        SearchIndex.objects.filter(id__lt=published.id).delete()
+        # Web processes load it, and rebuild their suggest index, once this commits
+        invalidation_bus.publish("search.index", {"id": published.id})
+    # Neighbour lists follow the corpus the index was built from
+    enqueue("searchai.compute_similar", dedupe=True)
+    return {"indexed": len(service.id_to_pk), "index": published.id}
+
+
+@register("searchai.compute_similar")
+def compute_similar(top_n: int = 20, chunk_size: int = 1000):
+    from .views import _business_corpus  # local import
+
+    service = TfidfSearchService()
+    service.build(_business_corpus())
+    return {"neighbours": store_neighbours(service, top_n=top_n, chunk_size=chunk_size)}
@@ -0,0 +1,128 @@
+import threading
+from multiprocessing import shared_memory
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from scipy import sparse
+
+from apps.businesses.models import Business
+from apps.searchai import signals, views
+from apps.searchai.models import SearchIndex
+from apps.searchai.services import TfidfSearchService
+from apps.searchai.sharding import ShardedIndex
+from apps.searchai.suggest import suggest_index
+from apps.searchai.tasks import reindex
+
+
+class PublishedIndexTests(TestCase):
+    def setUp(self):
+        views.embedding_service.build([])
+        views._index_state["id"] = 0
+
+    def test_web_process_loads_index_published_by_job(self):
+        pharmacy = Business.objects.create(name="Kigali Pharmacy", city="Kigali", description="medicine")
+        result = reindex()
+        self.assertEqual(result["indexed"], 1)
+        views._ensure_index()
+        self.assertEqual(views._index_state["id"], result["index"])
+        self.assertEqual(views.embedding_service.search("pharmacy"), [pharmacy.id])
+        self.assertTrue(suggest_index.ready)
+        self.assertIn("Kigali Pharmacy", [s["label"] for s in suggest_index.suggest("kig")])
+
+        bakery = Business.objects.create(name="Huye Bakery", city="Huye", description="bread")
+        newer = reindex()
+        self.assertEqual(list(SearchIndex.objects.values_list("id", flat=True)), [newer["index"]])
+        self.assertTrue(views._load_published_index())
+        self.assertEqual(views.embedding_service.search("bread", top_k=1), [bakery.id])
+        self.assertFalse(views._load_published_index())
+
+
+class IndexSwapTests(SimpleTestCase):
+    def test_searches_see_one_generation_while_rebuilding(self):
+        first = [(pk, f"alpha shop number{pk}") for pk in range(1, 60)]
+        second = [(pk, f"alpha store branch{pk} extra words") for pk in range(1000, 1200)]
+        service = TfidfSearchService()
+        service.build(first, {"city": ["Kigali"] * len(first)})
+        errors = []
+        stop = threading.Event()
+
+        def search():
+            while not stop.is_set():
+                try:
+                    ids, facets = service.search_with_facets("alpha", top_k=5)
+                    generations = {pk < 1000 for pk in ids}
+                    if len(generations) != 1 or facets["city"][0]["count"] not in (len(first), len(second)):
+                        errors.append((ids, facets))
+                except Exception as exc:  # noqa: BLE001
+                    errors.append(exc)
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(30):
+            pairs = second if i % 2 == 0 else first
+            service.build(pairs, {"city": ["Kigali"] * len(pairs)})
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class ShardLifetimeTests(SimpleTestCase):
+    def test_retired_segment_outlives_searches_holding_it(self):
+        sharded = ShardedIndex(shards=2, workers=1)
+        self.addCleanup(sharded.close)
+        first = sharded.publish(sparse.identity(4, format="csr"), [1, 2, 3, 4])
+        sharded.acquire(first)
+        sharded.retire(first)
+        # Still attachable by name while a search holds it
+        for shard in first:
+            shared_memory.SharedMemory(name=shard.shm.name).close()
+        sharded.release(first)
+        for shard in first:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=shard.shm.name)
+
+        second = sharded.publish(sparse.identity(4, format="csr"), [1, 2, 3, 4])
+        sharded.retire(second)
+        self.assertEqual(sharded._segments, {})
+
+
+class DirtyShardTests(TestCase):
+    def setUp(self):
+        self.service = TfidfSearchService(shards=2, shard_workers=1)
+        self.addCleanup(self.service.sharded.close)
+        patcher = mock.patch.object(signals, "embedding_service", self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_indexed_field_changes_mark_shard(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            business = Business.objects.create(name="Kigali Pharmacy")
+        self.assertEqual(self.service.dirty_shards, {business.id % 2})
+        self.assertIn(views.schedule_shard_rebuild, callbacks)
+
+        self.service.dirty_shards.clear()
+        business.average_rating, business.rating_count = 4.5, 2
+        business.save(update_fields=["average_rating", "rating_count"])
+        self.assertEqual(self.service.dirty_shards, set())
+        business.save(update_fields=["city"])
+        self.assertEqual(self.service.dirty_shards, {business.id % 2})
+
+    def test_rebuild_runs_in_background(self):
+        pairs = [(pk, f"shop number{pk}") for pk in range(1, 9)]
+        self.service.build(pairs)
+        self.assertEqual(self.service.search("number1", top_k=1), [1])
+        self.service.mark_dirty(3)
+        with mock.patch.object(views, "embedding_service", self.service), \
+                mock.patch.object(views, "_business_documents", return_value=([(3, "shop number1")], None)), \
+                self.settings(SEARCH_SHARD_REBUILD_DELAY_SECONDS=0):
+            views.schedule_shard_rebuild()
+            self.assertTrue(views._index_state["rebuilding"])
+            for thread in threading.enumerate():
+                if thread.name == "search-shard-rebuild":
+                    thread.join(10)
+        self.assertFalse(views._index_state["rebuilding"])
+        self.assertEqual(self.service.dirty_shards, set())
+        # Shard 1 now holds just business 3, re-vectorized from its new text
+        self.assertEqual(self.service.search("number1", top_k=1), [3])
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.businesses.models import Business, SimilarBusiness
+from apps.favorites.models import Favorite, ViewHistory
+from apps.jobs.models import Job
+from apps.jobs.queue import claim, execute
+from apps.searchai.recommendations import merge_neighbours, store_neighbours, top_neighbours
+from apps.searchai.services import TfidfSearchService
+from apps.searchai.tasks import reindex
+
+
+class NeighbourTests(TestCase):
+    def setUp(self):
+        self.service = TfidfSearchService()
+        self.service.build(
+            [
+                (1, "bakery bread cakes"),
+                (2, "bakery bread"),
+                (3, "bakery pastries"),
+                (4, "hotel rooms"),
+            ]
+        )
+
+    def test_neighbours_ordered_by_similarity(self):
+        neighbours = dict(top_neighbours(self.service, top_n=5, chunk_size=2))
+        self.assertEqual([pk for pk, _ in neighbours[1]], [2, 3])
+        scores = [score for _, score in neighbours[1]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # Never itself, and nothing without a shared term
+        self.assertEqual(neighbours[4], [])
+        self.assertEqual([pk for pk, _ in dict(top_neighbours(self.service, top_n=1))[1]], [2])
+
+    def test_store_replaces_all_lists(self):
+        for pk in range(1, 5):
+            Business.objects.create(id=pk, name=f"Business {pk}")
+        SimilarBusiness.objects.create(business_id=4, similar_id=1, score=1.0, rank=0)
+        self.assertEqual(store_neighbours(self.service, top_n=1), 3)
+        self.assertEqual(
+            list(SimilarBusiness.objects.order_by("business_id").values_list("business_id", "similar_id", "rank")),
+            [(1, 2, 0), (2, 1, 0), (3, 2, 0)],
+        )
+
+
+@override_settings(CATALOG_ENABLED=False)
+class ForYouTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="alice", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        names = ["viewed", "favorite", "near viewed", "near favorite", "near both", "top rated", "unrated"]
+        ratings = [5, 5, 3, 3, 3, 4.9, 0]
+        self.b = {name: Business.objects.create(name=name, average_rating=rating) for name, rating in zip(names, ratings)}
+
+    def link(self, source, target, score):
+        SimilarBusiness.objects.create(business=self.b[source], similar=self.b[target], score=score, rank=0)
+
+    def feed(self, **params):
+        response = self.client.get("/api/businesses/for-you/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.json()]
+
+    def test_new_user_gets_top_rated(self):
+        self.assertEqual(self.feed(limit=3), ["viewed", "favorite", "top rated"])
+
+    def test_favorites_weigh_double_and_interactions_are_excluded(self):
+        ViewHistory.objects.create(user=self.user, business=self.b["viewed"])
+        Favorite.objects.create(user=self.user, business=self.b["favorite"])
+        self.link("viewed", "near viewed", 0.9)
+        self.link("favorite", "near favorite", 0.5)
+        self.link("viewed", "near both", 0.2)
+        self.link("favorite", "near both", 0.2)
+        # Seeds point at each other too; neither comes back
+        self.link("viewed", "favorite", 0.99)
+        self.link("favorite", "viewed", 0.99)
+        self.assertEqual(
+            merge_neighbours({self.b["viewed"].id: 1.0, self.b["favorite"].id: 2.0}),
+            [self.b["near favorite"].id, self.b["near viewed"].id, self.b["near both"].id],
+        )
+        # 2 x 0.5 beats 0.9, and both seeds add up (0.2 + 2 x 0.2); the rest is
+        # topped up with the best rated the user has not seen
+        self.assertEqual(self.feed(limit=5), ["near favorite", "near viewed", "near both", "top rated", "unrated"])
+
+    def test_similar_in_rank_order(self):
+        for rank, name in enumerate(["near both", "near viewed"]):
+            SimilarBusiness.objects.create(business=self.b["viewed"], similar=self.b[name], score=1 - rank / 10, rank=rank)
+        response = self.client.get(f"/api/businesses/{self.b['viewed'].id}/similar/")
+        self.assertEqual([row["name"] for row in response.json()], ["near both", "near viewed"])
+
+
+class ComputeSimilarJobTests(TestCase):
+    def test_reindex_queues_neighbour_refresh(self):
+        bread = Business.objects.create(name="Huye Bakery", description="bread")
+        more_bread = Business.objects.create(name="Kigali Bakery", description="bread")
+        reindex()
+        reindex()
+        job = Job.objects.get(name="searchai.compute_similar")
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        execute(claim("worker-1"))
+        self.assertEqual(list(SimilarBusiness.objects.filter(business=bread).values_list("similar_id", flat=True)), [more_bread.id])
@@ -0,0 +1,102 @@
+from django.test import SimpleTestCase, TestCase
+
+from apps.businesses.models import Business, Category
+from apps.searchai.suggest import PrefixSuggestIndex, load_suggest_index, suggest_index
+from core.invalidation import RECONNECTED, invalidation_bus
+
+
+def deliver(topic, payload):
+    # The handlers the listener thread would run for a message from another process
+    for handler in invalidation_bus._handlers.get(topic, ()):
+        handler(payload)
+
+
+def labels(results):
+    return [r["label"] for r in results]
+
+
+class PrefixRankingTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixSuggestIndex()
+        self.index.build(
+            [
+                (1, "Kigali Serena Hotel", "Kigali", 10, 4.8, 120),
+                (2, "Kigali Budget Inn", "Kigali", 10, 3.1, 4),
+                (3, "Kivu Lodge", "Rubavu", 10, 4.5, 30),
+                (4, "Huye Bakery", "Huye", 11, 4.0, 10),
+            ],
+            [(10, "Hotels"), (11, "Bakeries")],
+        )
+
+    def test_ranks_prefix_matches_by_score(self):
+        results = self.index.suggest("kig", limit=5)
+        self.assertEqual(labels(results), ["Kigali Serena Hotel", "Kigali Budget Inn", "Kigali"])
+        self.assertEqual([r["type"] for r in results], ["business", "business", "city"])
+        scores = [r["score"] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_matches_word_starts_once_each(self):
+        self.assertEqual(labels(self.index.suggest("hotel")), ["Kigali Serena Hotel", "Hotels"])
+        self.assertEqual(labels(self.index.suggest("KIVU  lo")), ["Kivu Lodge"])
+        self.assertEqual(self.index.suggest("ki", limit=1)[0]["label"], "Kigali Serena Hotel")
+        self.assertEqual(self.index.suggest("zzz"), [])
+        self.assertEqual(self.index.suggest("  "), [])
+
+    def test_group_scores_follow_membership(self):
+        (before,) = [r for r in self.index.suggest("hotels") if r["type"] == "category"]
+        self.index.upsert_business(4, "Huye Bakery", "Huye", 10, 4.0, 10)
+        (after,) = [r for r in self.index.suggest("hotels") if r["type"] == "category"]
+        self.assertGreater(after["score"], before["score"])
+        self.index.remove_business(4)
+        self.assertEqual(self.index.suggest("huye"), [])
+
+
+class SuggestSignalTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Pharmacy")
+        self.business = Business.objects.create(name="Kigali Pharmacy", city="Kigali", category=self.category)
+        load_suggest_index(suggest_index)
+        self.addCleanup(suggest_index.expire)
+
+    def test_business_add_update_delete(self):
+        added = Business.objects.create(name="Huye Bakery", city="Huye")
+        self.assertEqual(labels(suggest_index.suggest("huye")), ["Huye", "Huye Bakery"])
+        added.name = "Butare Bakery"
+        added.save()
+        self.assertEqual(labels(suggest_index.suggest("huye b")), [])
+        self.assertEqual(labels(suggest_index.suggest("butare")), ["Butare Bakery"])
+        added.delete()
+        self.assertEqual(suggest_index.suggest("butare"), [])
+        self.assertEqual(suggest_index.suggest("huye"), [])
+
+    def test_category_rename_and_delete(self):
+        self.category.name = "Chemist"
+        self.category.save()
+        self.assertEqual(labels(suggest_index.suggest("chem")), ["Chemist"])
+        self.assertEqual(labels(suggest_index.suggest("pharmacy")), ["Kigali Pharmacy"])
+        self.category.delete()
+        self.assertEqual(suggest_index.suggest("chem"), [])
+
+    def test_changes_from_other_processes(self):
+        # Written elsewhere: no signal fires here, only the broadcast arrives
+        Business.objects.filter(id=self.business.id).update(name="Kigali Chemist", average_rating=5, rating_count=3)
+        added = Business.objects.bulk_create([Business(name="Musanze Lodge", city="Musanze")])[0]
+        deliver("catalog.businesses", {"ids": [self.business.id, added.id]})
+        self.assertEqual(labels(suggest_index.suggest("kigali c")), ["Kigali Chemist"])
+        self.assertEqual(labels(suggest_index.suggest("musanze l")), ["Musanze Lodge"])
+
+        Business.objects.filter(id=added.id).delete()
+        deliver("catalog.businesses", {"ids": [added.id]})
+        self.assertEqual(suggest_index.suggest("musanze l"), [])
+
+        deliver("catalog.category", {"id": self.category.id, "name": "Drugstore"})
+        self.assertEqual(labels(suggest_index.suggest("drug")), ["Drugstore"])
+        deliver("catalog.category", {"id": self.category.id, "name": None})
+        self.assertEqual(suggest_index.suggest("drug"), [])
+
+    def test_reconnect_rebuilds_on_next_request(self):
+        deliver(RECONNECTED, {})
+        self.assertFalse(suggest_index.ready)
+        got = self.client.get("/api/search/suggest/", {"q": "kigali p"})
+        self.assertEqual(labels(got.json()["suggestions"]), ["Kigali Pharmacy"])
+        self.assertTrue(suggest_index.ready)
@@ -0,0 +1,59 @@
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+
+from apps.businesses.models import Business
+from apps.searchai.views import KeywordSearchView, _build_index, embedding_service
+
+
+@override_settings(CATALOG_ENABLED=False)
+class SpellingCorrectionTests(TransactionTestCase):
+    def setUp(self):
+        self.pharmacy = Business.objects.create(name="Kigali Pharmacy", city="Kigali", description="medicine")
+        self.farm = Business.objects.create(name="Green Farm", city="Musanze", description="vegetables")
+        self.bakery = Business.objects.create(name="Huye Bakery", city="Huye", description="bread")
+        _build_index()
+        self.client = AsyncClient()
+
+    async def test_matching_query_is_not_rewritten(self):
+        # An unfinished word is not a typo
+        self.assertEqual(embedding_service.correct("pharm"), "pharm")
+        self.assertEqual(embedding_service.correct("pharmcy"), "pharmacy")
+        for path in ("/api/search/keyword/", "/api/search/semantic/"):
+            got = (await self.client.get(path, {"query": "pharm"})).json()
+            if path.endswith("keyword/"):
+                self.assertEqual([r["id"] for r in got["results"]], [self.pharmacy.id])
+                self.assertEqual(got["facets"]["city"], [{"value": "Kigali", "count": 1}])
+            self.assertIsNone(got["did_you_mean"])
+
+    async def test_correction_applies_when_nothing_matches(self):
+        for path in ("/api/search/keyword/", "/api/search/semantic/"):
+            got = (await self.client.get(path, {"query": "bakry"})).json()
+            self.assertEqual([r["id"] for r in got["results"]], [self.bakery.id])
+            self.assertEqual(got["did_you_mean"], "bakery")
+
+    async def test_exact_query_has_no_hint(self):
+        got = (await self.client.get("/api/search/keyword/", {"query": "farm"})).json()
+        self.assertEqual([r["id"] for r in got["results"]], [self.farm.id])
+        self.assertIsNone(got["did_you_mean"])
+
+
+class KeywordFacetConsistencyTests(TestCase):
+    def test_facets_count_exactly_the_matching_rows(self):
+        for name, city, description in [
+            ("Serena 5-star Hotel", "Kigali", "pool and spa"),
+            ("Five Star Motel", "Huye", "a 5 minute walk"),
+            ("The Hut", "Kigali", "it is what it is"),
+            ("O'Neill's Pub", "Musanze", "irish-style bar"),
+            ("Star Bakery", "Rubavu", "bread, cakes & more"),
+        ]:
+            Business.objects.create(name=name, city=city, description=description)
+        _build_index()
+        # Punctuation, stop words and one-character pieces are where the index and the database used to disagree
+        for query in ["5-star", "star", "the", "it is", "o'neill", "irish-style", "a", "5", "&", "hut kigali", ""]:
+            with self.subTest(query=query):
+                terms = embedding_service.keyword_terms(query)
+                page = KeywordSearchView._page_ids(terms)
+                cities = {}
+                for city in Business.objects.filter(id__in=page).values_list("city", flat=True):
+                    cities[city] = cities.get(city, 0) + 1
+                facets = embedding_service.keyword_facets(terms)
+                self.assertEqual({f["value"]: f["count"] for f in facets["city"]}, cities)
@@ -1,10 +1,10 @@
 from django.urls import path
 
-from .views import KeywordSearchView, SemanticSearchView, ReindexView
+from .views import KeywordSearchView, SemanticSearchView, SuggestView, ReindexView
 
 urlpatterns = [
     path("keyword/", KeywordSearchView.as_view(), name="keyword-search"),
     path("semantic/", SemanticSearchView.as_view(), name="semantic-search"),
+    path("suggest/", SuggestView.as_view(), name="search-suggest"),
     path("reindex/", ReindexView.as_view(), name="reindex"),
 ]
-
@@ -1,37 +1,189 @@
-from typing import List
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
 
-from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
 from rest_framework import views, response, permissions, status
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
+from apps.businesses.catalog import catalog_for
 from apps.businesses.models import Business
+from core.admission import admission_controller
+from core.async_views import AsyncAPIView
+from core.db_routing import use_replica
+from core.executors import run_db, run_in_executor
+from core.invalidation import RECONNECTED, invalidation_bus
+from apps.jobs.queue import enqueue
+from .models import SearchIndex
 from .services import embedding_service
+from .suggest import suggest_index, load_suggest_index
 
 
-def _business_corpus() -> List[tuple[int, str]]:
+logger = logging.getLogger(__name__)
+
+
+def _business_documents(shard: Optional[int] = None) -> tuple[List[tuple[int, str]], Dict[str, List[str]]]:
     pairs: List[tuple[int, str]] = []
-    for b in Business.objects.all():
-        text = f"{b.name}. {b.description} {b.city} {b.country} {b.category.name if b.category else ''}"
-        pairs.append((b.id, text))
-    return pairs
+    facets: Dict[str, List[str]] = {"category": [], "city": []}
+    qs = Business.objects.select_related("category")
+    if shard is not None:
+        qs = qs.alias(shard=F("id") % embedding_service.sharded.shards).filter(shard=shard)
+    # A full build is a table scan, kept off the primary when replicas are configured; a
+    # shard rebuild follows a write it must see, and a lagging replica could miss it
+    with use_replica() if shard is None else nullcontext():
+        for b in qs:
+            category = b.category.name if b.category else ""
+            text = f"{b.name}. {b.description} {b.city} {b.country} {category}"
+            pairs.append((b.id, text))
+            facets["category"].append(category)
+            facets["city"].append(b.city.strip())
+    return pairs, facets
+
+
+def _business_corpus() -> List[tuple[int, str]]:
+    return _business_documents()[0]
+
+
+def _build_index() -> None:
+    embedding_service.build(*_business_documents())
+
+
+KEYWORD_PAGE_SIZE = 50
+
+_index_state = {"id": 0, "checked": 0.0, "reloading": False, "rebuilding": False}
+_index_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def _load_published_index() -> bool:
+    """Install the newest index the reindex job published, if newer than ours, and rebuild the suggest index."""
+    published = SearchIndex.objects.filter(id__gt=_index_state["id"]).order_by("-id").first()
+    if published is None:
+        return False
+    embedding_service.loads(bytes(published.data))
+    _index_state["id"] = published.id
+    # Refreshed together, as the in-process reindex endpoint used to do
+    load_suggest_index(suggest_index)
+    return True
+
+
+def _reload_in_background() -> None:
+    try:
+        _load_published_index()
+    except Exception:
+        logger.exception("Loading the published search index failed")
+    finally:
+        _index_state["reloading"] = False
+        close_old_connections()
+
+
+def _schedule_reload(payload: Optional[dict] = None) -> None:
+    # Searches keep using the current index while the new one loads
+    with _index_lock:
+        if _index_state["reloading"]:
+            return
+        _index_state["reloading"] = True
+    threading.Thread(target=_reload_in_background, name="search-index-reload", daemon=True).start()
+
+
+invalidation_bus.subscribe("search.index", _schedule_reload)
+invalidation_bus.subscribe(RECONNECTED, _schedule_reload)
+
+
+def _ensure_index() -> None:
+    if not embedding_service.id_to_pk:
+        # First use: the published index, or an in-process build if the job never ran
+        with _build_lock:
+            if not embedding_service.id_to_pk and not _load_published_index():
+                _build_index()
+        _index_state["checked"] = time.monotonic()
+        invalidation_bus.start()
+        return
+    # New indexes are announced on the bus; polling every SEARCH_INDEX_RELOAD_SECONDS covers missed ones
+    now = time.monotonic()
+    if now - _index_state["checked"] >= settings.SEARCH_INDEX_RELOAD_SECONDS:
+        _index_state["checked"] = now
+        if SearchIndex.objects.filter(id__gt=_index_state["id"]).exists():
+            _schedule_reload()
+
+
+def _rebuild_dirty_shards() -> None:
+    # Saves come in bursts (imports, admin edits); let them collect into one pass per shard
+    time.sleep(settings.SEARCH_SHARD_REBUILD_DELAY_SECONDS)
+    try:
+        while True:
+            with _index_lock:
+                shard = embedding_service.take_dirty_shard()
+                if shard is None:
+                    _index_state["rebuilding"] = False
+                    return
+            try:
+                embedding_service.rebuild_shard(shard, *_business_documents(shard))
+            except Exception:
+                embedding_service.mark_dirty_shard(shard)
+                with _index_lock:
+                    _index_state["rebuilding"] = False
+                logger.exception("Rebuilding search shard %s failed", shard)
+                return
+    finally:
+        close_old_connections()
+
+
+def schedule_shard_rebuild() -> None:
+    """Re-vectorize the shards whose businesses changed, on a background thread."""
+    with _index_lock:
+        if _index_state["rebuilding"] or not embedding_service.dirty_shards:
+            return
+        _index_state["rebuilding"] = True
+    threading.Thread(target=_rebuild_dirty_shards, name="search-shard-rebuild", daemon=True).start()
 
 
 @extend_schema(tags=["search"], parameters=[OpenApiParameter(name="query", required=False, type=str)])
-class KeywordSearchView(views.APIView):
+class KeywordSearchView(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
+    read_replica = True
+    prepare_statements = True
 
-    def get(self, request):
-        query = request.query_params.get("query", "")
+    @staticmethod
+    def _page_ids(terms: List[str]) -> List[int]:
         qs = Business.objects.all()
-        if query:
+        # Every term must appear in some field, so word order and extra words don't break matches
+        for term in terms:
             qs = qs.filter(
-                Q(name__icontains=query)
-                | Q(description__icontains=query)
-                | Q(city__icontains=query)
-                | Q(country__icontains=query)
-                | Q(category__name__icontains=query)
+                Q(name__icontains=term)
+                | Q(description__icontains=term)
+                | Q(city__icontains=term)
+                | Q(country__icontains=term)
+                | Q(category__name__icontains=term)
             )
-        qs = qs.order_by("-average_rating", "-rating_count")[:50]
+        return list(qs.order_by("-average_rating", "-rating_count").values_list("id", flat=True)[:KEYWORD_PAGE_SIZE])
+
+    async def get(self, request):
+        query = request.query_params.get("query", "")
+        await sync_to_async(_ensure_index)()
+        # The query as typed wins: a prefix like "pharm" is a valid search, not a typo
+        terms = embedding_service.keyword_terms(query)
+        page_ids = await run_db(self._page_ids, terms)
+        did_you_mean = None
+        if not page_ids:
+            corrected = embedding_service.correct(query)
+            if corrected != query:
+                did_you_mean = corrected
+                terms = embedding_service.keyword_terms(corrected)
+                page_ids = await run_db(self._page_ids, terms)
+        # Counted over all matches from the index's term bitmaps, not by loading every matching id
+        facets = await run_in_executor("search", embedding_service.keyword_facets, terms)
+        snapshot = await sync_to_async(catalog_for)(request)
+        if snapshot is not None:
+            qs = snapshot.instances(snapshot.rows_for(page_ids))
+        else:
+            businesses = await run_db(Business.objects.in_bulk, page_ids)
+            qs = [businesses[pk] for pk in page_ids if pk in businesses]
         data = [
             {
                 "id": b.id,
@@ -44,23 +196,35 @@ class KeywordSearchView(views.APIView):
             }
             for b in qs
         ]
-        return response.Response({"results": data})
+        return response.Response({"results": data, "facets": facets, "did_you_mean": did_you_mean})
 
 
 @extend_schema(tags=["search"], parameters=[OpenApiParameter(name="query", required=True, type=str), OpenApiParameter(name="top_k", required=False, type=int)])
-class SemanticSearchView(views.APIView):
+class SemanticSearchView(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def get(self, request):
+    async def get(self, request):
         query = request.query_params.get("query", "")
-        top_k = int(request.query_params.get("top_k", "10"))
+        try:
+            top_k = min(max(int(request.query_params.get("top_k", "10")), 1), settings.SEMANTIC_SEARCH_MAX_TOP_K)
+        except ValueError:
+            top_k = 10
         if not query:
-            return response.Response({"results": []})
-        # Build index lazily
-        if not embedding_service.id_to_pk:
-            embedding_service.build(_business_corpus())
-        ids = embedding_service.search(query, top_k=top_k)
-        businesses = {b.id: b for b in Business.objects.filter(id__in=ids)}
+            return response.Response({"results": [], "facets": {}, "did_you_mean": None})
+        async with admission_controller.admit(request, "semantic"):
+            await sync_to_async(_ensure_index)()
+            ids, facets = await run_in_executor("search", embedding_service.search_with_facets, query, top_k=top_k)
+            did_you_mean = None
+            if not ids:
+                corrected = embedding_service.correct(query)
+                if corrected != query:
+                    did_you_mean = corrected
+                    ids, facets = await run_in_executor("search", embedding_service.search_with_facets, corrected, top_k=top_k)
+        snapshot = await sync_to_async(catalog_for)(request)
+        if snapshot is not None:
+            businesses = {b.id: b for b in snapshot.instances(snapshot.rows_for(ids))}
+        else:
+            businesses = await run_db(Business.objects.in_bulk, ids)
         results = [
             {
                 "id": bid,
@@ -74,7 +238,26 @@ class SemanticSearchView(views.APIView):
             for bid in ids
             if bid in businesses
         ]
-        return response.Response({"results": results})
+        return response.Response({"results": results, "facets": facets, "did_you_mean": did_you_mean})
+
+
+@extend_schema(tags=["search"], parameters=[OpenApiParameter(name="q", required=True, type=str), OpenApiParameter(name="limit", required=False, type=int)])
+class SuggestView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(max(int(request.query_params.get("limit", "8")), 1), 20)
+        except ValueError:
+            limit = 8
+        if not query.strip():
+            return response.Response({"query": query, "suggestions": []})
+        # Build index lazily; signals and bus broadcasts keep it current afterwards
+        if not suggest_index.ready:
+            load_suggest_index(suggest_index)
+            invalidation_bus.start()
+        return response.Response({"query": query, "suggestions": suggest_index.suggest(query, limit=limit)})
 
 
 @extend_schema(tags=["search"])
@@ -82,5 +265,6 @@ class ReindexView(views.APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def post(self, request):
-        embedding_service.build(_business_corpus())
-        return response.Response({"indexed": len(embedding_service.id_to_pk)}, status=status.HTTP_201_CREATED)
+        # Repeated requests coalesce into the one pending reindex job
+        job = enqueue("searchai.reindex", dedupe=True)
+        return response.Response({"job": job.id, "status": job.status}, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,23 @@
+import os
+
+import django
+import pytest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def django_test_databases():
+    # Same test databases as ``manage.py test``; Django's TestCase classes never touch the real ones
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+    setup_test_environment()
+    config = setup_databases(verbosity=0, interactive=False)
+    yield
+    from core.invalidation import invalidation_bus
+
+    # Its LISTEN connection would keep the test database from being dropped
+    invalidation_bus.stop()
+    teardown_databases(config, verbosity=0)
+    teardown_test_environment()
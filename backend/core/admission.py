@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None  # type: ignore
+
+
+MAX_PROCESSES = 64
+BUCKET_PROBES = 16
+
+_PROC_DTYPE = np.dtype([("pid", "<i8"), ("units", "<f8")])
+_BUCKET_DTYPE = np.dtype([("key", "<u8"), ("tokens", "<f8"), ("stamp", "<f8")])
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server is busy, please retry shortly."
+    default_code = "overloaded"
+
+    def __init__(self, wait: float, detail=None, code=None) -> None:
+        super().__init__(detail, code)
+        self.wait = max(1, int(wait + 0.999))
+
+
+class Ticket:
+    def __init__(self, controller: "AdmissionController", cost: float, degraded: bool) -> None:
+        self.controller = controller
+        self.cost = cost
+        self.degraded = degraded
+
+
+class AdmissionController:
+    """Cost-weighted admission shared by every worker process on the host.
+
+    Per-client token buckets and the per-process in-flight table live in one
+    shared-memory segment guarded by an ``flock``; a crashed worker's in-flight
+    units are reclaimed once its pid is gone.
+    """
+
+    def __init__(self, name: str, bucket_slots: int = 4096) -> None:
+        self.name = name
+        self.bucket_slots = bucket_slots
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._shm = None
+        self._procs = None
+        self._buckets = None
+
+    # -- shared state ---------------------------------------------------
+    def _attach(self) -> None:
+        if self._procs is not None:
+            return
+        size = MAX_PROCESSES * _PROC_DTYPE.itemsize + self.bucket_slots * _BUCKET_DTYPE.itemsize
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=self.name)
+        # The segment outlives any single worker; don't let the tracker unlink it
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        self._shm = shm
+        self._procs = np.ndarray((MAX_PROCESSES,), dtype=_PROC_DTYPE, buffer=shm.buf, offset=0)
+        self._buckets = np.ndarray(
+            (self.bucket_slots,), dtype=_BUCKET_DTYPE, buffer=shm.buf, offset=MAX_PROCESSES * _PROC_DTYPE.itemsize
+        )
+        if fcntl is not None:
+            self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), "a+")
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            self._attach()
+            if self._lock_file is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _proc_slot(self) -> int:
+        pid = os.getpid()
+        slots = np.flatnonzero(self._procs["pid"] == pid)
+        if len(slots):
+            return int(slots[0])
+        free = np.flatnonzero(self._procs["pid"] == 0)
+        slot = int(free[0]) if len(free) else self._reclaim_dead(force=True)
+        self._procs[slot] = (pid, 0.0)
+        return slot
+
+    def _reclaim_dead(self, force: bool = False) -> int:
+        reclaimed = -1
+        for slot in np.flatnonzero(self._procs["pid"] != 0):
+            try:
+                os.kill(int(self._procs[slot]["pid"]), 0)
+            except ProcessLookupError:
+                self._procs[slot] = (0, 0.0)
+                reclaimed = int(slot)
+            except PermissionError:
+                pass
+        if reclaimed < 0 and force:
+            raise Overloaded(1, "Too many worker processes for the admission table.")
+        return reclaimed
+
+    def _bucket_slot(self, key: int, now: float) -> int:
+        start = key % self.bucket_slots
+        oldest, oldest_stamp = start, float("inf")
+        for probe in range(BUCKET_PROBES):
+            slot = (start + probe) % self.bucket_slots
+            slot_key = int(self._buckets[slot]["key"])
+            if slot_key == key:
+                return slot
+            if slot_key == 0:
+                oldest = slot
+                break
+            if self._buckets[slot]["stamp"] < oldest_stamp:
+                oldest, oldest_stamp = slot, self._buckets[slot]["stamp"]
+        # New client (or evicting the stalest neighbour) starts with a full bucket
+        self._buckets[oldest] = (key, settings.ADMISSION_BUCKET_CAPACITY, now)
+        return oldest
+
+    def _try_acquire(self, key: int, cost: float):
+        """Returns ``(ticket, None, None)`` or ``(None, reason, wait_seconds)``."""
+        now = time.monotonic()
+        with self._locked():
+            slot = self._bucket_slot(key, now)
+            bucket = self._buckets[slot]
+            rate = settings.ADMISSION_REFILL_PER_SECOND
+            tokens = min(settings.ADMISSION_BUCKET_CAPACITY, bucket["tokens"] + (now - bucket["stamp"]) * rate)
+            self._buckets[slot]["tokens"] = tokens
+            self._buckets[slot]["stamp"] = now
+            if tokens < cost:
+                return None, "rate", (cost - tokens) / rate if rate > 0 else float("inf")
+            limit = settings.ADMISSION_CONCURRENCY_LIMIT
+            in_flight = float(self._procs["units"].sum())
+            if in_flight + cost > limit:
+                self._reclaim_dead()
+                in_flight = float(self._procs["units"].sum())
+            if in_flight + cost > limit and in_flight > 0:
+                return None, "busy", None
+            self._buckets[slot]["tokens"] = tokens - cost
+            self._procs[self._proc_slot()]["units"] += cost
+            degraded = in_flight + cost > limit * settings.ADMISSION_DEGRADE_AT
+            return Ticket(self, cost, degraded), None, None
+
+    def _release(self, ticket: Ticket) -> None:
+        with self._locked():
+            slot = self._proc_slot()
+            self._procs[slot]["units"] = max(0.0, self._procs[slot]["units"] - ticket.cost)
+
+    # -- public API -----------------------------------------------------
+    @staticmethod
+    def client_ip(request) -> str:
+        """The address the nearest trusted proxy saw, or the peer address without proxies.
+
+        Entries left of the trusted proxies' own are whatever the client sent, so
+        X-Forwarded-For is read from the right.
+        """
+        remote_addr = request.META.get("REMOTE_ADDR", "")
+        trusted = settings.TRUSTED_PROXY_COUNT
+        if trusted <= 0:
+            return remote_addr
+        forwarded = [entry.strip() for entry in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if entry.strip()]
+        if len(forwarded) < trusted:
+            # Did not come through every proxy
+            return remote_addr
+        return forwarded[-trusted]
+
+    @staticmethod
+    def client_key(request) -> int:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            ident = f"user:{user.pk}"
+        else:
+            ident = "ip:" + AdmissionController.client_ip(request)
+        # Zero marks an empty bucket slot
+        return int.from_bytes(hashlib.blake2b(ident.encode(), digest_size=8).digest(), "little") or 1
+
+    @asynccontextmanager
+    async def admit(self, request, request_class: str):
+        cost = float(settings.ADMISSION_COSTS.get(request_class, 1))
+        if not settings.ADMISSION_ENABLED or cost <= 0:
+            yield Ticket(self, 0.0, False)
+            return
+        key = self.client_key(request)
+        # The flock can wait on another process; keep that off the event loop
+        try_acquire = sync_to_async(self._try_acquire, thread_sensitive=False)
+        deadline = time.monotonic() + settings.ADMISSION_QUEUE_TIMEOUT
+        while True:
+            ticket, reason, wait = await try_acquire(key, cost)
+            if ticket is not None:
+                break
+            remaining = deadline - time.monotonic()
+            if reason == "rate" and wait > remaining:
+                raise Throttled(wait=max(1, int(wait + 0.999)))
+            if remaining <= 0:
+                raise Overloaded(settings.ADMISSION_QUEUE_TIMEOUT)
+            await asyncio.sleep(min(wait if reason == "rate" else 0.025, remaining))
+        try:
+            yield ticket
+        finally:
+            await sync_to_async(self._release, thread_sensitive=False)(ticket)
+
+
+admission_controller = AdmissionController(settings.ADMISSION_SHM_NAME)
@@ -0,0 +1,336 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+try:
+    import psycopg  # type: ignore
+    from psycopg import sql  # type: ignore
+except Exception:  # pragma: no cover
+    psycopg = None  # type: ignore
+    sql = None  # type: ignore
+
+
+# NOTIFY payloads are capped at 8000 bytes; wake-ups naming more channels are split
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+def _encode_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__} in a channel message")
+
+
+def _decode_hook(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, default=_encode_default, separators=(",", ":"))
+
+
+def _loads(data):
+    return json.loads(data, object_hook=_decode_hook)
+
+
+class _LoopState:
+    """Connections and listener bound to a single event loop."""
+
+    def __init__(self) -> None:
+        self.send_conn = None
+        self.listen_conn = None
+        self.listener: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+        # Notification channel -> set once its LISTEN has run on listen_conn
+        self.listening: Dict[str, asyncio.Event] = {}
+        self.pending_listens: set = set()
+        # Channel -> events of the receives waiting on it
+        self.waiters: Dict[str, Set[asyncio.Event]] = {}
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    """Channel layer on Postgres ``LISTEN/NOTIFY``.
+
+    Messages are rows in a queue table and a notification only wakes the
+    receivers of a channel. A receive claims the oldest row with ``DELETE ...
+    RETURNING`` under ``SKIP LOCKED``, so each message is delivered exactly
+    once even when several workers receive on the same normal channel, and
+    messages sent before a receiver subscribes wait in the table until they
+    expire.
+
+    The tables are the ``apps.chat`` models, created by its migration.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(
+        self,
+        conninfo: str = "",
+        connection_kwargs: Optional[dict] = None,
+        expiry: int = 60,
+        group_expiry: int = 86400,
+        capacity: int = 100,
+        channel_capacity=None,
+        listen_poll: float = 0.5,
+        receive_poll: float = 5.0,
+        cleanup_interval: float = 30.0,
+    ) -> None:
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        if psycopg is None:
+            raise RuntimeError("PostgresChannelLayer requires psycopg 3")
+        self.conninfo = conninfo
+        self.connection_kwargs = connection_kwargs or {}
+        self.group_expiry = group_expiry
+        self.listen_poll = listen_poll
+        self.receive_poll = receive_poll
+        self.cleanup_interval = cleanup_interval
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        from apps.chat.models import ChannelGroup, ChannelMessage
+
+        self.message_table = sql.Identifier(ChannelMessage._meta.db_table)
+        self.group_table = sql.Identifier(ChannelGroup._meta.db_table)
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self._states: Dict[asyncio.AbstractEventLoop, _LoopState] = {}
+        self._last_cleanup = 0.0
+
+    # -- connections ----------------------------------------------------
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        for stale in [lp for lp in self._states if lp.is_closed()]:
+            # Loops created by async_to_sync die with their connections
+            del self._states[stale]
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState()
+        return state
+
+    async def _connect(self):
+        # UTF8 like Django's connections, so text columns come back as str whatever the server encoding
+        kwargs = {"client_encoding": "UTF8", **self.connection_kwargs}
+        return await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True, **kwargs)
+
+    async def _send_conn(self, state: _LoopState):
+        if state.send_conn is None or state.send_conn.closed:
+            state.send_conn = await self._connect()
+        return state.send_conn
+
+    @staticmethod
+    def _pg_channel(channel: str) -> str:
+        # Identifiers max out at 63 bytes; process-specific channels share one
+        # notification channel per process via their non-local prefix.
+        non_local = channel[: channel.find("!") + 1] if "!" in channel else channel
+        return "chl_" + hashlib.sha1(non_local.encode()).hexdigest()[:40]
+
+    def _ensure_listener(self, state: _LoopState, channel: str) -> asyncio.Event:
+        """Event set once notifications for ``channel`` are being received."""
+        if state.listener is None or state.listener.done():
+            for pg_channel, ready in state.listening.items():
+                # A restarted listener has to LISTEN on everything again
+                ready.clear()
+                state.pending_listens.add(pg_channel)
+            state.listener = asyncio.get_running_loop().create_task(self._listen(state))
+            self._ensure_listener(state, f"specific.{self.client_prefix}!")
+        pg_channel = self._pg_channel(channel)
+        ready = state.listening.get(pg_channel)
+        if ready is None:
+            ready = state.listening[pg_channel] = asyncio.Event()
+            state.pending_listens.add(pg_channel)
+        return ready
+
+    async def _listen(self, state: _LoopState) -> None:
+        conn = state.listen_conn = await self._connect()
+        try:
+            while True:
+                while state.pending_listens:
+                    pg_channel = state.pending_listens.pop()
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(pg_channel)))
+                    state.listening[pg_channel].set()
+                async for notify in conn.notifies(timeout=self.listen_poll):
+                    self._dispatch(state, notify.payload)
+                    if state.pending_listens:
+                        break
+        finally:
+            await conn.close()
+
+    @staticmethod
+    def _dispatch(state: _LoopState, payload: str) -> None:
+        for channel in json.loads(payload):
+            for waiter in state.waiters.get(channel, ()):
+                waiter.set()
+
+    async def _wake(self, conn, channels: List[str]) -> None:
+        """Notify the receivers of ``channels``, one wake-up per notification channel."""
+        by_pg: Dict[str, List[str]] = {}
+        for channel in channels:
+            by_pg.setdefault(self._pg_channel(channel), []).append(channel)
+        for pg_channel, members in by_pg.items():
+            batch: List[str] = []
+            size = 2
+            for channel in members:
+                if batch and size + len(channel) + 3 > NOTIFY_PAYLOAD_LIMIT:
+                    await conn.execute("SELECT pg_notify(%s, %s)", (pg_channel, json.dumps(batch)))
+                    batch, size = [], 2
+                batch.append(channel)
+                size += len(channel) + 3
+            await conn.execute("SELECT pg_notify(%s, %s)", (pg_channel, json.dumps(batch)))
+
+    async def _claim(self, state: _LoopState, channel: str) -> Optional[dict]:
+        async with state.lock:
+            conn = await self._send_conn(state)
+            cur = await conn.execute(
+                sql.SQL(
+                    "DELETE FROM {0} WHERE id = ("
+                    " SELECT id FROM {0} WHERE channel = %s AND expires_at > now()"
+                    " ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED)"
+                    " RETURNING payload"
+                ).format(self.message_table),
+                (channel,),
+            )
+            row = await cur.fetchone()
+        return _loads(row[0]) if row is not None else None
+
+    async def _maybe_cleanup(self, conn) -> None:
+        now = time.monotonic()
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        await conn.execute(sql.SQL("DELETE FROM {} WHERE expires_at < now()").format(self.message_table))
+        await conn.execute(sql.SQL("DELETE FROM {} WHERE expires_at < now()").format(self.group_table))
+
+    # -- channel layer API ----------------------------------------------
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+        state = self._state()
+        async with state.lock:
+            conn = await self._send_conn(state)
+            cur = await conn.execute(
+                sql.SQL(
+                    "INSERT INTO {0} (channel, payload, expires_at)"
+                    " SELECT %s, %s, now() + make_interval(secs => %s)"
+                    " WHERE (SELECT count(*) FROM {0} WHERE channel = %s AND expires_at > now()) < %s"
+                ).format(self.message_table),
+                (channel, _dumps(message), self.expiry, channel, self.get_capacity(channel)),
+            )
+            if cur.rowcount == 0:
+                raise ChannelFull(channel)
+            await self._wake(conn, [channel])
+            await self._maybe_cleanup(conn)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        state = self._state()
+        waiter = asyncio.Event()
+        waiters = state.waiters.setdefault(channel, set())
+        waiters.add(waiter)
+        try:
+            while True:
+                # Clear, LISTEN, then claim: a message sent after an empty claim always wakes us
+                waiter.clear()
+                ready = self._ensure_listener(state, channel)
+                if not ready.is_set():
+                    try:
+                        await asyncio.wait_for(ready.wait(), self.receive_poll)
+                    except asyncio.TimeoutError:
+                        pass
+                message = await self._claim(state, channel)
+                if message is not None:
+                    return message
+                try:
+                    # The timeout covers wake-ups missed while the listener reconnects
+                    await asyncio.wait_for(waiter.wait(), self.receive_poll)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Returned or cancelled; channels are mostly single-use, so drop the entry
+            waiters.discard(waiter)
+            if not waiters and state.waiters.get(channel) is waiters:
+                del state.waiters[channel]
+
+    async def new_channel(self, prefix="specific"):
+        return f"{prefix}.{self.client_prefix}!{uuid.uuid4().hex}"
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        state = self._state()
+        async with state.lock:
+            conn = await self._send_conn(state)
+            await conn.execute(
+                sql.SQL(
+                    "INSERT INTO {} (group_name, channel, expires_at) VALUES (%s, %s, now() + make_interval(secs => %s))"
+                    " ON CONFLICT (group_name, channel) DO UPDATE SET expires_at = EXCLUDED.expires_at"
+                ).format(self.group_table),
+                (group, channel, self.group_expiry),
+            )
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        state = self._state()
+        async with state.lock:
+            conn = await self._send_conn(state)
+            await conn.execute(
+                sql.SQL("DELETE FROM {} WHERE group_name = %s AND channel = %s").format(self.group_table),
+                (group, channel),
+            )
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        state = self._state()
+        async with state.lock:
+            conn = await self._send_conn(state)
+            cur = await conn.execute(
+                sql.SQL("SELECT channel FROM {} WHERE group_name = %s AND expires_at > now()").format(self.group_table),
+                (group,),
+            )
+            channels = [row[0] for row in await cur.fetchall()]
+            if not channels:
+                return
+            # Full channels are skipped, like the other layers' group_send
+            cur = await conn.execute(
+                sql.SQL(
+                    "INSERT INTO {0} (channel, payload, expires_at)"
+                    " SELECT c.channel, %s, now() + make_interval(secs => %s)"
+                    " FROM unnest(%s::text[], %s::int[]) AS c(channel, capacity)"
+                    " WHERE (SELECT count(*) FROM {0} m WHERE m.channel = c.channel AND m.expires_at > now()) < c.capacity"
+                    " RETURNING channel"
+                ).format(self.message_table),
+                (_dumps(message), self.expiry, channels, [self.get_capacity(c) for c in channels]),
+            )
+            delivered = [row[0] for row in await cur.fetchall()]
+            await self._wake(conn, delivered)
+            await self._maybe_cleanup(conn)
+
+    async def flush(self):
+        state = self._state()
+        async with state.lock:
+            conn = await self._send_conn(state)
+            await conn.execute(sql.SQL("DELETE FROM {}").format(self.message_table))
+            await conn.execute(sql.SQL("DELETE FROM {}").format(self.group_table))
+
+    async def close(self):
+        state = self._state()
+        if state.listener is not None:
+            state.listener.cancel()
+            try:
+                await state.listener
+            except (asyncio.CancelledError, Exception):
+                pass
+        if state.send_conn is not None:
+            await state.send_conn.close()
+        if state.listen_conn is not None and not state.listen_conn.closed:
+            await state.listen_conn.close()
+        self._states.pop(asyncio.get_running_loop(), None)
@@ -0,0 +1,87 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Dict
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, response, views
+
+from .middleware import ViewScopeMiddleware
+
+# Queries run inside a prepare scope use server-side binding, so psycopg
+# prepares them once they reach the connection's prepare_threshold. Pooled
+# connections keep their prepared statements across requests.
+_prepare_scope: contextvars.ContextVar[bool] = contextvars.ContextVar("prepare_scope", default=False)
+
+_cursor_classes = None
+
+
+def cursor_factory(connection, **kwargs):
+    """psycopg ``cursor_factory`` picking server-side binding inside a prepare scope.
+
+    Everything else keeps Django's default client-side binding, which tolerates
+    parameters in places Postgres cannot infer a type for.
+    """
+    global _cursor_classes
+    if _cursor_classes is None:
+        from django.db.backends.postgresql.base import Cursor, ServerBindingCursor
+
+        _cursor_classes = (Cursor, ServerBindingCursor)
+    return _cursor_classes[_prepare_scope.get()](connection, **kwargs)
+
+
+@receiver(connection_created)
+def use_prepare_scope_cursors(sender, connection, **kwargs):
+    # Sent for every connection Django takes, including ones handed out by the pool
+    if connection.vendor == "postgresql" and connection.settings_dict["OPTIONS"].get("prepare_threshold") is not None:
+        connection.connection.cursor_factory = cursor_factory
+
+
+@contextmanager
+def prepared_statements():
+    """Let queries in this block become server-side prepared statements."""
+    token = _prepare_scope.set(True)
+    try:
+        yield
+    finally:
+        _prepare_scope.reset(token)
+
+
+class PreparedStatementsMiddleware(ViewScopeMiddleware):
+    """Opens a prepare scope for safe requests to views with ``prepare_statements = True``."""
+
+    view_flag = "prepare_statements"
+
+    def reset(self) -> None:
+        _prepare_scope.set(False)
+
+    def enter(self, request) -> None:
+        _prepare_scope.set(True)
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Per-alias psycopg pool counters plus how much of each pool is checked out."""
+    stats = {}
+    for alias in connections:
+        # Read the class-level registry so this never creates a pool
+        pool = getattr(connections[alias], "_connection_pools", {}).get(alias)
+        if pool is None or pool.closed:
+            continue
+        counters = pool.get_stats()
+        in_use = counters.get("pool_size", 0) - counters.get("pool_available", 0)
+        stats[alias] = {
+            **counters,
+            "in_use": in_use,
+            "saturation": round(in_use / pool.max_size, 3) if pool.max_size else 0.0,
+        }
+    return stats
+
+
+@extend_schema(tags=["health"])
+class DatabasePoolView(views.APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return response.Response({"pools": pool_stats()})
@@ -0,0 +1,183 @@
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import permissions
+
+from .middleware import ViewScopeMiddleware
+
+
+# Reads go to a replica only inside a replica scope; any write in the same
+# context pins the rest of it to the primary.
+_replica_scope: contextvars.ContextVar[bool] = contextvars.ContextVar("replica_scope", default=False)
+
+
+class _Writes:
+    """Whether the current request or scope has written to the primary.
+
+    Mutable rather than a plain flag: ``run_db`` runs ORM work in a copy of
+    the request's context, and a write there must still pin the request.
+    """
+
+    __slots__ = ("seen",)
+
+    def __init__(self) -> None:
+        self.seen = False
+
+
+_writes: contextvars.ContextVar[Optional[_Writes]] = contextvars.ContextVar("db_writes", default=None)
+
+# Statements that leave data alone; transaction control counts as a read
+_READ_STATEMENTS = ("SELECT", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT", "BEGIN", "SET", "SHOW", "EXPLAIN")
+
+
+def _wrote() -> bool:
+    writes = _writes.get()
+    return writes is not None and writes.seen
+
+
+def record_writes(execute, sql, params, many, context):
+    """``execute_wrapper`` marking the current scope as written on any data-changing statement."""
+    writes = _writes.get()
+    if writes is not None and not writes.seen and (many or not sql.lstrip().upper().startswith(_READ_STATEMENTS)):
+        writes.seen = True
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def watch_for_writes(sender, connection, **kwargs):
+    # Writes are detected from the SQL actually sent: the router's db_for_write
+    # also runs for in-memory relation assignments that never touch the database
+    if connection.alias not in settings.DATABASE_REPLICAS and record_writes not in connection.execute_wrappers:
+        # Prepended, so an enclosing ``connection.execute_wrapper()`` block still pops its own
+        connection.execute_wrappers.insert(0, record_writes)
+
+
+class ReplicaPool:
+    """Round-robin over replica aliases, skipping ones that failed a recent health check."""
+
+    def __init__(self) -> None:
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._checked: Dict[str, float] = {}
+        self._down_until: Dict[str, float] = {}
+
+    @property
+    def aliases(self) -> List[str]:
+        return settings.DATABASE_REPLICAS
+
+    def _healthy(self, alias: str, now: float) -> bool:
+        if self._down_until.get(alias, 0) > now:
+            return False
+        if now - self._checked.get(alias, 0) < settings.REPLICA_HEALTH_CHECK_SECONDS:
+            return True
+        connection = connections[alias]
+        try:
+            if connection.connection is None:
+                connection.ensure_connection()
+            elif not connection.is_usable():
+                raise ConnectionError(f"{alias} connection is not usable")
+        except Exception:
+            connection.close()
+            with self._lock:
+                self._down_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+            return False
+        with self._lock:
+            self._checked[alias] = now
+        return True
+
+    def choose(self) -> Optional[str]:
+        aliases = self.aliases
+        if not aliases:
+            return None
+        now = time.monotonic()
+        start = next(self._counter)
+        for offset in range(len(aliases)):
+            alias = aliases[(start + offset) % len(aliases)]
+            if self._healthy(alias, now):
+                return alias
+        return None
+
+
+replica_pool = ReplicaPool()
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_scope.get() or _wrote():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its own writes
+            return None
+        return replica_pool.choose()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.DATABASE_REPLICAS
+
+
+def is_pinned(request) -> bool:
+    """True while the client that sent ``request`` must read its own recent writes.
+
+    The client echoes the pin header of its last write; the value is when the
+    pin runs out, so a stale echo is ignored.
+    """
+    try:
+        return float(request.headers.get(settings.REPLICA_PIN_HEADER, "")) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def use_replica():
+    """Route reads in this block to a replica unless it (or the request around it) writes first."""
+    scope_token = _replica_scope.set(True)
+    writes_token = _writes.set(_writes.get() or _Writes())
+    try:
+        yield
+    finally:
+        _writes.reset(writes_token)
+        _replica_scope.reset(scope_token)
+
+
+class ReplicaRoutingMiddleware(ViewScopeMiddleware):
+    """Sends safe requests to views with ``read_replica = True`` to replicas.
+
+    A response to a request that writes carries a pin header; while the
+    client sends it back, its requests read from the primary, so it sees its
+    own writes while replicas catch up. A header rather than a cookie, because
+    the SPA calls the API cross-origin without credentials.
+    """
+
+    view_flag = "read_replica"
+
+    def reset(self) -> None:
+        _replica_scope.set(False)
+        _writes.set(None)
+
+    def process_request(self, request):
+        super().process_request(request)
+        # Every request records its writes, so a GET that writes still pins the client
+        _writes.set(_Writes())
+
+    def enter(self, request) -> None:
+        if not is_pinned(request):
+            _replica_scope.set(True)
+
+    def process_response(self, request, response):
+        if _wrote() or (request.method not in permissions.SAFE_METHODS and response.status_code < 400):
+            response[settings.REPLICA_PIN_HEADER] = str(int(time.time()) + settings.REPLICA_PIN_SECONDS)
+        return super().process_response(request, response)
@@ -0,0 +1,45 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+# Dedicated pools so slow chat generation can't starve fast search scoring or ORM work.
+# All are bounded; extra work waits in the pool queue instead of spawning threads.
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    executor = _executors.get(name)
+    if executor is None:
+        workers = settings.EXECUTOR_WORKERS.get(name, 2)
+        executor = _executors.setdefault(name, ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool"))
+    return executor
+
+
+async def run_in_executor(name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), partial(func, *args, **kwargs))
+
+
+def _db_task(func: Callable[..., Any]) -> Any:
+    try:
+        return func()
+    finally:
+        # Hands the thread's connection back to the pool (or closes it without one)
+        close_old_connections()
+
+
+async def run_db(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run ORM work from an async view on the ``db`` pool.
+
+    The caller's context (replica and prepare scopes) carries over, which
+    ``run_in_executor`` alone would drop.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor("db"), context.run, _db_task, partial(func, *args, **kwargs))
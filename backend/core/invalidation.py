@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+# Sent to subscribers after the listener reconnects; notifications sent while it was down are lost
+RECONNECTED = "bus.reconnected"
+
+Handler = Callable[[dict], None]
+
+
+class InvalidationBus:
+    """Small invalidation messages fanned out to every process over Postgres ``LISTEN/NOTIFY``.
+
+    ``publish`` only reaches the other processes; the caller updates its own
+    state directly. Inside a transaction the notification goes out on commit
+    and is dropped on rollback. A process listens from its first ``start()``,
+    so only processes that keep caches pay for the connection. Without
+    Postgres there is a single process and nothing to send.
+    """
+
+    def __init__(self, channel: str = "app_invalidation", retry_seconds: float = 5.0, poll_seconds: float = 1.0) -> None:
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.poll_seconds = poll_seconds
+        self.sender = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @staticmethod
+    def _enabled() -> bool:
+        return connections[DEFAULT_DB_ALIAS].vendor == "postgresql"
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, payload: Optional[dict] = None) -> None:
+        if not self._enabled():
+            return
+        # Payloads are capped at 8000 bytes; send ids, not rows
+        body = json.dumps({"s": self.sender, "t": topic, "p": payload or {}}, separators=(",", ":"))
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, body])
+
+    def start(self) -> None:
+        """Start listening in a background thread (idempotent)."""
+        if self._thread is not None or not self._enabled():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Stop listening and close the connection, e.g. before the test database is dropped."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            thread.join()
+            self._stopping.clear()
+
+    def _dispatch(self, topic: str, payload: dict) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", topic)
+        close_old_connections()
+
+    def _run(self) -> None:
+        import psycopg
+        from psycopg import sql
+
+        connected_before = False
+        while not self._stopping.is_set():
+            try:
+                # A dedicated connection: a pooled one would be held forever
+                params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+                with psycopg.connect(**params, autocommit=True) as conn:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    if connected_before:
+                        self._dispatch(RECONNECTED, {})
+                    connected_before = True
+                    while not self._stopping.is_set():
+                        for notify in conn.notifies(timeout=self.poll_seconds):
+                            message = json.loads(notify.payload)
+                            if message["s"] != self.sender:
+                                self._dispatch(message["t"], message["p"])
+            except Exception:
+                logger.exception("Invalidation listener lost its connection; retrying in %ss", self.retry_seconds)
+                self._stopping.wait(self.retry_seconds)
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,66 @@
+from abc import ABC, abstractmethod
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import permissions
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class ViewScopeMiddleware(MiddlewareMixin, ABC):
+    """Opens a per-request scope for safe requests to views that set ``view_flag``.
+
+    Scopes live in context variables, and worker threads are reused across
+    requests, so ``reset`` runs as each request starts and again as it ends.
+    """
+
+    view_flag = ""
+
+    @abstractmethod
+    def reset(self) -> None: ...
+
+    @abstractmethod
+    def enter(self, request) -> None: ...
+
+    def process_request(self, request):
+        self.reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+        if getattr(view_class, self.view_flag, False) and request.method in permissions.SAFE_METHODS:
+            self.enter(request)
+
+    def process_response(self, request, response):
+        self.reset()
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI.
+
+    Stock WhiteNoise is sync-only, so Django adapts the async chain beneath it
+    onto the single thread-sensitive thread for the whole request: one slow
+    async view (a chat generation) would then stall every other request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Looks the file up on disk
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -1,7 +1,9 @@
+import json
 import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,16 +44,19 @@ INSTALLED_APPS = [
     "apps.notifications",
     "apps.searchai",
     "apps.chat",
+    "apps.jobs",
 ]
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.db_routing.ReplicaRoutingMiddleware",
+    "core.db_pool.PreparedStatementsMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -83,6 +88,28 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Cross-process layer over Postgres LISTEN/NOTIFY; needed once more than one worker runs
+if os.getenv("CHANNEL_LAYER", "memory").lower() == "postgres":
+    CHANNEL_LAYERS["default"] = {
+        "BACKEND": "core.channel_layers.PostgresChannelLayer",
+        "CONFIG": {
+            "conninfo": os.getenv("CHANNEL_LAYER_DSN", ""),
+            "connection_kwargs": {
+                key: value
+                for key, value in (
+                    ("dbname", os.getenv("PGDATABASE")),
+                    ("user", os.getenv("PGUSER")),
+                    ("password", os.getenv("PGPASSWORD")),
+                    ("host", os.getenv("PGHOST")),
+                    ("port", os.getenv("PGPORT")),
+                )
+                if value
+            },
+            "expiry": int(os.getenv("CHANNEL_LAYER_EXPIRY", "60")),
+            "group_expiry": int(os.getenv("CHANNEL_LAYER_GROUP_EXPIRY", "86400")),
+        },
+    }
+
 DATABASES = {
     "default": {
         "ENGINE": os.getenv("DB_ENGINE", "django.db.backends.postgresql"),
@@ -94,6 +121,57 @@ DATABASES = {
     }
 }
 
+# Threads that run ORM work for async views. The connection pool defaults to
+# one connection per db worker plus headroom for sync views and background
+# threads (catalog reloads, shard rebuilds), so those never wait on async ORM work
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+DB_POOL_HEADROOM = int(os.getenv("DB_POOL_HEADROOM", "4"))
+
+# psycopg3 pool (Postgres only). Django returns connections to it when a
+# request or db task ends instead of closing them, so CONN_MAX_AGE stays 0.
+_prepare_threshold = os.getenv("DB_PREPARE_THRESHOLD", "2")
+if os.getenv("DB_POOL", "true").lower() == "true" and DATABASES["default"]["ENGINE"].endswith("postgresql"):
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True  # pool checks a connection before handing it out
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", str(DB_EXECUTOR_WORKERS + DB_POOL_HEADROOM))),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),  # wait for a free connection before erroring
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+        },
+        # Executions before a statement in a prepare scope (views with
+        # prepare_statements = True) is prepared server-side; unset it behind
+        # a transaction-mode pgbouncer
+        "prepare_threshold": int(_prepare_threshold) if _prepare_threshold else None,
+    }
+
+# Read replicas; reads from views marked read_replica go to them round-robin
+# (see core.db_routing). DB_REPLICA_HOSTS entries are host[:port][/name] with
+# the primary's credentials; DB_REPLICAS is JSON mapping an alias to the
+# settings it changes from the primary's, e.g. {"east": {"HOST": "...", "USER": "..."}}
+DATABASE_REPLICAS = []
+for _index, _spec in enumerate(h.strip() for h in os.getenv("DB_REPLICA_HOSTS", "").split(",") if h.strip()):
+    _host, _, _name = _spec.partition("/")
+    _host, _, _port = _host.partition(":")
+    DATABASES[f"replica_{_index}"] = {
+        **DATABASES["default"],
+        "NAME": _name or DATABASES["default"]["NAME"],
+        "HOST": _host,
+        "PORT": _port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+for _alias, _config in json.loads(os.getenv("DB_REPLICAS") or "{}").items():
+    DATABASES[_alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}, **_config}
+    DATABASE_REPLICAS.append(_alias)
+DATABASE_ROUTERS = ["core.db_routing.ReadReplicaRouter"]
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# How long a client that wrote keeps reading from the primary; cover worst-case replica lag
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+REPLICA_PIN_HEADER = "X-DB-Pin"
+
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -124,7 +202,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.accounts.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
@@ -152,6 +230,8 @@ SPECTACULAR_SETTINGS = {
         {"name": "notifications", "description": "In-app notifications"},
         {"name": "search", "description": "Keyword and AI semantic search"},
         {"name": "chat", "description": "AI chat assistant"},
+        {"name": "jobs", "description": "Background job status"},
+        {"name": "health", "description": "Service health and database pool usage"},
     ],
 }
 
@@ -161,13 +241,71 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Seconds a resolved JWT principal (user + profile) stays in the per-process cache.
+# Evictions are broadcast to other processes (Postgres only); this is the upper
+# bound on a deactivated user's access when one is missed.
+AUTH_PRINCIPAL_CACHE_TTL = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", "30"))
+
 CORS_ALLOW_ALL_ORIGINS = os.getenv("CORS_ALLOW_ALL", "true").lower() == "true"
 CORS_ALLOWED_ORIGINS = [
     *(os.getenv("CORS_ALLOWED_ORIGINS", "").split(",") if os.getenv("CORS_ALLOWED_ORIGINS") else []),
 ]
 CORS_ALLOW_CREDENTIALS = True
+# The SPA reads the replica pin from responses and echoes it on later requests
+CORS_ALLOW_HEADERS = (*default_headers, REPLICA_PIN_HEADER.lower())
+CORS_EXPOSE_HEADERS = [REPLICA_PIN_HEADER]
 
 # AI settings
 AI_ENABLE = os.getenv("AI_ENABLE", "true").lower() == "true"
 AI_BACKEND = os.getenv("AI_BACKEND", "tfidf")  # tfidf | embeddings
 AI_EMBEDDING_MODEL = os.getenv("AI_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CHAT_MODEL_NAME = os.getenv("CHAT_MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+CHAT_MAX_NEW_TOKENS = int(os.getenv("CHAT_MAX_NEW_TOKENS", "128"))
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "384"))  # token budget for retrieved snippets
+CHAT_SNIPPET_TOKENS = int(os.getenv("CHAT_SNIPPET_TOKENS", "96"))  # per-business cap within that budget
+# fp32 | int8 | bf16; check int8/bf16 agreement with benchmark_chat on the deployed model before switching
+CHAT_INFERENCE_MODE = os.getenv("CHAT_INFERENCE_MODE", "fp32")
+# torch threads per process (0 = torch default); keep workers x threads <= cores
+CHAT_TORCH_THREADS = int(os.getenv("CHAT_TORCH_THREADS", "2"))
+CHAT_TORCH_INTEROP_THREADS = int(os.getenv("CHAT_TORCH_INTEROP_THREADS", "1"))
+
+# Admission control for expensive AI endpoints (shared across worker processes)
+# Reverse proxies in front of the app that append to X-Forwarded-For (1 on
+# Railway); 0 uses the peer address, since the header is client-controlled
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_COSTS = {"chat": 10, "semantic": 2}
+ADMISSION_BUCKET_CAPACITY = float(os.getenv("ADMISSION_BUCKET_CAPACITY", "40"))
+ADMISSION_REFILL_PER_SECOND = float(os.getenv("ADMISSION_REFILL_PER_SECOND", "2"))
+ADMISSION_CONCURRENCY_LIMIT = float(os.getenv("ADMISSION_CONCURRENCY_LIMIT", "40"))
+ADMISSION_DEGRADE_AT = float(os.getenv("ADMISSION_DEGRADE_AT", "0.5"))  # fraction of the limit
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_SHM_NAME = os.getenv("ADMISSION_SHM_NAME", "bizmap_admission")
+SEMANTIC_SEARCH_MAX_TOP_K = int(os.getenv("SEMANTIC_SEARCH_MAX_TOP_K", "50"))
+
+# Search index published to the database by the reindex job. Web processes
+# load it when notified, or on a check at most this often if they missed it
+SEARCH_INDEX_RELOAD_SECONDS = float(os.getenv("SEARCH_INDEX_RELOAD_SECONDS", "30"))
+SEARCH_SPELLING_MAX_EDIT_DISTANCE = int(os.getenv("SEARCH_SPELLING_MAX_EDIT_DISTANCE", "2"))
+# Score queries across processes with the index partitioned by business id (0 or 1 = in-process)
+SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", "0"))
+SEARCH_SHARD_WORKERS = int(os.getenv("SEARCH_SHARD_WORKERS", "0"))  # 0 = min(shards, cores)
+# Saved businesses re-index their shard in the background after this pause, which batches bursts of saves
+SEARCH_SHARD_REBUILD_DELAY_SECONDS = float(os.getenv("SEARCH_SHARD_REBUILD_DELAY_SECONDS", "1"))
+
+# Per-process columnar copy of the business table for query-free hydration and listing
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "true").lower() == "true"
+CATALOG_RELOAD_SECONDS = float(os.getenv("CATALOG_RELOAD_SECONDS", "300"))  # bounds staleness when a broadcast is missed
+
+# Database-backed job queue (manage.py run_workers)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "1800"))
+JOB_REQUEUE_INTERVAL_SECONDS = float(os.getenv("JOB_REQUEUE_INTERVAL_SECONDS", "60"))
+
+# Bounded thread pools for CPU-bound work offloaded from async views
+EXECUTOR_WORKERS = {
+    "search": int(os.getenv("SEARCH_EXECUTOR_WORKERS", "4")),
+    "chat": int(os.getenv("CHAT_EXECUTOR_WORKERS", "1")),
+    "db": DB_EXECUTOR_WORKERS,
+}
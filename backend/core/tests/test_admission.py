@@ -0,0 +1,229 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import unittest
+import uuid
+from multiprocessing import resource_tracker
+from unittest import mock
+
+import numpy as np
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.exceptions import Throttled
+
+from core.admission import AdmissionController, Overloaded, fcntl
+
+
+class ClientIpTests(SimpleTestCase):
+    def request(self, forwarded=None):
+        extra = {"REMOTE_ADDR": "10.0.0.1"}
+        if forwarded is not None:
+            extra["HTTP_X_FORWARDED_FOR"] = forwarded
+        return RequestFactory().get("/", **extra)
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_ignores_forwarded_for_without_trusted_proxies(self):
+        self.assertEqual(AdmissionController.client_ip(self.request("1.2.3.4")), "10.0.0.1")
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_reads_entry_added_by_trusted_proxy(self):
+        # The client prepended a fake address; the proxy appended the real one
+        self.assertEqual(AdmissionController.client_ip(self.request("6.6.6.6, 203.0.113.9")), "203.0.113.9")
+        self.assertEqual(
+            AdmissionController.client_key(self.request("7.7.7.7, 203.0.113.9")),
+            AdmissionController.client_key(self.request("6.6.6.6, 203.0.113.9")),
+        )
+
+    @override_settings(TRUSTED_PROXY_COUNT=2)
+    def test_counts_trusted_proxies_from_the_right(self):
+        self.assertEqual(AdmissionController.client_ip(self.request("6.6.6.6, 203.0.113.9, 10.1.1.1")), "203.0.113.9")
+        # Fewer entries than proxies: the request skipped one, so fall back to the peer
+        self.assertEqual(AdmissionController.client_ip(self.request("203.0.113.9")), "10.0.0.1")
+
+
+class ControllerMixin:
+    def setUp(self):
+        super().setUp()
+        self.controller = AdmissionController(f"test_admission_{uuid.uuid4().hex[:8]}", bucket_slots=64)
+        self.addCleanup(self.detach)
+
+    def detach(self):
+        controller = self.controller
+        if controller._shm is None:
+            return
+        # The array views export the buffer; drop them before closing
+        controller._procs = controller._buckets = None
+        controller._shm.close()
+        # Registered again only so that unlink's unregister has something to remove
+        resource_tracker.register(controller._shm._name, "shared_memory")
+        controller._shm.unlink()
+        if controller._lock_file is not None:
+            controller._lock_file.close()
+            os.unlink(controller._lock_file.name)
+
+    def request(self, ip="10.0.0.1"):
+        return RequestFactory().get("/", REMOTE_ADDR=ip)
+
+    def key(self, ip="10.0.0.1"):
+        return AdmissionController.client_key(self.request(ip))
+
+
+@override_settings(ADMISSION_BUCKET_CAPACITY=10, ADMISSION_REFILL_PER_SECOND=2, ADMISSION_CONCURRENCY_LIMIT=10, ADMISSION_DEGRADE_AT=0.5)
+class AdmissionControllerTests(ControllerMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = 1000.0
+        patcher = mock.patch("core.admission.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def acquire(self, cost, ip="10.0.0.1"):
+        return self.controller._try_acquire(self.key(ip), cost)
+
+    def test_bucket_depletes_and_refills(self):
+        for _ in range(2):
+            ticket, _, _ = self.acquire(4)
+            self.controller._release(ticket)
+        # 2 tokens left; 4 more take a second at 2 per second
+        self.assertEqual(self.acquire(4), (None, "rate", 1.0))
+        self.now += 0.5
+        self.assertEqual(self.acquire(4), (None, "rate", 0.5))
+        self.now += 0.5
+        self.assertIsNotNone(self.acquire(4)[0])
+        # Other clients have their own bucket, and refills stop at the capacity
+        self.assertIsNotNone(self.acquire(4, ip="10.0.0.2")[0])
+        self.now += 3600
+        self.assertEqual(self.acquire(12)[1], "rate")
+
+    @override_settings(ADMISSION_BUCKET_CAPACITY=100)
+    def test_in_flight_cost_is_capped_across_clients(self):
+        held, _, _ = self.acquire(6)
+        self.assertEqual(self.acquire(6, ip="10.0.0.2"), (None, "busy", None))
+        self.assertIsNotNone(self.acquire(4, ip="10.0.0.2")[0])
+        self.assertEqual(self.acquire(1, ip="10.0.0.3")[1], "busy")
+        self.controller._release(held)
+        self.assertIsNotNone(self.acquire(6, ip="10.0.0.3")[0])
+
+    @override_settings(ADMISSION_BUCKET_CAPACITY=100)
+    def test_request_above_the_limit_runs_alone(self):
+        ticket, _, _ = self.acquire(30)
+        self.assertIsNotNone(ticket)
+        self.assertEqual(self.acquire(1, ip="10.0.0.2")[1], "busy")
+
+    @override_settings(ADMISSION_BUCKET_CAPACITY=100)
+    def test_reclaims_units_of_dead_processes(self):
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        child.wait()
+        self.assertIsNotNone(self.acquire(6)[0])
+        procs = self.controller._procs
+        free = int(np.flatnonzero(procs["pid"] == 0)[0])
+        # A worker that crashed holding the rest of the limit
+        procs[free] = (child.pid, 4.0)
+        self.assertIsNotNone(self.acquire(4)[0])
+        self.assertEqual(procs[free]["pid"], 0)
+        self.assertEqual(float(procs["units"].sum()), 10.0)
+
+    def test_degrades_past_threshold(self):
+        first, _, _ = self.acquire(4)
+        second, _, _ = self.acquire(4, ip="10.0.0.2")
+        self.assertFalse(first.degraded)
+        self.assertTrue(second.degraded)
+
+
+@override_settings(
+    ADMISSION_ENABLED=True,
+    ADMISSION_COSTS={"semantic": 4},
+    ADMISSION_BUCKET_CAPACITY=8,
+    ADMISSION_REFILL_PER_SECOND=1,
+    ADMISSION_CONCURRENCY_LIMIT=8,
+    ADMISSION_QUEUE_TIMEOUT=0.3,
+)
+class AdmitQueueTests(ControllerMixin, SimpleTestCase):
+    async def hold(self, ip):
+        async with self.controller.admit(self.request(ip), "semantic"):
+            pass
+
+    async def test_throttled_when_refill_misses_the_deadline(self):
+        await self.hold("10.0.0.1")
+        await self.hold("10.0.0.1")
+        began = time.monotonic()
+        with self.assertRaises(Throttled) as raised:
+            await self.hold("10.0.0.1")
+        # Refused at once: waiting would not help
+        self.assertLess(time.monotonic() - began, 0.2)
+        self.assertEqual((raised.exception.status_code, raised.exception.wait), (429, 4))
+
+    @override_settings(ADMISSION_REFILL_PER_SECOND=40)
+    async def test_waits_for_tokens_within_the_deadline(self):
+        await self.hold("10.0.0.1")
+        await self.hold("10.0.0.1")
+        began = time.monotonic()
+        await self.hold("10.0.0.1")
+        self.assertGreater(time.monotonic() - began, 0.05)
+
+    async def test_overloaded_after_queueing_until_the_deadline(self):
+        async with self.controller.admit(self.request("10.0.0.1"), "semantic"):
+            async with self.controller.admit(self.request("10.0.0.2"), "semantic"):
+                began = time.monotonic()
+                with self.assertRaises(Overloaded) as raised:
+                    await self.hold("10.0.0.3")
+                self.assertGreaterEqual(time.monotonic() - began, 0.3)
+        self.assertEqual((raised.exception.status_code, raised.exception.wait), (503, 1))
+
+    async def test_queued_request_runs_once_units_free_up(self):
+        release = asyncio.Event()
+
+        async def busy():
+            async with self.controller.admit(self.request("10.0.0.1"), "semantic"):
+                async with self.controller.admit(self.request("10.0.0.2"), "semantic"):
+                    await release.wait()
+
+        holder = asyncio.ensure_future(busy())
+        await asyncio.sleep(0.05)
+        asyncio.get_running_loop().call_later(0.1, release.set)
+        await self.hold("10.0.0.3")
+        await holder
+
+    @unittest.skipIf(fcntl is None, "needs flock")
+    async def test_waiting_for_the_lock_leaves_the_loop_free(self):
+        self.controller._attach()
+        # Another worker process holding the lock
+        with open(self.controller._lock_file.name) as other:
+            fcntl.flock(other, fcntl.LOCK_EX)
+            admitted = asyncio.ensure_future(self.hold("10.0.0.1"))
+            began = time.monotonic()
+            await asyncio.sleep(0.05)
+            self.assertLess(time.monotonic() - began, 0.2)
+            self.assertFalse(admitted.done())
+            fcntl.flock(other, fcntl.LOCK_UN)
+        await admitted
+
+    async def test_refusals_carry_retry_after(self):
+        # The address AsyncClient requests come from
+        client, ip = AsyncClient(), "127.0.0.1"
+        with mock.patch("apps.searchai.views.admission_controller", self.controller):
+            async with self.controller.admit(self.request("10.0.0.8"), "semantic"):
+                async with self.controller.admit(self.request("10.0.0.9"), "semantic"):
+                    busy = await client.get("/api/search/semantic/", {"query": "cafe"})
+            await self.hold(ip)
+            await self.hold(ip)
+            throttled = await client.get("/api/search/semantic/", {"query": "cafe"})
+        self.assertEqual((busy.status_code, busy["Retry-After"]), (503, "1"))
+        self.assertEqual((throttled.status_code, throttled["Retry-After"]), (429, "4"))
+
+
+@override_settings(ADMISSION_ENABLED=True, ADMISSION_CONCURRENCY_LIMIT=20, ADMISSION_DEGRADE_AT=0.5, ADMISSION_BUCKET_CAPACITY=100)
+class DegradedChatTests(ControllerMixin, TransactionTestCase):
+    async def test_chat_answers_from_retrieval_under_pressure(self):
+        generate = mock.Mock(return_value="generated")
+        client = AsyncClient()
+        with mock.patch("apps.chat.views.admission_controller", self.controller), mock.patch(
+            "apps.chat.views._generate_reply", generate
+        ):
+            calm = await client.post("/api/chat/", {"message": "cafe"}, content_type="application/json")
+            async with self.controller.admit(self.request("10.0.0.9"), "chat"):
+                pressed = await client.post("/api/chat/", {"message": "cafe"}, content_type="application/json")
+        self.assertEqual(calm.json(), {"reply": "generated"})
+        self.assertTrue(pressed.json()["reply"].startswith("Here are some options I found"))
+        generate.assert_called_once()
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from rest_framework import permissions, response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.businesses.models import Business, Category
+from apps.searchai.views import _build_index
+from core.async_views import AsyncAPIView
+
+
+class EchoView(AsyncAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    async def get(self, request):
+        return response.Response({"handler": "async"})
+
+    def post(self, request):
+        return response.Response({"handler": "sync", "data": request.data})
+
+
+class AdminOnlyView(AsyncAPIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    async def get(self, request):
+        return response.Response({"ok": True})
+
+
+@override_settings(CATALOG_ENABLED=False)
+class AsyncAPIViewMixinTests(TransactionTestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        category = Category.objects.create(name="Pharmacy")
+        self.businesses = [
+            Business.objects.create(name=f"Kigali Pharmacy {i}", city="Kigali", category=category, description="open late")
+            for i in range(15)
+        ]
+        _build_index()
+
+    async def test_dispatch_awaits_async_and_runs_sync_handlers(self):
+        view = EchoView.as_view()
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        got = await view(self.factory.get("/echo/"))
+        self.assertEqual(got.data, {"handler": "async"})
+        got = await view(self.factory.post("/echo/", {"a": 1}, format="json"))
+        self.assertEqual(got.data, {"handler": "sync", "data": {"a": 1}})
+        got = await view(self.factory.delete("/echo/"))
+        self.assertEqual(got.status_code, 405)
+
+    async def test_permission_errors(self):
+        view = AdminOnlyView.as_view()
+        got = await view(self.factory.get("/admin-only/"))
+        self.assertEqual(got.status_code, 401)
+        user = await get_user_model().objects.acreate(username="member")
+        request = self.factory.get("/admin-only/")
+        force_authenticate(request, user=user)
+        got = await view(request)
+        self.assertEqual(got.status_code, 403)
+
+    async def test_list_paginates_through_db_executor(self):
+        client = AsyncClient()
+        # A text search skips the catalog, so the page comes from apaginate_queryset
+        got = await client.get("/api/businesses/", {"search": "pharmacy"})
+        self.assertEqual(got.status_code, 200)
+        body = got.json()
+        self.assertEqual(body["count"], 15)
+        self.assertEqual(len(body["results"]), 12)
+        got = await client.get("/api/businesses/", {"search": "pharmacy", "page": 2})
+        self.assertEqual(len(got.json()["results"]), 3)
+
+    async def test_retrieve_looks_up_object(self):
+        client = AsyncClient()
+        business = self.businesses[0]
+        got = await client.get(f"/api/businesses/{business.id}/")
+        self.assertEqual(got.status_code, 200)
+        self.assertEqual(got.json()["name"], business.name)
+        got = await client.get(f"/api/businesses/{business.id + 1000}/")
+        self.assertEqual(got.status_code, 404)
+        got = await client.get("/api/businesses/not-a-number/")
+        self.assertEqual(got.status_code, 404)
+
+    @override_settings(ADMISSION_ENABLED=False)
+    async def test_concurrent_searches_return_consistent_results(self):
+        client = AsyncClient()
+        keyword = await asyncio.gather(*[client.get("/api/search/keyword/", {"query": "pharmacy"}) for _ in range(8)])
+        semantic = await asyncio.gather(*[client.get("/api/search/semantic/", {"query": "pharmacy", "top_k": 5}) for _ in range(8)])
+        for batch in (keyword, semantic):
+            self.assertTrue(all(r.status_code == 200 for r in batch))
+            bodies = [r.json() for r in batch]
+            self.assertTrue(bodies[0]["results"])
+            self.assertTrue(all(body == bodies[0] for body in bodies))
+        self.assertEqual(keyword[0].json()["facets"]["city"], [{"value": "Kigali", "count": 15}])
+        self.assertEqual(len(semantic[0].json()["results"]), 5)
+
+    @override_settings(ADMISSION_ENABLED=False)
+    async def test_slow_chat_does_not_block_fast_lookups(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_generation(snippets, message):
+            # Stands in for a long model generation on the chat executor
+            started.set()
+            release.wait(30)
+            return "generated"
+
+        client = AsyncClient()
+        with mock.patch("apps.chat.views._generate_reply", slow_generation):
+            chat = asyncio.ensure_future(client.post("/api/chat/", {"message": "pharmacy"}, content_type="application/json"))
+            try:
+                self.assertTrue(await asyncio.to_thread(started.wait, 10))
+                began = time.monotonic()
+                lookups = await asyncio.wait_for(
+                    asyncio.gather(
+                        *[client.get("/api/businesses/") for _ in range(4)],
+                        *[client.get(f"/api/businesses/{b.id}/") for b in self.businesses[:4]],
+                        *[client.get("/api/search/keyword/", {"query": "pharmacy"}) for _ in range(4)],
+                    ),
+                    timeout=10,
+                )
+                elapsed = time.monotonic() - began
+                # Every lookup finished while the generation was still holding its thread
+                self.assertFalse(chat.done())
+                self.assertTrue(all(r.status_code == 200 for r in lookups))
+            finally:
+                release.set()
+            reply = await chat
+        self.assertEqual(reply.json(), {"reply": "generated"})
+        self.assertLess(elapsed, 10)
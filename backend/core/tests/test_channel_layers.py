@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+
+from channels.exceptions import ChannelFull
+from django.db import connection
+
+from core.channel_layers import PostgresChannelLayer
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "the channel layer needs Postgres")
+class PostgresChannelLayerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # The test database, where the chat migration created the layer's tables
+        settings = connection.settings_dict
+        self.connection_kwargs = {
+            key: settings[name]
+            for key, name in (("dbname", "NAME"), ("user", "USER"), ("password", "PASSWORD"), ("host", "HOST"), ("port", "PORT"))
+            if settings[name]
+        }
+        self.layers = []
+
+    async def asyncTearDown(self):
+        for layer in self.layers:
+            await layer.close()
+        await self.layer().flush()
+        await self.layers[-1].close()
+
+    def layer(self, **kwargs) -> PostgresChannelLayer:
+        layer = PostgresChannelLayer(connection_kwargs=self.connection_kwargs, **kwargs)
+        self.layers.append(layer)
+        return layer
+
+    async def receive(self, layer, channel):
+        return await asyncio.wait_for(layer.receive(channel), 5)
+
+    async def test_send_receive(self):
+        layer = self.layer()
+        channel = await layer.new_channel()
+        # Sent before the first receive subscribes; waits in the table
+        await layer.send(channel, {"type": "test.message", "n": 1, "raw": b"\x00\x01"})
+        self.assertEqual(await self.receive(layer, channel), {"type": "test.message", "n": 1, "raw": b"\x00\x01"})
+        pending = asyncio.create_task(self.receive(layer, channel))
+        await asyncio.sleep(0.1)
+        await layer.send(channel, {"type": "test.message", "n": 2})
+        self.assertEqual((await pending)["n"], 2)
+
+    async def test_receive_drops_its_waiter(self):
+        layer = self.layer()
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "test.message"})
+        await self.receive(layer, channel)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive(channel), 0.2)
+        self.assertEqual(layer._state().waiters, {})
+
+    async def test_normal_channel_delivers_each_message_once(self):
+        first, second = self.layer(), self.layer()
+        received = []
+
+        async def consume(layer):
+            while True:
+                received.append((await layer.receive("workers"))["n"])
+
+        consumers = [asyncio.create_task(consume(first)), asyncio.create_task(consume(second))]
+        await asyncio.sleep(0.1)
+        sender = self.layer()
+        for n in range(20):
+            await sender.send("workers", {"type": "job", "n": n})
+        for _ in range(50):
+            if len(received) >= 20:
+                break
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.3)
+        for task in consumers:
+            task.cancel()
+        self.assertEqual(sorted(received), list(range(20)))
+
+    async def test_group_fan_out(self):
+        first, second = self.layer(), self.layer()
+        channels = [(first, await first.new_channel()), (first, await first.new_channel()), (second, await second.new_channel())]
+        for layer, channel in channels:
+            await layer.group_add("room", channel)
+        await first.group_send("room", {"type": "room.message", "text": "hi"})
+        for layer, channel in channels:
+            self.assertEqual((await self.receive(layer, channel))["text"], "hi")
+        await second.group_discard("room", channels[2][1])
+        await first.group_send("room", {"type": "room.message", "text": "again"})
+        for layer, channel in channels[:2]:
+            self.assertEqual((await self.receive(layer, channel))["text"], "again")
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(second.receive(channels[2][1]), 0.5)
+
+    async def test_large_payload_round_trip(self):
+        sender, receiver = self.layer(), self.layer()
+        channel = await receiver.new_channel()
+        text = "x" * 50_000
+        pending = asyncio.create_task(self.receive(receiver, channel))
+        await asyncio.sleep(0.1)
+        await sender.send(channel, {"type": "big", "text": text})
+        self.assertEqual((await pending)["text"], text)
+
+    async def test_full_channel_raises(self):
+        layer = self.layer(capacity=2)
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "a"})
+        await layer.send(channel, {"type": "b"})
+        with self.assertRaises(ChannelFull):
+            await layer.send(channel, {"type": "c"})
+        self.assertEqual((await self.receive(layer, channel))["type"], "a")
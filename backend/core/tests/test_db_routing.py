@@ -0,0 +1,189 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TransactionTestCase, override_settings
+
+from apps.businesses.models import Business, Category
+from core import db_routing
+from core.db_routing import ReadReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from core.executors import run_db
+
+
+class ReplicaView:
+    read_replica = True
+
+
+def view_func():
+    pass
+
+
+view_func.cls = ReplicaView
+
+# The pool "chooses" the primary so routed reads still have a database; the
+# router returns None whenever it declines to route
+REPLICA = "default"
+
+
+@mock.patch.object(db_routing.replica_pool, "choose", return_value=REPLICA)
+class ReadReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    def test_reads_use_replica_only_inside_scope(self, choose):
+        self.assertIsNone(self.router.db_for_read(Business))
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Business), REPLICA)
+        self.assertIsNone(self.router.db_for_read(Business))
+
+    def test_in_memory_relations_do_not_pin(self, choose):
+        with use_replica():
+            business = Business(id=1, name="Cafe")
+            business.category = Category(id=2, name="Food")
+            self.assertEqual(self.router.db_for_write(Business), "default")
+            self.assertEqual(self.router.db_for_read(Business), REPLICA)
+
+    def test_write_pins_rest_of_scope(self, choose):
+        with use_replica():
+            Business.objects.filter(name="nothing").count()
+            self.assertEqual(self.router.db_for_read(Business), REPLICA)
+            Business.objects.create(name="Cafe")
+            self.assertIsNone(self.router.db_for_read(Business))
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Business), REPLICA)
+
+
+@mock.patch.object(db_routing.replica_pool, "choose", return_value=REPLICA)
+class ReplicaRoutingMiddlewareTests(TransactionTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def run_request(self, handler, method="get", status=200):
+        seen = {}
+
+        def get_response(request):
+            middleware.process_view(request, view_func, (), {})
+            seen["before"] = ReadReplicaRouter().db_for_read(Business)
+            handler()
+            seen["after"] = ReadReplicaRouter().db_for_read(Business)
+            return HttpResponse(status=status)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(getattr(self.factory, method)("/api/businesses/"))
+        return response, seen
+
+    def pinned(self, response):
+        return settings.REPLICA_PIN_HEADER in response
+
+    def test_read_only_get_is_not_pinned(self, choose):
+        def handler():
+            list(Business.objects.all())
+            business = Business(id=1, name="Cafe")
+            business.category = Category(id=2, name="Food")
+
+        response, seen = self.run_request(handler)
+        self.assertEqual(seen, {"before": REPLICA, "after": REPLICA})
+        self.assertFalse(self.pinned(response))
+
+    def test_get_that_writes_is_pinned(self, choose):
+        response, seen = self.run_request(lambda: Business.objects.create(name="Cafe"))
+        self.assertEqual(seen, {"before": REPLICA, "after": None})
+        self.assertTrue(self.pinned(response))
+
+    def test_write_on_db_thread_pins_request(self, choose):
+        response, seen = self.run_request(lambda: asyncio.run(run_db(Business.objects.create, name="Cafe")))
+        self.assertIsNone(seen["after"])
+        self.assertTrue(self.pinned(response))
+
+    def test_successful_unsafe_request_is_pinned(self, choose):
+        response, seen = self.run_request(lambda: None, method="post", status=201)
+        self.assertIsNone(seen["before"])
+        self.assertTrue(self.pinned(response))
+        response, _ = self.run_request(lambda: None, method="post", status=400)
+        self.assertFalse(self.pinned(response))
+
+    def test_pinned_client_reads_primary(self, choose):
+        response, _ = self.run_request(lambda: None, method="post", status=201)
+        pin = response[settings.REPLICA_PIN_HEADER]
+        self.assertGreater(int(pin), time.time())
+        self.factory = RequestFactory(headers={"X-DB-Pin": pin})
+        _, seen = self.run_request(lambda: None)
+        self.assertEqual(seen, {"before": None, "after": None})
+
+    def test_expired_pin_is_ignored(self, choose):
+        self.factory = RequestFactory(headers={"X-DB-Pin": str(int(time.time()) - 1)})
+        _, seen = self.run_request(lambda: None)
+        self.assertEqual(seen["before"], REPLICA)
+
+
+REPLICA_ALIAS = "replica_test"
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "copies the primary with SQLite's backup API")
+@override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS], CATALOG_ENABLED=False, ADMISSION_ENABLED=False)
+class PrimaryAndReplicaTests(TransactionTestCase):
+    """Routing between two real databases: the test database and a SQLite file standing in for a lagging replica."""
+
+    databases = {"default", REPLICA_ALIAS}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA_ALIAS] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3"),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        Category.objects.create(name="Cafes")
+        Business.objects.create(name="Kigali Cafe")
+        self.replicate()
+
+    def replicate(self):
+        # The replica catches up: it becomes a copy of the primary
+        primary, replica = connections["default"], connections[REPLICA_ALIAS]
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    @staticmethod
+    def names(response):
+        return sorted(row["name"] for row in response.json()["results"])
+
+    def test_sync_view(self):
+        client = Client()
+        url = "/api/businesses/categories/"
+        created = client.post(url, {"name": "Hotels"}, content_type="application/json")
+        self.assertEqual(created.status_code, 201)
+        pin = created[settings.REPLICA_PIN_HEADER]
+        # The replica has not caught up; only the client that echoes the pin sees its write
+        self.assertEqual(self.names(client.get(url)), ["Cafes"])
+        self.assertEqual(self.names(client.get(url, headers={"X-DB-Pin": pin})), ["Cafes", "Hotels"])
+        self.replicate()
+        self.assertEqual(self.names(client.get(url)), ["Cafes", "Hotels"])
+
+    async def test_async_view(self):
+        client = AsyncClient()
+        url = "/api/businesses/"
+        created = await client.post(url, {"name": "Huye Lodge"}, content_type="application/json")
+        self.assertEqual(created.status_code, 201)
+        pin = created[settings.REPLICA_PIN_HEADER]
+        self.assertEqual(self.names(await client.get(url)), ["Kigali Cafe"])
+        self.assertEqual(self.names(await client.get(url, headers={"X-DB-Pin": pin})), ["Huye Lodge", "Kigali Cafe"])
+        await asyncio.to_thread(self.replicate)
+        self.assertEqual(self.names(await client.get(url)), ["Huye Lodge", "Kigali Cafe"])
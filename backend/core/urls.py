@@ -5,6 +5,8 @@ from django.conf.urls.static import static
 from django.http import JsonResponse, HttpResponseRedirect
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
+from .db_pool import DatabasePoolView
+
 
 def health_view(_request):
     return JsonResponse({"status": "ok"})
@@ -17,6 +19,7 @@ def root_redirect(_request):
 urlpatterns = [
     path("", root_redirect, name="root"),
     path("health/", health_view, name="health"),
+    path("health/db/", DatabasePoolView.as_view(), name="health-db"),
     path("admin/", admin.site.urls),
 
     # API schema and docs
@@ -32,4 +35,5 @@ urlpatterns = [
     path("api/notifications/", include("apps.notifications.urls")),
     path("api/search/", include("apps.searchai.urls")),
     path("api/chat/", include("apps.chat.urls")),
+    path("api/jobs/", include("apps.jobs.urls")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -18,12 +18,23 @@ const makeRequest = async (endpoint: string, options: RequestInit = {}) => {
     headers['Authorization'] = `Bearer ${token}`;
   }
 
+  // Echo the pin from our last write so reads see it until replicas catch up
+  const dbPin = localStorage.getItem('db_pin');
+  if (dbPin) {
+    headers['X-DB-Pin'] = dbPin;
+  }
+
   try {
     const response = await fetch(`${API_BASE_URL}${endpoint}`, {
       ...options,
       headers,
     });
 
+    const newPin = response.headers.get('X-DB-Pin');
+    if (newPin) {
+      localStorage.setItem('db_pin', newPin);
+    }
+
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
       throw new Error(errorData.message || `HTTP ${response.status}: ${response.statusText}`);